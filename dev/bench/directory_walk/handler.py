@@ -0,0 +1,80 @@
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from dev.bench.directory_walk.query import DirectoryWalk
+from scaf.action_package.rules import must_contain_required_files
+from scaf.manifest.tools import scan_action_folders
+
+logger = logging.getLogger(__name__)
+
+_MAX_DEPTH = 5
+_ACTION_FILES = ("__init__.py", "handler.py", "query.py")
+
+
+def _build_tree(root: Path, folders: int) -> int:
+  """Create a three-level tree of about `folders` folders, every tenth leaf an action package."""
+  width = max(1, round(folders ** (1 / 3)))
+  created = 0
+  for a in range(width):
+    for b in range(width):
+      for c in range(width):
+        leaf = root / f"domain_{a}" / f"area_{b}" / f"act_{c}"
+        leaf.mkdir(parents=True)
+        if c % 10 == 0:
+          for filename in _ACTION_FILES:
+            (leaf / filename).touch()
+      created += width
+    created += width + 1
+  return created
+
+
+def _path_walk(root: Path) -> tuple[list[Path], dict[str, int]]:
+  """The walk discovery did before it used `os.scandir`, minus logging and ignore patterns."""
+  actions = []
+  dirs = {}
+  for base, subdirs, files in root.walk():
+    folder = base.relative_to(root)
+    if len(folder.parts) > _MAX_DEPTH:
+      subdirs[:] = []
+      continue
+    dirs[folder.as_posix()] = base.stat().st_mtime_ns
+    if base == root or base.name.startswith((".", "_")) or not files:
+      continue
+    try:
+      must_contain_required_files(files)
+      actions.append(folder)
+    except ValueError:
+      continue
+  return sorted(actions), dirs
+
+
+def _time(walk) -> tuple[float, tuple[list[Path], dict[str, int]]]:
+  started = time.perf_counter()
+  found = walk()
+  return time.perf_counter() - started, found
+
+
+def handle(query: DirectoryWalk) -> DirectoryWalk.Result:
+  logger.debug(f"Handling {query=}")
+  with tempfile.TemporaryDirectory(prefix="scaf-bench-") as tmp:
+    root = Path(tmp)
+    folders = _build_tree(root, query.folders)
+    path_walk, expected = _time(lambda: _path_walk(root))
+    serial, found = _time(lambda: scan_action_folders(root, _MAX_DEPTH, [], workers=1))
+    parallel, found_in_parallel = _time(
+      lambda: scan_action_folders(root, _MAX_DEPTH, [], workers=query.workers)
+    )
+
+  for walker, (actions, dirs) in (("serial", found), ("parallel", found_in_parallel)):
+    if actions != expected[0] or dirs.keys() != expected[1].keys():
+      raise RuntimeError(f"The {walker} walk found something different to Path.walk")
+  return query.Result(
+    folders=folders,
+    actions=len(expected[0]),
+    path_walk=path_walk,
+    serial=serial,
+    parallel=parallel,
+    speedup=path_walk / parallel if parallel else 0.0,
+  )
@@ -0,0 +1,29 @@
+from dataclasses import dataclass, field
+
+from scaf.manifest.tools import WALK_WORKERS
+
+
+@dataclass
+class DirectoryWalk:
+  """Time scanning a synthetic deck for action packages, with `Path.walk` and the scandir walker."""
+
+  folders: int = field(
+    default=100_000, doc="Roughly how many folders to create, three levels deep."
+  )
+  workers: int = field(default=WALK_WORKERS, doc="Threads for the parallel walk.")
+
+  def execute(self):
+    from dev.bench.directory_walk.handler import handle
+
+    return handle(self)
+
+  @dataclass
+  class Result:
+    """Seconds taken to find every action package in the tree with each walker."""
+
+    folders: int = field(doc="How many folders were created.")
+    actions: int = field(doc="How many of them are action packages.")
+    path_walk: float = field(doc="`Path.walk`, stat-ing each folder, as discovery used to.")
+    serial: float = field(doc="`scan_action_folders` with one worker.")
+    parallel: float = field(doc="`scan_action_folders` with a pool of workers.")
+    speedup: float = field(doc="How many times faster parallel is than path_walk.")
@@ -0,0 +1,86 @@
+import importlib.util
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from dev.bench.file_watcher.query import FileWatcherIdle
+from scaf.user.serve.handler import FileWatcher
+
+logger = logging.getLogger(__name__)
+
+_FILES_PER_FOLDER = 20
+_MODULE_NAME = "scaf_bench_watched"
+
+
+def _build_tree(root: Path, files: int) -> Path:
+  """Create `files` .py files, two levels deep, and return the one to edit."""
+  for index in range(files):
+    folder = (
+      root / f"area_{index // (_FILES_PER_FOLDER * 50)}" / f"act_{index // _FILES_PER_FOLDER}"
+    )
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / f"module_{index}.py").write_text(f"VALUE = {index}\n", encoding="utf-8")
+  watched = root / f"{_MODULE_NAME}.py"
+  watched.write_text("VALUE = 0\n", encoding="utf-8")
+  return watched
+
+
+def _idle_cpu(seconds: float) -> float:
+  """Percent of a CPU this process used while the calling thread slept."""
+  started = time.process_time()
+  time.sleep(seconds)
+  return (time.process_time() - started) / seconds * 100
+
+
+def _reload_latency(watched: Path, edits: int, timeout: float) -> float:
+  module = sys.modules[_MODULE_NAME]
+  total = 0.0
+  for edit in range(1, edits + 1):
+    time.sleep(0.05)  # Keep each edit out of the last one's scan
+    started = time.perf_counter()
+    watched.write_text(f"VALUE = {edit}\n", encoding="utf-8")
+    while sys.modules[_MODULE_NAME].VALUE != edit:
+      if time.perf_counter() - started > timeout:
+        raise RuntimeError(f"The watcher didn't reload {watched.name} within {timeout}s")
+      time.sleep(0.001)
+    total += time.perf_counter() - started
+  module.VALUE = 0
+  return total / edits
+
+
+def _measure(root: Path, watched: Path, query: FileWatcherIdle, inotify: bool):
+  spec = importlib.util.spec_from_file_location(_MODULE_NAME, watched)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)  # type: ignore
+  sys.modules[_MODULE_NAME] = module
+  watcher = FileWatcher(root, poll_interval=query.poll_interval, inotify=inotify)
+  if inotify and watcher.backend != "inotify":
+    raise RuntimeError("inotify is not available here")
+  watcher.start()
+  try:
+    time.sleep(query.poll_interval * 1.5)  # Let polling record every file's mtime first
+    cpu = _idle_cpu(query.seconds)
+    latency = _reload_latency(watched, query.edits, timeout=query.poll_interval * 10)
+  finally:
+    watcher.stop()
+    sys.modules.pop(_MODULE_NAME, None)
+  logger.info("%s: %.2f%% CPU idle, %.4fs to reload", watcher.backend, cpu, latency)
+  return cpu, latency
+
+
+def handle(query: FileWatcherIdle) -> FileWatcherIdle.Result:
+  logger.debug(f"Handling {query=}")
+  with tempfile.TemporaryDirectory(prefix="scaf-bench-") as tmp:
+    root = Path(tmp)
+    watched = _build_tree(root, query.files)
+    poll_cpu, poll_latency = _measure(root, watched, query, inotify=False)
+    inotify_cpu, inotify_latency = _measure(root, watched, query, inotify=True)
+  return query.Result(
+    files=query.files,
+    poll_cpu=poll_cpu,
+    inotify_cpu=inotify_cpu,
+    poll_latency=poll_latency,
+    inotify_latency=inotify_latency,
+  )
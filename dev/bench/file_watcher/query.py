@@ -0,0 +1,26 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class FileWatcherIdle:
+  """Measure the dev server's file watcher on a synthetic deck, polling and with inotify."""
+
+  files: int = field(default=20_000, doc="How many .py files to create, 20 to a folder.")
+  seconds: float = field(default=10.0, doc="How long to measure each watcher sitting idle.")
+  poll_interval: float = field(default=1.0, doc="Seconds between scans when polling.")
+  edits: int = field(default=5, doc="How many edits to time each watcher reloading.")
+
+  def execute(self):
+    from dev.bench.file_watcher.handler import handle
+
+    return handle(self)
+
+  @dataclass
+  class Result:
+    """CPU each watcher used while nothing changed, and how long each took to see an edit."""
+
+    files: int = field(doc="How many .py files were watched.")
+    poll_cpu: float = field(doc="Percent of a CPU used by the polling watcher while idle.")
+    inotify_cpu: float = field(doc="Percent of a CPU used by the inotify watcher while idle.")
+    poll_latency: float = field(doc="Mean seconds from an edit to its reload, polling.")
+    inotify_latency: float = field(doc="Mean seconds from an edit to its reload, with inotify.")
@@ -0,0 +1,35 @@
+import json
+import logging
+import time
+
+from dev.bench.json_encoding.query import JsonEncoding
+from example.myriad.entity import Myriad
+from scaf.output import JSONEncoder, to_json
+
+logger = logging.getLogger(__name__)
+
+
+def _stdlib(obj) -> str:
+  return json.dumps(obj, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":"))
+
+
+def _time(encode, obj) -> tuple[float, str]:
+  encode(obj[:1])  # Build any writer outside the timed run
+  started = time.perf_counter()
+  output = encode(obj)
+  return time.perf_counter() - started, output
+
+
+def handle(query: JsonEncoding) -> JsonEncoding.Result:
+  logger.debug(f"Handling {query=}")
+  myriads = [Myriad(integer=i, unique={i, i + 1}) for i in range(query.count)]
+  stdlib, expected = _time(_stdlib, myriads)
+  compiled, output = _time(to_json, myriads)
+  if output != expected:
+    raise RuntimeError("The compiled writer's output differs from JSONEncoder's")
+  return query.Result(
+    stdlib=stdlib,
+    compiled=compiled,
+    speedup=stdlib / compiled if compiled else 0.0,
+    size=len(output),
+  )
@@ -0,0 +1,22 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class JsonEncoding:
+  """Time serializing a large list of Myriads with the compiled writer, against `JSONEncoder`."""
+
+  count: int = field(default=100_000, doc="How many Myriads to put in the list.")
+
+  def execute(self):
+    from dev.bench.json_encoding.handler import handle
+
+    return handle(self)
+
+  @dataclass
+  class Result:
+    """Seconds taken to serialize the list as compact JSON with each encoder."""
+
+    stdlib: float = field(doc="`json.dumps` with `JSONEncoder`, which copies via `asdict`.")
+    compiled: float = field(doc="`to_json`, with a writer generated for `Myriad`.")
+    speedup: float = field(doc="How many times faster compiled is than stdlib.")
+    size: int = field(doc="Length of the output, which is the same for both.")
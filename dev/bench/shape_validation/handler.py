@@ -0,0 +1,54 @@
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from dev.bench.shape_validation.query import ShapeValidation
+from scaf.core import Shape
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Plain:
+  name: str
+  action: Path
+  count: int = 0
+  note: str | None = None
+
+
+@dataclass
+class _Generic(Shape):
+  name: str
+  action: Path
+  count: int = 0
+  note: str | None = None
+
+
+@dataclass
+class _Codegen(Shape, codegen=True):
+  name: str
+  action: Path
+  count: int = 0
+  note: str | None = None
+
+
+def _time(cls: type, count: int) -> float:
+  action = Path("a/b")
+  cls(name="warmup", action=action)  # Build any plan outside the timed loop
+  started = time.perf_counter()
+  for i in range(count):
+    cls(name="x", action=action, count=i)
+  return time.perf_counter() - started
+
+
+def handle(query: ShapeValidation) -> ShapeValidation.Result:
+  logger.debug(f"Handling {query=}")
+  generic = _time(_Generic, query.count)
+  codegen = _time(_Codegen, query.count)
+  return query.Result(
+    plain=_time(_Plain, query.count),
+    generic=generic,
+    codegen=codegen,
+    speedup=generic / codegen if codegen else 0.0,
+  )
@@ -0,0 +1,22 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ShapeValidation:
+  """Time constructing Shapes with generated validators, against the generic path."""
+
+  count: int = field(default=100_000, doc="How many instances to construct per variant.")
+
+  def execute(self):
+    from dev.bench.shape_validation.handler import handle
+
+    return handle(self)
+
+  @dataclass
+  class Result:
+    """Seconds taken to construct `count` instances of each variant."""
+
+    plain: float = field(doc="A dataclass that does no fitting at all, as a baseline.")
+    generic: float = field(doc="A Shape fitted by `values_must_fit`.")
+    codegen: float = field(doc="The same Shape, fitted by its generated validator.")
+    speedup: float = field(doc="How many times faster codegen is than generic.")
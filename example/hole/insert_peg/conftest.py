@@ -5,11 +5,19 @@ from pathlib import Path
 import pytest
 
 
+def _selected_fixture(config):
+  # The fixture the scaf dev server picked for this run, else the one in SCAF_FIXTURE
+  if selection := config.pluginmanager.get_plugin("scaf_fixture_selection"):
+    return selection.fixture, selection.no_xfail
+  return os.environ.get("SCAF_FIXTURE"), bool(os.environ.get("SCAF_NO_XFAIL"))
+
+
 def pytest_generate_tests(metafunc):
   if "payload" not in metafunc.fixturenames:
     return
+  name, no_xfail = _selected_fixture(metafunc.config)
   d = Path(metafunc.definition.fspath).parent / "fixtures"
-  if name := os.environ.get("SCAF_FIXTURE"):
+  if name:
     files = [d / name] if (d / name).exists() else []
   elif d.exists():
     files = sorted(d.glob("*.json"))
@@ -24,7 +32,7 @@ def pytest_generate_tests(metafunc):
     expected = data.get("expectations", {}).get(test_name, True)
     marks = (
       [pytest.mark.xfail(strict=True, reason=f"fixture expects {test_name} to fail")]
-      if expected is False and not os.environ.get("SCAF_NO_XFAIL")
+      if expected is False and not no_xfail
       else []
     )
     params.append(pytest.param(data["payload"], marks=marks, id=Path(f).stem))
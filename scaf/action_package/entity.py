@@ -31,4 +31,41 @@ class ActionPackage(Shape):
   @cached_property
   def action_method(self) -> str:
     """is either`command` or `query`"""
-    return self.shape_module.__name__.split(".")[-1]
+    # Packages are loaded under hash-based module names, so go by the file it was loaded from
+    return Path(self.shape_module.__file__ or self.shape_module.__name__).stem
+
+
+@dataclass
+class FieldMetadata:
+  """A field of a shape class, as written in its source."""
+
+  name: str = field(doc="Attribute name.")
+  annotation: str = field(default="", doc="Source of the type annotation.")
+  default: str | None = field(
+    default=None,
+    doc="Source of the default value, `<factory>` for a `default_factory`, or None if required.",
+  )
+  doc: str = field(default="", doc="From `field(doc=...)` or the string literal below the field.")
+
+  @property
+  def required(self) -> bool:
+    return self.default is None
+
+
+@dataclass
+class ShapeMetadata:
+  """What can be learned about an action's shape class by parsing, rather than importing, it."""
+
+  shape_file: Path = field(doc="The `command.py` or `query.py` that was parsed.")
+  name: str = field(doc="Name of the first public dataclass in the file.")
+  doc: str = field(default="", doc="Class docstring, falling back to the module docstring.")
+  fields: list[FieldMetadata] = field(default_factory=list, doc="Fields, in declaration order.")
+
+  @property
+  def action_method(self) -> str:
+    return self.shape_file.stem
+
+  @property
+  def summary(self) -> str:
+    """First line of the docstring."""
+    return next(iter(self.doc.strip().splitlines()), "")
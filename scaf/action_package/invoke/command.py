@@ -1,4 +1,5 @@
 from dataclasses import dataclass, field
+from pathlib import Path
 
 from scaf.action_package.entity import ActionPackage
 
@@ -7,6 +8,10 @@ from scaf.action_package.entity import ActionPackage
 class InvokeActionPackage:
   action_package: ActionPackage
   action_args: list[str] = field(default_factory=list)
+  results_folder: Path | None = None
+  """Where to cache results of queries with a `cache_ttl`; None to always run the handler."""
+  refresh: bool = False
+  """Run the handler even if a cached result is fresh, and cache its result in place of it."""
 
   def execute(self):
     from scaf.action_package.invoke.handler import handle
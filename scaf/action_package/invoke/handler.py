@@ -1,15 +1,23 @@
 import argparse
+import copy
 import dataclasses
 import inspect
 import logging
+from collections.abc import Callable
 from pathlib import Path
+from weakref import WeakKeyDictionary
 
 from scaf.action_package.invoke.command import InvokeActionPackage
+from scaf.action_package.invoke.tools import call_with_cache, resolve_result
 from scaf.errors import FittingError
-from scaf.tools import get_acceptable_types, get_fitter, to_slug_case
+from scaf.shape.entity import FitPlan
+from scaf.tools import get_acceptable_types, get_fit_plan, get_fitter, to_slug_case
 
 logger = logging.getLogger(__name__)
 
+_parsers: WeakKeyDictionary[type, tuple[FitPlan, argparse.ArgumentParser]] = WeakKeyDictionary()
+_varargs: WeakKeyDictionary[Callable, bool] = WeakKeyDictionary()
+
 
 def build_parser_from_shape(shape_class: type, description: str):
   logger.debug(f"👋 {build_parser_from_shape.__name__} {shape_class=} {description=}")
@@ -19,12 +27,12 @@ def build_parser_from_shape(shape_class: type, description: str):
     logger.debug(f"func={build_parser_from_shape.__name__} {field=}")
     name = field.name
     t, _, _ = get_acceptable_types(field)
+    fitter = get_fitter(shape_class, name)
 
-    def _fit(value, _name=name, _t=t):
-      logger.debug(f"Fitting {value=} to {_t} for field {shape_class}.{_name}")
-      fitter = get_fitter(shape_class, _name)
+    def _fit(value, _name=name, _t=t, _fitter=fitter):
+      logger.debug("Fitting value=%r to %s for field %s.%s", value, _t, shape_class, _name)
       try:
-        return fitter(value)
+        return _fitter(value)
       except (ValueError, TypeError, RuntimeError) as e:
         raise FittingError(f"{value!r} is not a valid value for '{_name}': {e}") from e
 
@@ -56,8 +64,8 @@ def build_parser_from_shape(shape_class: type, description: str):
         if default is not dataclasses.MISSING:
           effective_default = default
         else:
-          # default_factory exists, call it to get the default value
-          effective_default = field.default_factory()  # type: ignore
+          # Leave it to the dataclass, so a cached parser never hands out the same mutable default
+          effective_default = argparse.SUPPRESS
         parser.add_argument(
           f"--{flag_name}", type=_fit, default=effective_default, dest=name, help=help
         )
@@ -65,15 +73,35 @@ def build_parser_from_shape(shape_class: type, description: str):
   return parser
 
 
+def get_parser(shape_class: type, description: str) -> argparse.ArgumentParser:
+  """Return a parser for the shape class, built once and reused until its fit plan changes."""
+  plan = get_fit_plan(shape_class)
+  cached = _parsers.get(shape_class)
+  if cached is None or cached[0] is not plan:
+    cached = (plan, build_parser_from_shape(shape_class, description))
+    _parsers[shape_class] = cached
+  return cached[1]
+
+
+def accepts_var_positional(handle: Callable) -> bool:
+  """Whether the handler takes `*args`, i.e. can be passed arguments its shape doesn't define."""
+  if (accepts := _varargs.get(handle)) is None:
+    sig = inspect.signature(handle)
+    accepts = any(p.kind == inspect.Parameter.VAR_POSITIONAL for p in sig.parameters.values())
+    _varargs[handle] = accepts
+  return accepts
+
+
 def handle(command: InvokeActionPackage):
-  logger.debug(f"Handling {command=}")
+  logger.debug("Handling command=%r", command)
 
   action_package = command.action_package
   action_folder = action_package.action_folder
   shape_class = action_package.shape_class
 
   description = shape_class.__doc__ or action_package.shape_module.__doc__ or "Do the thing."
-  action_parser = build_parser_from_shape(shape_class, description=description)
+  # The cached parser is shared between threads, so this call's `prog` is set on a copy
+  action_parser = copy.copy(get_parser(shape_class, description=description))
 
   if action_folder.is_relative_to(Path.cwd()):
     action_path = action_folder.relative_to(Path.cwd())
@@ -90,12 +118,16 @@ def handle(command: InvokeActionPackage):
 
   action = shape_class(**vars(args))
 
+  if extra_args and not accepts_var_positional(action_package.logic_module.handle):
+    raise RuntimeError(f"Unexpected arguments: {extra_args}")
+
+  handle = action_package.logic_module.handle
   if extra_args:
-    sig = inspect.signature(action_package.logic_module.handle)
-    accepts_var_positional = any(
-      p.kind == inspect.Parameter.VAR_POSITIONAL for p in sig.parameters.values()
-    )
-    if not accepts_var_positional:
-      raise RuntimeError(f"Unexpected arguments: {extra_args}")
-
-  return action_package.logic_module.handle(action, *extra_args)
+    return resolve_result(handle(action, *extra_args))
+  return call_with_cache(
+    action_package,
+    action,
+    command.results_folder,
+    lambda: resolve_result(handle(action)),
+    refresh=command.refresh,
+  )
@@ -0,0 +1,136 @@
+import asyncio
+import inspect
+import json
+import logging
+import os
+import threading
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from concurrent.futures import Future
+from pathlib import Path
+
+from scaf.action_package.entity import ActionPackage
+from scaf.cache.tools import (
+  evict_results,
+  get_cache_ttl,
+  get_result_key,
+  read_cached_result,
+  record_result_lookup,
+  write_cached_result,
+)
+from scaf.codec.json_writer import to_json
+
+logger = logging.getLogger(__name__)
+
+
+class _SharedLoop:
+  """An event loop running forever in a daemon thread, so callers on any thread can use it."""
+
+  def __init__(self):
+    self.pid = os.getpid()
+    self.loop = asyncio.new_event_loop()
+    self.thread = threading.Thread(target=self.loop.run_forever, name="scaf-loop", daemon=True)
+    self.thread.start()
+
+
+_shared_loop: _SharedLoop | None = None
+_shared_loop_lock = threading.Lock()
+
+
+def get_shared_loop() -> asyncio.AbstractEventLoop:
+  """Return this process's event loop for coroutine handlers, starting it on first use."""
+  global _shared_loop
+  with _shared_loop_lock:
+    # A forked child inherits the object, but not the thread running its loop
+    if _shared_loop is None or _shared_loop.pid != os.getpid():
+      logger.debug("Starting shared event loop in pid %d", os.getpid())
+      _shared_loop = _SharedLoop()
+    return _shared_loop.loop
+
+
+class _Exited(Exception):
+  """Carries a SystemExit out of the shared loop, which would stop running if a task raised it."""
+
+
+async def _await(awaitable: Awaitable):
+  try:
+    return await awaitable
+  except SystemExit as e:
+    raise _Exited from e
+
+
+def submit_awaitable(awaitable: Awaitable) -> Future:
+  """Schedule an awaitable on the shared loop, returning a future for its result."""
+  return asyncio.run_coroutine_threadsafe(_await(awaitable), get_shared_loop())
+
+
+def run_awaitable(awaitable: Awaitable):
+  """Wait for an awaitable on the shared loop, from a thread that isn't running it."""
+  future = submit_awaitable(awaitable)
+  try:
+    return future.result()
+  except _Exited as e:
+    raise e.__cause__ from None
+  except BaseException:
+    future.cancel()  # e.g. on Ctrl+C, don't leave it running on the loop
+    raise
+
+
+def iterate_async(items: AsyncIterator) -> Iterator:
+  """Pull items from an async iterator on the shared loop, one at a time, as they're needed."""
+  try:
+    while True:
+      try:
+        item = run_awaitable(anext(items))
+      except StopAsyncIteration:
+        return
+      yield item
+  finally:
+    if aclose := getattr(items, "aclose", None):
+      run_awaitable(aclose())  # Run its cleanup even if we stop early
+
+
+def resolve_result(result):
+  """Wait for the result of a coroutine handler, and make async streams iterable from here.
+
+  Other results, including generators, are returned as they are.
+  """
+  if inspect.isawaitable(result):
+    result = run_awaitable(result)
+  if isinstance(result, AsyncIterator):
+    return iterate_async(result)
+  return result
+
+
+def call_with_cache(
+  action_package: ActionPackage,
+  action,
+  results_folder: Path | None,
+  call: Callable[[], object],
+  refresh: bool = False,
+):
+  """Return the result of `call()`, from the result cache if the action is a cached query.
+
+  Queries opt in with a `cache_ttl` on their shape. Streamed results aren't cached, and with
+  `refresh` the cached result is replaced rather than used.
+  """
+  ttl = get_cache_ttl(action_package.shape_class)
+  if results_folder is None or ttl is None or action_package.action_method != "query":
+    return call()
+  try:
+    canonical = json.dumps(json.loads(to_json(action)), sort_keys=True, separators=(",", ":"))
+    key = get_result_key(action_package.action_folder, canonical)
+  except (TypeError, ValueError, OSError) as e:
+    logger.debug("Not caching %s: %s", action_package.action_folder, e)
+    return call()
+
+  if not refresh:
+    hit, result = read_cached_result(results_folder, key)
+    record_result_lookup(results_folder, hit)
+    if hit:
+      logger.info("Using cached result for %s", action_package.action_folder.name)
+      return result
+
+  result = call()
+  if not isinstance(result, Iterator) and write_cached_result(results_folder, key, result, ttl):
+    evict_results(results_folder)
+  return result
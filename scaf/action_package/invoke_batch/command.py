@@ -0,0 +1,28 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+from scaf.action_package.entity import ActionPackage
+
+
+@dataclass
+class InvokeActionPackageBatch:
+  action_package: ActionPackage
+  source: str
+  """File to read JSON records from, one per line; '-' for stdin."""
+  root: Path | None = None
+  """Deck the package was loaded from, so worker processes can load it too."""
+  jobs: int = 1
+  """How many worker processes to run records in."""
+  ordered: bool = True
+  """Print outcomes in input order, rather than as ready."""
+  concurrency: int = 1
+  """How many records a coroutine handler may work on at once, in each process."""
+  format: str = "json"
+  """'json' for JSON lines, or 'binary' for length-prefixed frames, both in and out."""
+  chunk_size: int = 16
+  """How many records to send to a worker at a time."""
+
+  def execute(self):
+    from scaf.action_package.invoke_batch.handler import handle
+
+    return handle(self)
@@ -0,0 +1,283 @@
+import asyncio
+import inspect
+import json
+import logging
+import os
+import sys
+import time
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from itertools import batched
+from pathlib import Path
+from typing import IO, TextIO
+
+from scaf.action_package.entity import ActionPackage
+from scaf.action_package.invoke.tools import resolve_result, run_awaitable, submit_awaitable
+from scaf.action_package.invoke_batch.command import InvokeActionPackageBatch
+from scaf.action_package.load.command import LoadActionPackage
+from scaf.codec.binary import decode, encode, frame, read_frames
+from scaf.output import to_json_line
+
+logger = logging.getLogger(__name__)
+
+_Record = tuple[int, str | bytes]
+"""A record's line (or frame) number, and the JSON line (or binary frame) itself."""
+
+_Outcome = tuple[str | bytes, bool]
+"""A record's outcome as a JSON line (or binary frame), and whether it succeeded."""
+
+_ChunkOutcome = tuple[int, float, list[_Outcome]]
+"""The pid of the worker that ran a chunk, how long it was busy, and each record's outcome."""
+
+_worker_package: ActionPackage | None = None
+_worker_concurrency = 1
+
+
+@contextmanager
+def open_source(source: str, binary: bool = False) -> Iterator[IO]:
+  if source == "-":
+    yield sys.stdin.buffer if binary else sys.stdin
+    return
+  with open(source, "rb") if binary else open(source, encoding="utf-8") as f:
+    yield f
+
+
+def read_records(lines: TextIO) -> Iterator[tuple[int, str]]:
+  """Yield (line number, line) for each non-blank line, reading one line at a time."""
+  for number, line in enumerate(lines, start=1):
+    if line := line.strip():
+      yield number, line
+
+
+def read_binary_records(stream: IO[bytes]) -> Iterator[tuple[int, bytes]]:
+  """Yield (frame number, frame) for each frame, reading one at a time."""
+  yield from enumerate(read_frames(stream), start=1)
+
+
+def invoke_record(action_package: ActionPackage, record: str | bytes):
+  """Build the action's shape from one JSON object (or binary frame) and run the handler on it."""
+  if isinstance(record, bytes):
+    action = decode(record, action_package.shape_class)
+  else:
+    fields = json.loads(record)
+    if not isinstance(fields, dict):
+      raise TypeError(f"Expected a JSON object, got {type(fields).__name__}")
+    action = action_package.shape_class(**fields)  # Raises TypeError for unknown/missing fields
+  return action_package.logic_module.handle(action)
+
+
+def format_outcome(
+  number: int, result=None, error: BaseException | None = None, binary: bool = False
+) -> _Outcome:
+  if binary:
+    # The result is nested as bytes, for the reader to decode as whatever type it expects
+    if error is None:
+      try:
+        return frame(encode({"line": number, "result": encode(result)})), True
+      except TypeError as e:
+        error = ValueError(f"Result can't be encoded: {e}")
+    return frame(encode({"line": number, "error": f"{type(error).__name__}: {error}"})), False
+
+  if error is None:
+    try:
+      return to_json_line({"line": number, "result": result}), True
+    except (TypeError, ValueError) as e:
+      error = ValueError(f"Result is not JSON serializable: {e}")
+  return to_json_line({"line": number, "error": f"{type(error).__name__}: {error}"}), False
+
+
+def run_record(action_package: ActionPackage, number: int, record: str | bytes) -> _Outcome:
+  binary = isinstance(record, bytes)
+  try:
+    result = resolve_result(invoke_record(action_package, record))
+    if isinstance(result, Iterator):
+      result = list(result)  # Each record gets one line, so a streamed result becomes a list
+  except (Exception, SystemExit) as e:  # Reported; one bad record shouldn't stop the batch
+    logger.debug(f"Record {number} failed", exc_info=True)
+    return format_outcome(number, error=e, binary=binary)
+  return format_outcome(number, result, binary=binary)
+
+
+async def run_record_async(
+  action_package: ActionPackage, number: int, record: str | bytes
+) -> _Outcome:
+  """Like `run_record`, but awaits a coroutine handler on the running loop rather than blocking."""
+  binary = isinstance(record, bytes)
+  try:
+    result = invoke_record(action_package, record)
+    if inspect.isawaitable(result):
+      result = await result
+    if isinstance(result, AsyncIterator):
+      result = [item async for item in result]
+    elif isinstance(result, Iterator):
+      result = list(result)
+  except (Exception, SystemExit) as e:  # Reported; one bad record shouldn't stop the batch
+    logger.debug(f"Record {number} failed", exc_info=True)
+    return format_outcome(number, error=e, binary=binary)
+  return format_outcome(number, result, binary=binary)
+
+
+async def _run_records_async(
+  action_package: ActionPackage, records: Iterable[_Record], concurrency: int
+) -> list[_Outcome]:
+  semaphore = asyncio.Semaphore(concurrency)
+
+  async def run(number: int, line: str | bytes) -> _Outcome:
+    async with semaphore:
+      return await run_record_async(action_package, number, line)
+
+  return await asyncio.gather(*(run(number, line) for number, line in records))
+
+
+def is_concurrent(action_package: ActionPackage, concurrency: int) -> bool:
+  """Whether records can overlap, i.e. the handler is a coroutine and more than one is allowed."""
+  return concurrency > 1 and inspect.iscoroutinefunction(action_package.logic_module.handle)
+
+
+def _init_worker(root: Path, action: Path, path: list[str], concurrency: int) -> None:
+  global _worker_package, _worker_concurrency
+  sys.path[:] = path  # Workers that aren't forked need the deck on their import path too
+  _worker_package = LoadActionPackage(root=root, action=action).execute()
+  _worker_concurrency = concurrency
+
+
+def _run_chunk(chunk: tuple[tuple[int, str], ...]) -> _ChunkOutcome:
+  started = time.perf_counter()
+  action_package: ActionPackage = _worker_package  # type: ignore
+  if is_concurrent(action_package, _worker_concurrency):
+    outcomes = run_awaitable(_run_records_async(action_package, chunk, _worker_concurrency))
+  else:
+    outcomes = [run_record(action_package, number, line) for number, line in chunk]
+  return os.getpid(), time.perf_counter() - started, outcomes
+
+
+def _windowed(
+  submit: Callable[..., Future], items: Iterable, max_in_flight: int, ordered: bool
+) -> Iterator:
+  """Submit each item for a future, with at most `max_in_flight` of them pending at a time.
+
+  Results are yielded in input order, or as they complete if not `ordered`. Items are only taken
+  as fast as they're processed, so input can be streamed.
+  """
+  indexed_items = enumerate(items)
+  in_flight: dict[Future, int] = {}
+  finished: dict[int, object] = {}
+  next_index = 0
+
+  def submit_more():
+    while len(in_flight) < max_in_flight and (item := next(indexed_items, None)):
+      index, value = item
+      in_flight[submit(value)] = index
+
+  submit_more()
+  while in_flight:
+    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+    for future in done:
+      index = in_flight.pop(future)
+      if ordered:
+        finished[index] = future.result()
+      else:
+        yield future.result()
+    while next_index in finished:
+      yield finished.pop(next_index)
+      next_index += 1
+    submit_more()
+
+
+def _run_serial(action_package: ActionPackage, records: Iterable[_Record]):
+  for number, line in records:
+    yield run_record(action_package, number, line)
+
+
+def _run_concurrent(
+  command: InvokeActionPackageBatch, records: Iterable[_Record]
+) -> Iterator[_Outcome]:
+  """Overlap records on the shared event loop, with at most `concurrency` of them running."""
+  action_package = command.action_package
+  yield from _windowed(
+    lambda record: submit_awaitable(run_record_async(action_package, *record)),
+    records,
+    command.concurrency,
+    command.ordered,
+  )
+
+
+def _run_parallel(
+  command: InvokeActionPackageBatch,
+  records: Iterable[_Record],
+  usage: dict[int, list],
+) -> Iterator[_Outcome]:
+  """Run chunks of records in a pool of worker processes, recording each worker's usage.
+
+  At most two chunks per worker are in flight, so input is only read as fast as it's processed.
+  """
+  action_package = command.action_package
+  root = command.root or action_package.action_folder.parent
+  action = action_package.action_folder.relative_to(root)
+  chunk_size = command.chunk_size
+  if is_concurrent(action_package, command.concurrency):
+    chunk_size = max(chunk_size, command.concurrency)  # Give each worker enough to overlap
+
+  with ProcessPoolExecutor(
+    max_workers=command.jobs,
+    initializer=_init_worker,
+    initargs=(root, action, list(sys.path), command.concurrency),
+  ) as pool:
+    chunk_outcomes = _windowed(
+      lambda chunk: pool.submit(_run_chunk, chunk),
+      batched(records, chunk_size),
+      command.jobs * 2,
+      command.ordered,
+    )
+    for pid, busy, outcomes in chunk_outcomes:
+      worker_usage = usage.setdefault(pid, [0, 0.0])
+      worker_usage[0] += len(outcomes)
+      worker_usage[1] += busy
+      yield from outcomes
+
+
+def _report_throughput(count: int, elapsed: float, usage: dict[int, list]) -> None:
+  rate = count / elapsed if elapsed else 0.0
+  print(
+    f"Ran {count} record(s) in {elapsed:.2f}s ({rate:.1f}/s) across {len(usage)} worker(s)",
+    file=sys.stderr,
+  )
+  for pid, (records, busy) in sorted(usage.items()):
+    utilization = busy / elapsed * 100 if elapsed else 0.0
+    print(f"  worker {pid}: {records} record(s), {utilization:.0f}% busy", file=sys.stderr)
+
+
+def handle(command: InvokeActionPackageBatch) -> None:
+  logger.debug("Handling command=%r", command)
+  if command.jobs < 1:
+    raise ValueError("jobs must be at least 1")
+  if command.concurrency < 1:
+    raise ValueError("concurrency must be at least 1")
+
+  succeeded = failed = 0
+  usage: dict[int, list] = {}
+  started = time.perf_counter()
+  binary = command.format == "binary"
+  with open_source(command.source, binary) as source:
+    records = read_binary_records(source) if binary else read_records(source)
+    if command.jobs > 1:
+      outcomes = _run_parallel(command, records, usage)
+    elif is_concurrent(command.action_package, command.concurrency):
+      outcomes = _run_concurrent(command, records)
+    else:
+      outcomes = _run_serial(command.action_package, records)
+    for output, ok in outcomes:
+      if binary:
+        sys.stdout.buffer.write(output)  # type: ignore
+        sys.stdout.buffer.flush()
+      else:
+        print(output, flush=True)
+      succeeded += ok
+      failed += not ok
+
+  if command.jobs > 1:
+    _report_throughput(succeeded + failed, time.perf_counter() - started, usage)
+  logger.info(f"Batch finished: {succeeded} succeeded, {failed} failed")
+  if failed:
+    raise RuntimeError(f"{failed} of {succeeded + failed} record(s) failed")
@@ -1,36 +1,151 @@
 import importlib.util
 import logging
 import sys
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from types import ModuleType
 
 from scaf.action_package.entity import ActionPackage
 from scaf.action_package.load.command import LoadActionPackage
 from scaf.action_package.rules import must_contain_required_files
-from scaf.tools import compute_hash
+from scaf.cache.entity import CacheInfo
+from scaf.cache.tools import CachedSourceLoader, get_bytecode_file, get_bytecode_folder
+from scaf.tools import compute_hash, invalidate_fit_plans
 
 logger = logging.getLogger(__name__)
 
+CACHE_SIZE = 256
+"""How many loaded action packages to keep per process."""
 
-def _load_module_from_file(file: Path, hash: str = "") -> ModuleType:
+_PACKAGE_FILENAMES = ("__init__.py", "command.py", "query.py", "handler.py", "rules.py")
+
+_Signature = tuple[tuple[int, int] | None, ...]
+
+_cache: OrderedDict[Path, tuple[_Signature, ActionPackage]] = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_info = CacheInfo(maxsize=CACHE_SIZE)
+_load_locks: dict[Path, threading.Lock] = {}
+"""One per action folder, so only one thread at a time executes a package's modules."""
+
+_module_signatures: dict[str, tuple[int, int]] = {}
+"""(st_mtime_ns, st_size) of each module's file when it was last executed, by module name."""
+
+
+def _stat_file(file: Path) -> tuple[int, int]:
+  stat = file.stat()
+  return stat.st_mtime_ns, stat.st_size
+
+
+def find_canonical_name(file: Path) -> str | None:
+  """Return the dotted name `import` would load the file under, given the current `sys.path`.
+
+  Returns None if the file isn't importable, or the name resolves to a different file (e.g. an
+  identically named package elsewhere got imported first).
+  """
+  file = file.resolve()
+  for entry in sys.path:
+    try:
+      base = Path(entry or ".").resolve()
+    except OSError:
+      continue
+    if not file.is_relative_to(base):
+      continue
+
+    parts = file.relative_to(base).with_suffix("").parts
+    if parts and parts[-1] == "__init__":
+      parts = parts[:-1]
+    if not parts or not all(part.isidentifier() for part in parts):
+      continue
+
+    name = ".".join(parts)
+    try:
+      spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError) as e:
+      logger.debug(f"Can't import {file} as {name}: {e}")
+      continue
+    if spec and spec.origin and Path(spec.origin).resolve() == file:
+      return name
+  return None
+
+
+def _exec_module(module: ModuleType, file: Path) -> None:
+  module.__spec__.loader.exec_module(module)  # type: ignore
+  _module_signatures[module.__name__] = _stat_file(file)
+
+
+def _load_module_from_file(
+  file: Path, hash: str = "", bytecode_folder: Path | None = None, refresh: bool = False
+) -> ModuleType:
+  """Execute a module, or reuse it if it's already loaded and unchanged.
+
+  Modules are registered under their canonical dotted name when `sys.path` can import them, so
+  that a handler importing its shape module gets the very same module object. Otherwise they're
+  named after a hash of their path. A loaded module is executed again (in place) if its file
+  has changed, or `refresh` is set.
+
+  If a `bytecode_folder` is given, its compiled code is cached there rather than in `__pycache__`.
+  """
   if file.is_dir():
     file = file / "__init__.py"
 
   if not file.exists():
     raise RuntimeError(f"Module file does not exist: {file}")
 
-  hash = hash or compute_hash(file)
-  module_name = f"module_{hash}"
-  spec = importlib.util.spec_from_file_location(module_name, str(file))
+  module_name = find_canonical_name(file) or f"module_{hash or compute_hash(file)}"
+  if module := sys.modules.get(module_name):
+    recorded = _module_signatures.setdefault(module_name, _stat_file(file))
+    if refresh or recorded != _stat_file(file):
+      logger.debug(f"Re-executing {module_name} from {file}")
+      _exec_module(module, file)
+    return module
+
+  loader = None
+  if bytecode_folder:
+    loader = CachedSourceLoader(module_name, str(file), bytecode_folder)
+  is_package = file.name == "__init__.py"
+  spec = importlib.util.spec_from_file_location(
+    module_name,
+    str(file),
+    loader=loader,
+    submodule_search_locations=[str(file.parent)] if is_package else None,
+  )
   if not spec or not spec.loader:
     raise RuntimeError(f"Could not load module from {file}")
+  if bytecode_folder:
+    spec.cached = str(get_bytecode_file(bytecode_folder, file))
 
   module = importlib.util.module_from_spec(spec)
   sys.modules[module_name] = module
-  spec.loader.exec_module(module)
+  try:
+    _exec_module(module, file)
+  except BaseException:
+    del sys.modules[module_name]  # As `import` does, so a later attempt starts from scratch
+    raise
+
+  # As `import` does, so `parent.child` works after `import parent`
+  parent_name, _, child_name = module_name.rpartition(".")
+  if parent := sys.modules.get(parent_name):
+    setattr(parent, child_name, module)
   return module
 
 
+def find_duplicate_modules(folder: Path) -> dict[Path, list[str]]:
+  """Source files under the folder that have been executed as more than one module.
+
+  Each such file has distinct copies of its classes, so e.g. `isinstance` checks across them fail.
+  """
+  folder = folder.resolve()
+  names_by_file: dict[Path, list[str]] = {}
+  for name, module in list(sys.modules.items()):
+    if not (file := getattr(module, "__file__", None)):
+      continue
+    file = Path(file).resolve()
+    if file.is_relative_to(folder):
+      names_by_file.setdefault(file, []).append(name)
+  return {file: sorted(names) for file, names in names_by_file.items() if len(names) > 1}
+
+
 def ensure_action_folder(action_path: Path) -> Path:
   """in case we got a path to a file inside the action package"""
   if not action_path.exists():
@@ -40,37 +155,113 @@ def ensure_action_folder(action_path: Path) -> Path:
   return action_folder
 
 
-def load_init_module(action_folder: Path) -> ModuleType:
-  return _load_module_from_file(action_folder / "__init__.py")
+def load_init_module(
+  action_folder: Path, bytecode_folder: Path | None = None, refresh: bool = False
+) -> ModuleType:
+  return _load_module_from_file(action_folder / "__init__.py", "", bytecode_folder, refresh)
 
 
-def load_shape_module(action_folder: Path) -> ModuleType:
+def load_shape_module(
+  action_folder: Path, bytecode_folder: Path | None = None, refresh: bool = False
+) -> ModuleType:
   try:
-    return _load_module_from_file(action_folder / "command.py")
+    return _load_module_from_file(action_folder / "command.py", "", bytecode_folder, refresh)
   except RuntimeError as e:
     logger.debug(str(e))
     try:
-      return _load_module_from_file(action_folder / "query.py")
+      return _load_module_from_file(action_folder / "query.py", "", bytecode_folder, refresh)
     except RuntimeError:
       logger.debug(str(e))
       raise RuntimeError(f"Failed to load action shape module from {action_folder.as_posix()}")
 
 
-def load_logic_module(action_dir: Path) -> ModuleType:
-  return _load_module_from_file(action_dir / "handler.py")
+def load_logic_module(
+  action_dir: Path, bytecode_folder: Path | None = None, refresh: bool = False
+) -> ModuleType:
+  return _load_module_from_file(action_dir / "handler.py", "", bytecode_folder, refresh)
 
 
-def handle(command: LoadActionPackage) -> ActionPackage:
-  logger.debug(f"Handling {command=}")
-  action_folder = ensure_action_folder(command.root / command.action)
+def _stat_signature(action_folder: Path) -> _Signature:
+  """(st_mtime_ns, st_size) of each package file, or None for files that don't exist."""
+  signature = []
+  for filename in _PACKAGE_FILENAMES:
+    try:
+      stat = (action_folder / filename).stat()
+      signature.append((stat.st_mtime_ns, stat.st_size))
+    except OSError:
+      signature.append(None)
+  return tuple(signature)
+
+
+def cache_info() -> CacheInfo:
+  """Hit/miss counters for the loaded action package cache."""
+  with _cache_lock:
+    return CacheInfo(
+      hits=_cache_info.hits,
+      misses=_cache_info.misses,
+      maxsize=_cache_info.maxsize,
+      currsize=len(_cache),
+    )
+
+
+def cache_clear() -> None:
+  """Forget every loaded action package and reset the counters."""
+  with _cache_lock:
+    _cache.clear()
+    _cache_info.hits = _cache_info.misses = 0
+
+
+def _load(action_folder: Path, bytecode_folder: Path | None, refresh: bool) -> ActionPackage:
   must_contain_required_files([f.name for f in action_folder.iterdir()])
-  init_module = load_init_module(action_folder)
-  shape_module = load_shape_module(action_folder)
-  logic_module = load_logic_module(action_folder)
+  init_module = load_init_module(action_folder, bytecode_folder, refresh)
+  shape_module = load_shape_module(action_folder, bytecode_folder, refresh)
+  logic_module = load_logic_module(action_folder, bytecode_folder, refresh)
   logger.info(f"Action package loaded from {action_folder.as_posix()}")
+  if logger.isEnabledFor(logging.DEBUG):
+    for file, names in find_duplicate_modules(action_folder).items():
+      logger.debug(f"{file} has been executed as {len(names)} modules: {names}")
   return ActionPackage(
     action_folder=action_folder,
     init_module=init_module,
     shape_module=shape_module,
     logic_module=logic_module,
   )
+
+
+def handle(command: LoadActionPackage) -> ActionPackage:
+  logger.debug(f"Handling {command=}")
+  action_folder = ensure_action_folder(command.root / command.action)
+
+  # Only the package's own files are checked; modules it imports are left to sys.modules
+  key = action_folder.resolve()
+  signature = _stat_signature(action_folder)
+  with _cache_lock:
+    cached = _cache.get(key)
+    if cached and cached[0] == signature:
+      _cache.move_to_end(key)
+      _cache_info.hits += 1
+      return cached[1]
+    load_lock = _load_locks.setdefault(key, threading.Lock())
+
+  with load_lock:
+    with _cache_lock:
+      # Another thread may have loaded it while this one waited
+      cached = _cache.get(key)
+      if cached and cached[0] == signature:
+        _cache_info.hits += 1
+        return cached[1]
+      _cache_info.misses += 1
+
+    # If any file changed, re-execute them all, so the handler doesn't hold on to stale classes
+    refresh = cached is not None
+    if refresh:
+      invalidate_fit_plans()
+    action_package = _load(action_folder, get_bytecode_folder(command.root), refresh)
+
+    with _cache_lock:
+      _cache[key] = (signature, action_package)
+      _cache.move_to_end(key)
+      while len(_cache) > CACHE_SIZE:
+        evicted, _ = _cache.popitem(last=False)
+        logger.debug(f"Evicted action package {evicted.as_posix()} from cache")
+  return action_package
@@ -0,0 +1,139 @@
+import ast
+import logging
+import sys
+from importlib.machinery import PathFinder
+from pathlib import Path
+
+from scaf.action_package.entity import FieldMetadata, ShapeMetadata
+
+logger = logging.getLogger(__name__)
+
+SHAPE_FILENAMES = ("command.py", "query.py")
+
+
+def find_shape_file(action_folder: Path) -> Path | None:
+  """Return the `command.py` (preferred) or `query.py` in the action folder, if any."""
+  for filename in SHAPE_FILENAMES:
+    shape_file = action_folder / filename
+    if shape_file.is_file():
+      return shape_file
+  return None
+
+
+def _parse(source_file: Path) -> ast.Module | None:
+  try:
+    return ast.parse(source_file.read_bytes(), filename=str(source_file))
+  except (OSError, SyntaxError, ValueError) as e:
+    logger.debug(f"Failed to parse {source_file}: {e}")
+    return None
+
+
+def _is_dataclass_decorator(node: ast.expr) -> bool:
+  if isinstance(node, ast.Call):
+    node = node.func
+  if isinstance(node, ast.Name):
+    return node.id == "dataclass"
+  return isinstance(node, ast.Attribute) and node.attr == "dataclass"
+
+
+def _is_field_call(node: ast.expr | None) -> bool:
+  if not isinstance(node, ast.Call):
+    return False
+  func = node.func
+  return (isinstance(func, ast.Name) and func.id == "field") or (
+    isinstance(func, ast.Attribute) and func.attr == "field"
+  )
+
+
+def _read_field(node: ast.AnnAssign, next_node: ast.stmt | None) -> FieldMetadata | None:
+  if not isinstance(node.target, ast.Name) or node.target.id.startswith("_"):
+    return None
+  annotation = ast.unparse(node.annotation)
+  if annotation.startswith(("ClassVar", "typing.ClassVar", "InitVar", "dataclasses.InitVar")):
+    return None
+
+  default = None
+  doc = ""
+  if _is_field_call(node.value):
+    for keyword in node.value.keywords:
+      if keyword.arg == "default":
+        default = ast.unparse(keyword.value)
+      elif keyword.arg == "default_factory":
+        default = "<factory>"
+      elif keyword.arg == "doc" and isinstance(keyword.value, ast.Constant):
+        doc = str(keyword.value.value)
+  elif node.value is not None:
+    default = ast.unparse(node.value)
+
+  # Attribute docstrings, i.e. a bare string literal right below the field
+  if (
+    not doc
+    and isinstance(next_node, ast.Expr)
+    and isinstance(next_node.value, ast.Constant)
+    and isinstance(next_node.value.value, str)
+  ):
+    doc = next_node.value.value.strip()
+
+  return FieldMetadata(name=node.target.id, annotation=annotation, default=default, doc=doc)
+
+
+def read_shape_metadata(shape_file: Path) -> ShapeMetadata | None:
+  """Parse a shape module and describe its first public dataclass, without importing anything.
+
+  Returns None if the file can't be parsed or has no such class.
+  """
+  tree = _parse(shape_file)
+  if tree is None:
+    return None
+
+  for node in tree.body:
+    if not isinstance(node, ast.ClassDef) or node.name.startswith("_"):
+      continue
+    if not any(_is_dataclass_decorator(d) for d in node.decorator_list):
+      continue
+
+    fields = []
+    for i, stmt in enumerate(node.body):
+      if isinstance(stmt, ast.AnnAssign):
+        next_stmt = node.body[i + 1] if i + 1 < len(node.body) else None
+        if field_metadata := _read_field(stmt, next_stmt):
+          fields.append(field_metadata)
+
+    return ShapeMetadata(
+      shape_file=shape_file,
+      name=node.name,
+      doc=ast.get_docstring(node) or ast.get_docstring(tree) or "",
+      fields=fields,
+    )
+
+  logger.debug(f"No dataclass found in {shape_file}")
+  return None
+
+
+def find_unresolved_imports(source_file: Path) -> list[str]:
+  """List modules imported at the top level of a file that can't be found on `sys.path`.
+
+  Only the top-level package of each absolute import is looked up, and nothing is imported.
+  Imports guarded by `try` or `if` are assumed to be optional, so they're not checked.
+  """
+  tree = _parse(source_file)
+  if tree is None:
+    return []
+
+  unresolved = []
+  for node in tree.body:
+    if isinstance(node, ast.Import):
+      names = [alias.name for alias in node.names]
+    elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+      names = [node.module]
+    else:
+      continue
+
+    for name in names:
+      top_level = name.partition(".")[0]
+      if top_level in sys.modules or top_level in sys.builtin_module_names:
+        continue
+      if PathFinder.find_spec(top_level) is None:
+        unresolved.append(name)
+
+  return unresolved
@@ -5,7 +5,7 @@ from scaf.core import Shape
 
 
 @dataclass
-class Alias(Shape):
+class Alias(Shape, codegen=True):
   name: str
   action: Path
   root: Path
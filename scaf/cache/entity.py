@@ -0,0 +1,38 @@
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+@dataclass
+class CacheInfo:
+  """Counters for an in-process cache, in the spirit of `functools.lru_cache`."""
+
+  hits: int = field(default=0, doc="Lookups answered from the cache.")
+  misses: int = field(default=0, doc="Lookups that had to (re)load the value.")
+  maxsize: int = field(default=0, doc="How many values the cache holds before evicting.")
+  currsize: int = field(default=0, doc="How many values the cache holds right now.")
+
+
+@dataclass
+class BytecodeEntry:
+  """A compiled module in a deck's bytecode cache, as described by its header."""
+
+  bytecode_file: Path = field(doc="Where the compiled code is stored.")
+  source_file: Path = field(doc="The module it was compiled from.")
+  mtime_ns: int = field(doc="st_mtime_ns of the source file when it was compiled.")
+  size: int = field(doc="st_size of the source file when it was compiled.")
+  magic: bytes = field(doc="importlib's magic number for the Python that compiled it.")
+
+
+@dataclass
+class ResultEntry:
+  """A query result in a deck's result cache, as described by its header."""
+
+  result_file: Path = field(doc="Where the encoded result is stored.")
+  created_at: float = field(doc="When the result was stored, in seconds since the epoch.")
+  expires_at: float = field(doc="When the result stops being served, in seconds since the epoch.")
+  size: int = field(doc="st_size of the result file.")
+
+  @property
+  def expired(self) -> bool:
+    return self.expires_at <= time.time()
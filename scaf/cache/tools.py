@@ -0,0 +1,376 @@
+import dataclasses
+import fcntl
+import importlib.machinery
+import importlib.util
+import logging
+import marshal
+import os
+import struct
+import sys
+import threading
+import time
+from hashlib import sha256
+from pathlib import Path
+
+from scaf.cache.entity import BytecodeEntry, CacheInfo, ResultEntry
+from scaf.codec.binary import decode, encode
+from scaf.config import CACHE_FOLDER_NAME, SCAF_FOLDER_NAME
+
+logger = logging.getLogger(__name__)
+
+BYTECODE_FOLDER_NAME = "bytecode"
+
+_HEADER = struct.Struct("<4sqqI")
+"""Magic number, source st_mtime_ns, source st_size, then the length of the source path."""
+
+
+def get_bytecode_folder(root: Path) -> Path | None:
+  """Where to cache bytecode for modules under a deck, or None if the root isn't a deck."""
+  scaf_folder = root / SCAF_FOLDER_NAME
+  if not scaf_folder.is_dir():
+    return None
+  return scaf_folder / CACHE_FOLDER_NAME / BYTECODE_FOLDER_NAME
+
+
+def get_bytecode_file(bytecode_folder: Path, source_file: Path) -> Path:
+  key = sha256(source_file.as_posix().encode("utf-8")).hexdigest()[:32]
+  return bytecode_folder / f"{key}.pyc"
+
+
+def _read_header(data: bytes, bytecode_file: Path) -> tuple[BytecodeEntry, int]:
+  """Returns the entry and the offset of the marshalled code. Raises ValueError if truncated."""
+  try:
+    magic, mtime_ns, size, path_length = _HEADER.unpack_from(data)
+  except struct.error as e:
+    raise ValueError(f"Truncated header in {bytecode_file}") from e
+  end = _HEADER.size + path_length
+  if len(data) < end:
+    raise ValueError(f"Truncated header in {bytecode_file}")
+  source_file = Path(data[_HEADER.size : end].decode("utf-8", errors="surrogateescape"))
+  entry = BytecodeEntry(
+    bytecode_file=bytecode_file,
+    source_file=source_file,
+    mtime_ns=mtime_ns,
+    size=size,
+    magic=magic,
+  )
+  return entry, end
+
+
+def read_bytecode_entry(bytecode_file: Path) -> BytecodeEntry | None:
+  try:
+    with bytecode_file.open("rb") as f:
+      data = f.read(_HEADER.size)
+      if len(data) == _HEADER.size:
+        data += f.read(_HEADER.unpack(data)[-1])  # Just the source path, not the code
+    entry, _ = _read_header(data, bytecode_file)
+    return entry
+  except (OSError, ValueError) as e:
+    logger.debug(f"Unreadable bytecode cache entry {bytecode_file}: {e}")
+    return None
+
+
+def is_stale(entry: BytecodeEntry) -> bool:
+  """True if the entry can no longer be used, i.e. its source changed or Python was upgraded."""
+  if entry.magic != importlib.util.MAGIC_NUMBER:
+    return True
+  try:
+    stat = entry.source_file.stat()
+  except OSError:
+    return True
+  return (stat.st_mtime_ns, stat.st_size) != (entry.mtime_ns, entry.size)
+
+
+def scan_bytecode_cache(bytecode_folder: Path) -> list[tuple[Path, BytecodeEntry | None]]:
+  """Every file in the bytecode folder, with its entry (None if it's unreadable)."""
+  if not bytecode_folder.is_dir():
+    return []
+  return [(file, read_bytecode_entry(file)) for file in sorted(bytecode_folder.glob("*.pyc"))]
+
+
+class CachedSourceLoader(importlib.machinery.SourceFileLoader):
+  """Loads a module from source, caching its compiled code in a scaf-managed folder.
+
+  Entries are keyed by the source path and validated against its st_mtime_ns and st_size,
+  so hash-named modules are cached regardless of the name they're loaded under.
+  """
+
+  def __init__(self, fullname: str, path: str, bytecode_folder: Path):
+    super().__init__(fullname, path)
+    self.bytecode_folder = bytecode_folder
+
+  def get_code(self, fullname):
+    source_path = self.get_filename(fullname)
+    source_file = Path(source_path)
+    stat = source_file.stat()
+    bytecode_file = get_bytecode_file(self.bytecode_folder, source_file)
+
+    if (code := self._read_code(bytecode_file, source_file, stat)) is not None:
+      logger.debug(f"Using cached bytecode for {source_path}")
+      return code
+
+    code = self.source_to_code(self.get_data(source_path), source_path)
+    if not sys.dont_write_bytecode:
+      self._write_code(bytecode_file, source_file, stat, code)
+    return code
+
+  @staticmethod
+  def _read_code(bytecode_file: Path, source_file: Path, stat: os.stat_result):
+    try:
+      data = bytecode_file.read_bytes()
+      entry, offset = _read_header(data, bytecode_file)
+    except FileNotFoundError:
+      return None
+    except (OSError, ValueError) as e:
+      logger.debug(f"Ignoring bytecode cache entry {bytecode_file}: {e}")
+      return None
+    if (
+      entry.magic != importlib.util.MAGIC_NUMBER
+      or entry.source_file != source_file
+      or (entry.mtime_ns, entry.size) != (stat.st_mtime_ns, stat.st_size)
+    ):
+      return None
+    try:
+      return marshal.loads(memoryview(data)[offset:])
+    except (EOFError, ValueError, TypeError) as e:
+      logger.debug(f"Ignoring corrupt bytecode cache entry {bytecode_file}: {e}")
+      return None
+
+  @staticmethod
+  def _write_code(bytecode_file: Path, source_file: Path, stat: os.stat_result, code) -> None:
+    path_bytes = source_file.as_posix().encode("utf-8", errors="surrogateescape")
+    header = _HEADER.pack(
+      importlib.util.MAGIC_NUMBER, stat.st_mtime_ns, stat.st_size, len(path_bytes)
+    )
+    # Write-then-rename, so concurrent loaders never see a partial file
+    tmp_file = bytecode_file.with_name(
+      f".{bytecode_file.name}.{os.getpid()}.{threading.get_ident()}"
+    )
+    try:
+      bytecode_file.parent.mkdir(parents=True, exist_ok=True)
+      tmp_file.write_bytes(header + path_bytes + marshal.dumps(code))
+      os.replace(tmp_file, bytecode_file)
+    except OSError as e:
+      logger.debug(f"Failed to cache bytecode for {source_file}: {e}")
+      tmp_file.unlink(missing_ok=True)
+
+
+RESULTS_FOLDER_NAME = "results"
+RESULT_STATS_FILENAME = "stats"
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+"""Least recently used results are evicted once the folder grows past this."""
+
+_RESULT_SUFFIX = ".result"
+
+_RESULT_HEADER = struct.Struct("<dd")
+"""When the result was stored, and when it expires (both in seconds since the epoch)."""
+
+_RESULT_STATS = struct.Struct("<QQ")
+"""How many result lookups were hits, then how many were misses."""
+
+
+def get_results_folder(root: Path) -> Path | None:
+  """Where to cache query results for actions under a deck, or None if the root isn't a deck."""
+  scaf_folder = root / SCAF_FOLDER_NAME
+  if not scaf_folder.is_dir():
+    return None
+  return scaf_folder / CACHE_FOLDER_NAME / RESULTS_FOLDER_NAME
+
+
+def get_cache_ttl(shape_class: type) -> float | None:
+  """How long results of the shape's action stay fresh, in seconds, or None if they aren't cached."""
+  return getattr(shape_class, "__scaf_cache_ttl__", None)
+
+
+def hash_action_sources(action_folder: Path) -> str:
+  """A digest of every module in the action's package, so editing any of them busts its results."""
+  digest = sha256()
+  for source_file in sorted(action_folder.glob("*.py")):
+    digest.update(source_file.name.encode("utf-8"))
+    digest.update(sha256(source_file.read_bytes()).digest())
+  return digest.hexdigest()
+
+
+def get_result_key(action_folder: Path, canonical: str) -> str:
+  """Key a result by the action's sources and the canonical JSON of the shape it was called with."""
+  digest = sha256(hash_action_sources(action_folder).encode("ascii"))
+  digest.update(canonical.encode("utf-8"))
+  return digest.hexdigest()[:32]
+
+
+def get_result_file(results_folder: Path, key: str) -> Path:
+  return results_folder / f"{key}{_RESULT_SUFFIX}"
+
+
+def _get_class_name(result) -> str:
+  """Where to find the result's dataclass when decoding it, or "" if it isn't one."""
+  if not dataclasses.is_dataclass(result) or isinstance(result, type):
+    return ""
+  cls = type(result)
+  return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _find_loaded_class(name: str) -> type | None:
+  """The dataclass `_get_class_name` named, if its module is already loaded.
+
+  Nothing is imported, so an entry can only name classes the process has loaded anyway.
+  """
+  module_name, _, qualname = name.partition(":")
+  found = sys.modules.get(module_name)
+  for part in qualname.split("."):
+    found = getattr(found, part, None)
+  return found if isinstance(found, type) and dataclasses.is_dataclass(found) else None
+
+
+def read_result_entry(result_file: Path) -> ResultEntry | None:
+  try:
+    with result_file.open("rb") as f:
+      created_at, expires_at = _RESULT_HEADER.unpack(f.read(_RESULT_HEADER.size))
+    size = result_file.stat().st_size
+  except (OSError, struct.error) as e:
+    logger.debug(f"Unreadable result cache entry {result_file}: {e}")
+    return None
+  return ResultEntry(
+    result_file=result_file, created_at=created_at, expires_at=expires_at, size=size
+  )
+
+
+def read_cached_result(results_folder: Path, key: str) -> tuple[bool, object]:
+  """Returns (True, result) for a fresh entry, or (False, None) if it's missing or expired."""
+  result_file = get_result_file(results_folder, key)
+  try:
+    data = result_file.read_bytes()
+    _, expires_at = _RESULT_HEADER.unpack_from(data)
+  except FileNotFoundError:
+    return False, None
+  except (OSError, struct.error) as e:
+    logger.debug(f"Ignoring result cache entry {result_file}: {e}")
+    return False, None
+  if expires_at <= time.time():
+    result_file.unlink(missing_ok=True)
+    return False, None
+  try:
+    envelope = decode(memoryview(data)[_RESULT_HEADER.size :])
+    as_type = None
+    if envelope["class"] and not (as_type := _find_loaded_class(envelope["class"])):
+      raise ValueError(f"{envelope['class']} isn't loaded")
+    result = decode(envelope["result"], as_type)
+  except (ValueError, TypeError, KeyError) as e:
+    logger.debug(f"Ignoring unusable result cache entry {result_file}: {e}")
+    return False, None
+  try:
+    os.utime(result_file)  # Mark it as recently used, for eviction
+  except OSError:
+    pass
+  return True, result
+
+
+def write_cached_result(results_folder: Path, key: str, result, ttl: float) -> bool:
+  """Store a result until `ttl` seconds from now. Returns False if it can't be encoded."""
+  class_name = _get_class_name(result)
+  try:
+    if class_name and not _find_loaded_class(class_name):
+      raise TypeError(f"{class_name} can't be found by name")
+    payload = encode({"class": class_name, "result": encode(result)})
+  except (TypeError, ValueError) as e:
+    logger.debug(f"Not caching result for {key}: {e}")
+    return False
+  now = time.time()
+  result_file = get_result_file(results_folder, key)
+  # Write-then-rename, so concurrent readers never see a partial file
+  tmp_file = result_file.with_name(f".{result_file.name}.{os.getpid()}.{threading.get_ident()}")
+  try:
+    results_folder.mkdir(parents=True, exist_ok=True)
+    tmp_file.write_bytes(_RESULT_HEADER.pack(now, now + ttl) + payload)
+    os.replace(tmp_file, result_file)
+  except OSError as e:
+    logger.debug(f"Failed to cache result for {key}: {e}")
+    tmp_file.unlink(missing_ok=True)
+    return False
+  return True
+
+
+def evict_results(results_folder: Path, max_bytes: int = RESULT_CACHE_MAX_BYTES) -> int:
+  """Delete the least recently used results until the folder fits in `max_bytes`.
+
+  Returns how many were deleted.
+  """
+  entries = []
+  total = 0
+  try:
+    with os.scandir(results_folder) as it:
+      for entry in it:
+        is_stats = entry.name == RESULT_STATS_FILENAME
+        if not (is_stats or entry.name.endswith(_RESULT_SUFFIX)):
+          continue
+        try:
+          stat = entry.stat()
+        except OSError:
+          continue  # Removed by another process
+        total += stat.st_size
+        if is_stats:
+          continue  # Counts towards the budget, but is never evicted
+        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+  except OSError:
+    return 0
+
+  evicted = 0
+  for _, size, path in sorted(entries):
+    if total <= max_bytes:
+      break
+    logger.debug(f"Evicting cached result {path}")
+    Path(path).unlink(missing_ok=True)
+    total -= size
+    evicted += 1
+  return evicted
+
+
+def scan_result_cache(results_folder: Path) -> list[tuple[Path, ResultEntry | None]]:
+  """Every result in the results folder, with its entry (None if it's unreadable)."""
+  if not results_folder.is_dir():
+    return []
+  return [
+    (file, read_result_entry(file)) for file in sorted(results_folder.glob(f"*{_RESULT_SUFFIX}"))
+  ]
+
+
+def read_result_stats(results_folder: Path) -> CacheInfo:
+  try:
+    with open(results_folder / RESULT_STATS_FILENAME, "rb") as f:
+      fcntl.flock(f, fcntl.LOCK_SH)
+      hits, misses = _RESULT_STATS.unpack(f.read(_RESULT_STATS.size))
+  except FileNotFoundError:
+    return CacheInfo(hits=0, misses=0)
+  except (OSError, struct.error) as e:
+    logger.debug(f"Failed to read result cache stats: {e}")
+    return CacheInfo(hits=0, misses=0)
+  return CacheInfo(hits=hits, misses=misses)
+
+
+def record_result_lookup(results_folder: Path, hit: bool) -> None:
+  """Count a lookup towards the hit rate reported by `scaf cache`.
+
+  Both counts live in one small file, updated in place under a lock so concurrent calls don't lose
+  each other's counts.
+  """
+  stats_file = results_folder / RESULT_STATS_FILENAME
+  flags = os.O_RDWR | os.O_CREAT
+  try:
+    try:
+      fd = os.open(stats_file, flags, 0o644)
+    except FileNotFoundError:
+      results_folder.mkdir(parents=True, exist_ok=True)
+      fd = os.open(stats_file, flags, 0o644)
+    try:
+      fcntl.flock(fd, fcntl.LOCK_EX)
+      data = os.pread(fd, _RESULT_STATS.size, 0)
+      hits, misses = _RESULT_STATS.unpack(data) if len(data) == _RESULT_STATS.size else (0, 0)
+      os.pwrite(fd, _RESULT_STATS.pack(hits + hit, misses + (not hit)), 0)
+    finally:
+      os.close(fd)  # Also releases the lock
+  except OSError as e:
+    logger.debug(f"Failed to record result cache lookup: {e}")
+
+
+def clear_result_stats(results_folder: Path) -> None:
+  (results_folder / RESULT_STATS_FILENAME).unlink(missing_ok=True)
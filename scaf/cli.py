@@ -20,21 +20,33 @@ def _discover_user_actions() -> list[Path]:
 
 
 def _print_help(actions: list[Path]) -> None:
-  from scaf.action_package.load.command import LoadActionPackage
+  from scaf.action_package.tools import find_shape_file, read_shape_metadata
 
   print("Usage: scaf [-v] <command> [args...]")
   print()
   print("Available commands:")
   for action in actions:
-    try:
-      pkg = LoadActionPackage(root=USER_ROOT, action=action).execute()
-      doc = (pkg.shape_class.__doc__ or "").strip().splitlines()[0]
-    except Exception:
-      doc = ""
+    shape_file = find_shape_file(USER_ROOT / action)
+    metadata = read_shape_metadata(shape_file) if shape_file else None
+    doc = metadata.summary if metadata else ""
     print(f"  {action.as_posix():<20} {doc}")
 
 
 def main(argv=None):
+  argv = argv or sys.argv[1:]
+
+  from scaf.user.daemon.tools import forward_to_daemon
+
+  if (code := forward_to_daemon(argv)) is not None:
+    if code:
+      sys.exit(code)
+    return
+
+  dispatch(argv)
+
+
+def dispatch(argv: list[str]) -> None:
+  """Run a scaf command in this process."""
   # Parse global flags only; leave everything else for action dispatch
   flag_parser = argparse.ArgumentParser(add_help=False, prog="scaf")
   flag_parser.add_argument(
@@ -44,7 +56,7 @@ def main(argv=None):
     dest="verbose",
     help="Increase output verbosity (can be used multiple times).",
   )
-  flag_args, remaining = flag_parser.parse_known_args(argv or sys.argv[1:])
+  flag_args, remaining = flag_parser.parse_known_args(argv)
   configure_logging(flag_args.verbose or int(os.getenv("SCAF_VERBOSITY", 0)))
 
   actions = _discover_user_actions()
@@ -0,0 +1,505 @@
+"""A compact binary encoding for dataclasses, laid out from the types of their fields.
+
+A dataclass is written as its field values in order, without keys: plain `int`, `float` and
+`bool` fields are packed together up front by one `struct`, then the other fields follow, each
+encoded according to its annotation. Values whose type isn't known from an annotation (e.g. `Any`,
+unions, or a bare `list`) are written with a one-byte tag in front, so they decode on their own.
+
+Decoding needs the same dataclass the value was encoded from. `bytes` values are decoded as
+`memoryview` slices of the input rather than copies.
+"""
+
+import dataclasses
+import logging
+import struct
+import types
+import typing
+from collections.abc import Callable, Iterator
+from datetime import datetime
+from pathlib import Path, PurePath
+from typing import IO, Any, get_args, get_origin
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/x-scaf-binary"
+
+_FRAME_HEADER = struct.Struct("<I")
+_INT = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+
+_Buffer = bytearray
+_Encode = Callable[[_Buffer, Any], None]
+_Decode = Callable[[memoryview, int], tuple[Any, int]]
+
+# Tags for values written without a known type
+_NONE, _FALSE, _TRUE, _SMALL_INT, _BIG_INT, _FLOAT_TAG, _STR, _BYTES = range(8)
+_LIST, _DICT, _UUID, _DATETIME, _PATH = range(8, 13)
+
+
+class _Codec:
+  """How to encode and decode values of one type; filled in after creation for dataclasses."""
+
+  __slots__ = ("decode", "encode")
+
+  def __init__(self, encode: _Encode | None = None, decode: _Decode | None = None):
+    self.encode = encode
+    self.decode = decode
+
+
+# Variable-length unsigned ints, for lengths and counts
+
+
+def _write_size(buf: _Buffer, n: int) -> None:
+  while n >= 0x80:
+    buf.append((n & 0x7F) | 0x80)
+    n >>= 7
+  buf.append(n)
+
+
+def _read_size(data: memoryview, pos: int) -> tuple[int, int]:
+  byte = data[pos]
+  if byte < 0x80:
+    return byte, pos + 1
+  n = shift = 0
+  while True:
+    byte = data[pos]
+    pos += 1
+    n |= (byte & 0x7F) << shift
+    if byte < 0x80:
+      return n, pos
+    shift += 7
+
+
+# Codecs for values of a known type
+
+
+def _encode_str(buf: _Buffer, value: str) -> None:
+  raw = value.encode("utf-8")
+  _write_size(buf, len(raw))
+  buf += raw
+
+
+def _decode_str(data: memoryview, pos: int) -> tuple[str, int]:
+  n, pos = _read_size(data, pos)
+  return str(data[pos : pos + n], "utf-8"), pos + n
+
+
+def _encode_bytes(buf: _Buffer, value: bytes) -> None:
+  _write_size(buf, len(value))
+  buf += value
+
+
+def _decode_bytes(data: memoryview, pos: int) -> tuple[memoryview, int]:
+  n, pos = _read_size(data, pos)
+  return data[pos : pos + n], pos + n
+
+
+def _encode_int(buf: _Buffer, value: int) -> None:
+  buf += _INT.pack(value)
+
+
+def _decode_int(data: memoryview, pos: int) -> tuple[int, int]:
+  return _INT.unpack_from(data, pos)[0], pos + _INT.size
+
+
+def _encode_float(buf: _Buffer, value: float) -> None:
+  buf += _FLOAT.pack(value)
+
+
+def _decode_float(data: memoryview, pos: int) -> tuple[float, int]:
+  return _FLOAT.unpack_from(data, pos)[0], pos + _FLOAT.size
+
+
+def _encode_bool(buf: _Buffer, value: bool) -> None:
+  buf.append(1 if value else 0)
+
+
+def _decode_bool(data: memoryview, pos: int) -> tuple[bool, int]:
+  return data[pos] != 0, pos + 1
+
+
+def _encode_uuid(buf: _Buffer, value: UUID) -> None:
+  buf += value.bytes
+
+
+def _decode_uuid(data: memoryview, pos: int) -> tuple[UUID, int]:
+  return UUID(bytes=bytes(data[pos : pos + 16])), pos + 16
+
+
+def _encode_datetime(buf: _Buffer, value: datetime) -> None:
+  _encode_str(buf, value.isoformat())
+
+
+def _decode_datetime(data: memoryview, pos: int) -> tuple[datetime, int]:
+  text, pos = _decode_str(data, pos)
+  return datetime.fromisoformat(text), pos
+
+
+def _encode_path(buf: _Buffer, value: PurePath) -> None:
+  _encode_str(buf, value.as_posix())
+
+
+def _decode_path(data: memoryview, pos: int) -> tuple[Path, int]:
+  text, pos = _decode_str(data, pos)
+  return Path(text), pos
+
+
+_SCALAR_CODECS: dict[type, _Codec] = {
+  str: _Codec(_encode_str, _decode_str),
+  bytes: _Codec(_encode_bytes, _decode_bytes),
+  int: _Codec(_encode_int, _decode_int),
+  float: _Codec(_encode_float, _decode_float),
+  bool: _Codec(_encode_bool, _decode_bool),
+  UUID: _Codec(_encode_uuid, _decode_uuid),
+  datetime: _Codec(_encode_datetime, _decode_datetime),
+  Path: _Codec(_encode_path, _decode_path),
+  PurePath: _Codec(_encode_path, _decode_path),
+}
+
+_FIXED_FORMATS = {int: "q", float: "d", bool: "?"}
+"""Field types that are packed together at the start of a dataclass."""
+
+
+# Tagged values, for when the type isn't known up front
+
+
+def _encode_any(buf: _Buffer, value) -> None:
+  cls = value.__class__
+  if value is None:
+    buf.append(_NONE)
+  elif cls is bool:
+    buf.append(_TRUE if value else _FALSE)
+  elif isinstance(value, int):
+    try:
+      packed = _INT.pack(value)
+      buf.append(_SMALL_INT)
+      buf += packed
+    except struct.error:
+      raw = value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+      buf.append(_BIG_INT)
+      _encode_bytes(buf, raw)
+  elif isinstance(value, float):
+    buf.append(_FLOAT_TAG)
+    buf += _FLOAT.pack(value)
+  elif isinstance(value, str):
+    buf.append(_STR)
+    _encode_str(buf, value)
+  elif isinstance(value, (bytes, bytearray, memoryview)):
+    buf.append(_BYTES)
+    _encode_bytes(buf, value)
+  elif isinstance(value, (list, tuple, set, frozenset)):
+    buf.append(_LIST)
+    _write_size(buf, len(value))
+    for item in value:
+      _encode_any(buf, item)
+  elif isinstance(value, dict):
+    buf.append(_DICT)
+    _write_size(buf, len(value))
+    for key, item in value.items():
+      _encode_any(buf, key)
+      _encode_any(buf, item)
+  elif isinstance(value, UUID):
+    buf.append(_UUID)
+    buf += value.bytes
+  elif isinstance(value, datetime):
+    buf.append(_DATETIME)
+    _encode_datetime(buf, value)
+  elif isinstance(value, PurePath):
+    buf.append(_PATH)
+    _encode_path(buf, value)
+  elif dataclasses.is_dataclass(value):
+    # Whoever decodes this doesn't know the class, so keep the field names
+    _encode_any(buf, {f.name: getattr(value, f.name) for f in dataclasses.fields(value)})
+  else:
+    raise TypeError(f"Object of type {cls.__name__} can't be encoded")
+
+
+def _decode_any(data: memoryview, pos: int) -> tuple[Any, int]:
+  tag = data[pos]
+  pos += 1
+  if tag == _NONE:
+    return None, pos
+  if tag == _FALSE or tag == _TRUE:
+    return tag == _TRUE, pos
+  if tag == _SMALL_INT:
+    return _decode_int(data, pos)
+  if tag == _BIG_INT:
+    raw, pos = _decode_bytes(data, pos)
+    return int.from_bytes(raw, "little", signed=True), pos
+  if tag == _FLOAT_TAG:
+    return _decode_float(data, pos)
+  if tag == _STR:
+    return _decode_str(data, pos)
+  if tag == _BYTES:
+    return _decode_bytes(data, pos)
+  if tag == _LIST:
+    n, pos = _read_size(data, pos)
+    items = []
+    for _ in range(n):
+      item, pos = _decode_any(data, pos)
+      items.append(item)
+    return items, pos
+  if tag == _DICT:
+    n, pos = _read_size(data, pos)
+    mapping = {}
+    for _ in range(n):
+      key, pos = _decode_any(data, pos)
+      mapping[key], pos = _decode_any(data, pos)
+    return mapping, pos
+  if tag == _UUID:
+    return _decode_uuid(data, pos)
+  if tag == _DATETIME:
+    return _decode_datetime(data, pos)
+  if tag == _PATH:
+    return _decode_path(data, pos)
+  raise ValueError(f"Unknown tag {tag} at byte {pos - 1}")
+
+
+_ANY_CODEC = _Codec(_encode_any, _decode_any)
+
+
+# Codecs built from type annotations
+
+
+def _optional_codec(codec: _Codec) -> _Codec:
+  encode_value, decode_value = codec.encode, codec.decode
+
+  def encode(buf: _Buffer, value) -> None:
+    if value is None:
+      buf.append(0)
+    else:
+      buf.append(1)
+      encode_value(buf, value)  # type: ignore
+
+  def decode(data: memoryview, pos: int):
+    if data[pos] == 0:
+      return None, pos + 1
+    return decode_value(data, pos + 1)  # type: ignore
+
+  return _Codec(encode, decode)
+
+
+def _sequence_codec(item_codec: _Codec, into: type) -> _Codec:
+  def encode(buf: _Buffer, value) -> None:
+    _write_size(buf, len(value))
+    encode_item = item_codec.encode
+    for item in value:
+      encode_item(buf, item)  # type: ignore
+
+  def decode(data: memoryview, pos: int):
+    n, pos = _read_size(data, pos)
+    decode_item = item_codec.decode
+    items = []
+    for _ in range(n):
+      item, pos = decode_item(data, pos)  # type: ignore
+      items.append(item)
+    return (items if into is list else into(items)), pos
+
+  return _Codec(encode, decode)
+
+
+def _mapping_codec(key_codec: _Codec, value_codec: _Codec) -> _Codec:
+  def encode(buf: _Buffer, value: dict) -> None:
+    _write_size(buf, len(value))
+    for key, item in value.items():
+      key_codec.encode(buf, key)  # type: ignore
+      value_codec.encode(buf, item)  # type: ignore
+
+  def decode(data: memoryview, pos: int):
+    n, pos = _read_size(data, pos)
+    mapping = {}
+    for _ in range(n):
+      key, pos = key_codec.decode(data, pos)  # type: ignore
+      mapping[key], pos = value_codec.decode(data, pos)  # type: ignore
+    return mapping, pos
+
+  return _Codec(encode, decode)
+
+
+def codec_for(annotation) -> _Codec:
+  """Return the codec for values annotated with a type, falling back to tagged values."""
+  if annotation in _SCALAR_CODECS:
+    return _SCALAR_CODECS[annotation]
+  if isinstance(annotation, type) and dataclasses.is_dataclass(annotation):
+    return dataclass_codec(annotation)
+
+  origin = get_origin(annotation)
+  args = get_args(annotation)
+  if origin in (typing.Union, types.UnionType):
+    others = [a for a in args if a is not type(None)]
+    if len(others) == 1 and len(args) == 2:
+      return _optional_codec(codec_for(others[0]))
+  elif origin in (list, set, frozenset) and len(args) == 1:
+    return _sequence_codec(codec_for(args[0]), origin)
+  elif origin is tuple and len(args) == 2 and args[1] is Ellipsis:
+    return _sequence_codec(codec_for(args[0]), tuple)
+  elif origin is dict and len(args) == 2:
+    return _mapping_codec(codec_for(args[0]), codec_for(args[1]))
+  return _ANY_CODEC
+
+
+_dataclass_codecs: dict[type, _Codec] = {}
+
+
+def _field_types(cls: type) -> dict[str, Any]:
+  try:
+    return typing.get_type_hints(cls)
+  except (NameError, TypeError) as e:
+    # Unresolved string annotations won't match any codec, so those fields get tags
+    logger.debug("Failed to resolve annotations of %s: %s", cls.__qualname__, e)
+    return {f.name: f.type for f in dataclasses.fields(cls)}
+
+
+def _raise_encode_error(class_name: str, field_name: str, e: Exception):
+  raise TypeError(f"Can't encode {class_name}.{field_name}: {e}") from e
+
+
+def build_dataclass_codec(cls: type, codec: _Codec) -> None:
+  """Generate the encoder and decoder for a dataclass, and fill them in on its codec.
+
+  Both are unrolled over the fields, with `str` fields handled inline and every other field's
+  codec bound to a local name.
+  """
+  hints = _field_types(cls)
+  fields = dataclasses.fields(cls)
+  class_name = cls.__qualname__
+  namespace: dict = {
+    "_cls": cls,
+    "_write_size": _write_size,
+    "_read_size": _read_size,
+    "_raise_encode_error": _raise_encode_error,
+    "_setattr": object.__setattr__,
+  }
+  encoder = ["def encode(buf, value):"]
+  decoder = ["def decode(data, pos):"]
+
+  fixed = [(i, f) for i, f in enumerate(fields) if hints.get(f.name) in _FIXED_FORMATS]
+  if fixed:
+    fixed_struct = struct.Struct("<" + "".join(_FIXED_FORMATS[hints[f.name]] for _, f in fixed))
+    namespace["_pack_fixed"] = fixed_struct.pack
+    namespace["_unpack_fixed"] = fixed_struct.unpack_from
+    attributes = ", ".join(f"value.{f.name}" for _, f in fixed)
+    names = ", ".join(f.name for _, f in fixed)
+    encoder += [
+      "  try:",
+      f"    buf += _pack_fixed({attributes})",
+      "  except Exception as e:",
+      f"    _raise_encode_error({class_name!r}, {names!r}, e)",
+    ]
+    decoder += [
+      f"  {''.join(f'v{i}, ' for i, _ in fixed)}= _unpack_fixed(data, pos)",
+      f"  pos += {fixed_struct.size}",
+    ]
+
+  for i, field in enumerate(fields):
+    annotation = hints.get(field.name, Any)
+    if annotation in _FIXED_FORMATS:
+      continue
+    encoder += ["  try:", f"    v = value.{field.name}"]
+    if annotation is str:
+      encoder += [
+        "    raw = v.encode('utf-8')",
+        "    n = len(raw)",
+        "    if n < 0x80:",
+        "      buf.append(n)",
+        "    else:",
+        "      _write_size(buf, n)",
+        "    buf += raw",
+      ]
+      decoder += [
+        "  n = data[pos]",
+        "  if n < 0x80:",
+        "    pos += 1",
+        "  else:",
+        "    n, pos = _read_size(data, pos)",
+        f"  v{i} = str(data[pos : pos + n], 'utf-8')",
+        "  pos += n",
+      ]
+    else:
+      field_codec = codec_for(annotation)
+      if field_codec.encode is None:  # This class, or one still being built that refers to it
+        namespace[f"_codec_{i}"] = field_codec
+        encode_field, decode_field = f"_codec_{i}.encode", f"_codec_{i}.decode"
+      else:
+        namespace[f"_encode_{i}"] = field_codec.encode
+        namespace[f"_decode_{i}"] = field_codec.decode
+        encode_field, decode_field = f"_encode_{i}", f"_decode_{i}"
+      encoder.append(f"    {encode_field}(buf, v)")
+      decoder.append(f"  v{i}, pos = {decode_field}(data, pos)")
+    encoder += [
+      "  except Exception as e:",
+      f"    _raise_encode_error({class_name!r}, {field.name!r}, e)",
+    ]
+
+  arguments = ", ".join(f"{f.name}=v{i}" for i, f in enumerate(fields) if f.init)
+  decoder.append(f"  instance = _cls({arguments})")
+  decoder += [
+    f"  _setattr(instance, {f.name!r}, v{i})" for i, f in enumerate(fields) if not f.init
+  ]
+  decoder.append("  return instance, pos")
+  if len(encoder) == 1:
+    encoder.append("  pass")
+
+  source = "\n".join(encoder) + "\n\n\n" + "\n".join(decoder) + "\n"
+  logger.debug("Generated binary codec for %s:\n%s", class_name, source)
+  exec(compile(source, f"<scaf binary codec for {class_name}>", "exec"), namespace)  # noqa: S102
+  codec.encode, codec.decode = namespace["encode"], namespace["decode"]
+
+
+def dataclass_codec(cls: type) -> _Codec:
+  """Return the codec for a dataclass, built once from its fields' annotations."""
+  if (codec := _dataclass_codecs.get(cls)) is None:
+    codec = _dataclass_codecs[cls] = _Codec()  # Registered first, so fields can refer back to it
+    try:
+      build_dataclass_codec(cls, codec)
+    except BaseException:
+      del _dataclass_codecs[cls]
+      raise
+  return codec
+
+
+def encode(value) -> bytes:
+  """Encode a dataclass by its fields, or any other value with tags."""
+  buf = bytearray()
+  if dataclasses.is_dataclass(value) and not isinstance(value, type):
+    dataclass_codec(type(value)).encode(buf, value)  # type: ignore
+  else:
+    _encode_any(buf, value)
+  return bytes(buf)
+
+
+def decode(data: bytes | memoryview, as_type: type | None = None):
+  """Decode what `encode` produced, given the dataclass it was encoded from (if it was one).
+
+  Raises ValueError if the data is malformed or has bytes left over.
+  """
+  data = memoryview(data)
+  if as_type is not None and dataclasses.is_dataclass(as_type):
+    codec = dataclass_codec(as_type)
+  else:
+    codec = _ANY_CODEC
+  try:
+    value, pos = codec.decode(data, 0)  # type: ignore
+  except (IndexError, struct.error, UnicodeDecodeError) as e:
+    raise ValueError(f"Malformed binary data: {e}") from e
+  if pos != len(data):
+    raise ValueError(f"Malformed binary data: {len(data) - pos} byte(s) left over")
+  return value
+
+
+def frame(payload: bytes) -> bytes:
+  """Prefix a message with its length, so several can be sent down one stream."""
+  return _FRAME_HEADER.pack(len(payload)) + payload
+
+
+def read_frames(stream: IO[bytes]) -> Iterator[bytes]:
+  """Yield each message from a stream of frames, reading one at a time."""
+  while header := stream.read(_FRAME_HEADER.size):
+    if len(header) < _FRAME_HEADER.size:
+      raise ValueError("Truncated frame header")
+    (size,) = _FRAME_HEADER.unpack(header)
+    payload = stream.read(size)
+    if len(payload) < size:
+      raise ValueError(f"Truncated frame: expected {size} byte(s), got {len(payload)}")
+    yield payload
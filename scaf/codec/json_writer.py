@@ -0,0 +1,223 @@
+"""Serialize results to JSON text, without copying them into plain dicts and lists first."""
+
+import dataclasses
+import logging
+import math
+from collections.abc import Callable
+from datetime import datetime
+from json.encoder import encode_basestring
+from pathlib import PurePath
+from typing import Any
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+_INFINITY = float("inf")
+
+
+class _Writer:
+  """Where the pieces of one JSON document go, and how to lay them out."""
+
+  __slots__ = ("key_sep", "step", "write")
+
+  def __init__(self, write: Callable[[str], Any], indent: int | None):
+    self.write = write
+    self.step = " " * indent if indent is not None else ""
+    self.key_sep = ": " if indent is not None else ":"
+
+
+_WriteFn = Callable[[Any, _Writer, str], None]
+"""Writes a value as JSON, given the newline and indentation the value is nested at."""
+
+
+def _float(value: float) -> str:
+  if math.isnan(value):
+    return "NaN"
+  if value == _INFINITY:
+    return "Infinity"
+  if value == -_INFINITY:
+    return "-Infinity"
+  return float.__repr__(value)
+
+
+def _bool(value: bool) -> str:
+  return "true" if value else "false"
+
+
+def _key(key) -> str:
+  if isinstance(key, str):
+    return encode_basestring(key)
+  if key is True or key is False:
+    return f'"{_bool(key)}"'
+  if isinstance(key, int):
+    return f'"{int.__repr__(key)}"'
+  if isinstance(key, float):
+    return f'"{_float(key)}"'
+  if key is None:
+    return '"null"'
+  raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+def _encode(value, out: _Writer, nl: str) -> None:
+  writer = _writers.get(value.__class__) or _resolve_writer(value.__class__)
+  writer(value, out, nl)
+
+
+def _write_list(value, out: _Writer, nl: str) -> None:
+  write = out.write
+  if not value:
+    write("[]")
+    return
+  writers = _writers
+  inner = nl + out.step
+  sep = "[" + inner
+  for item in value:
+    write(sep)
+    sep = "," + inner
+    (writers.get(item.__class__) or _resolve_writer(item.__class__))(item, out, inner)
+  write(nl + "]")
+
+
+def _write_dict(value: dict, out: _Writer, nl: str) -> None:
+  write = out.write
+  if not value:
+    write("{}")
+    return
+  writers = _writers
+  inner = nl + out.step
+  key_sep = out.key_sep
+  sep = "{" + inner
+  for key, item in value.items():
+    write(sep + _key(key) + key_sep)
+    sep = "," + inner
+    (writers.get(item.__class__) or _resolve_writer(item.__class__))(item, out, inner)
+  write(nl + "}")
+
+
+def _write_attributes(value, out: _Writer, nl: str) -> None:
+  _write_dict(vars(value), out, nl)
+
+
+def _scalar(to_text: Callable[[Any], str]) -> _WriteFn:
+  return lambda value, out, nl: out.write(to_text(value))
+
+
+_builtin_writers: dict[type, _WriteFn] = {
+  str: _scalar(encode_basestring),
+  int: _scalar(int.__repr__),
+  float: _scalar(_float),
+  bool: _scalar(_bool),
+  type(None): _scalar(lambda value: "null"),
+  list: _write_list,
+  tuple: _write_list,
+  set: _write_list,
+  frozenset: _write_list,
+  dict: _write_dict,
+  PurePath: _scalar(lambda value: encode_basestring(value.as_posix())),
+  UUID: _scalar(lambda value: f'"{value}"'),
+  datetime: _scalar(lambda value: f'"{value.isoformat()}"'),
+}
+
+_registered: dict[type, _WriteFn] = dict(_builtin_writers)
+"""Writers by the type they were registered for, including for subclasses of it."""
+
+_writers: dict[type, _WriteFn] = dict(_registered)
+"""Writers by the exact type of value, filled in as new types are seen."""
+
+# Field types whose values can be written inline by a dataclass writer, skipping the dispatch
+_INLINE_FIELD_TYPES = {
+  str: "_str",
+  int: "_int",
+  float: "_float",
+  bool: "_bool",
+}
+
+
+def build_dataclass_writer(for_class: type) -> _WriteFn:
+  """Generate a function that writes an instance of the dataclass as a JSON object.
+
+  Keys are pre-encoded, each field is read straight off the instance, and fields annotated as a
+  plain scalar type are written inline whenever the value really is of that type.
+  """
+  namespace: dict = {
+    "_encode": _encode,
+    "_str": encode_basestring,
+    "_int": int.__repr__,
+    "_float": _float,
+    "_bool": _bool,
+  }
+  lines = [
+    "def write_dataclass(obj, out, nl):",
+    "  write = out.write",
+    "  inner = nl + out.step",
+    "  key_sep = out.key_sep",
+  ]
+  fields = dataclasses.fields(for_class)
+  if not fields:
+    lines.append("  write('{}')")
+
+  for i, field in enumerate(fields):
+    opening = "{" if i == 0 else ","
+    lines += [
+      f"  write({opening!r} + inner + {encode_basestring(field.name)!r} + key_sep)",
+      f"  value = obj.{field.name}",
+    ]
+    field_type = field.type if isinstance(field.type, type) else None
+    if to_text := _INLINE_FIELD_TYPES.get(field_type):  # type: ignore
+      namespace[f"_type_{i}"] = field_type
+      lines += [
+        f"  if value.__class__ is _type_{i}:",
+        f"    write({to_text}(value))",
+        "  else:",
+        "    _encode(value, out, inner)",
+      ]
+    else:
+      lines.append("  _encode(value, out, inner)")
+
+  if fields:
+    lines.append("  write(nl + '}')")
+
+  source = "\n".join(lines) + "\n"
+  logger.debug("Generated JSON writer for %s:\n%s", for_class.__qualname__, source)
+  exec(compile(source, f"<scaf JSON writer for {for_class.__qualname__}>", "exec"), namespace)  # noqa: S102
+  return namespace["write_dataclass"]
+
+
+def _resolve_writer(cls: type) -> _WriteFn:
+  writer = next((_registered[base] for base in cls.__mro__ if base in _registered), None)
+  if writer is None:
+    if dataclasses.is_dataclass(cls):
+      writer = build_dataclass_writer(cls)
+    elif cls.__dictoffset__:  # Instances have a `__dict__`
+      writer = _write_attributes
+    else:
+      raise TypeError(f"Object of type {cls.__name__} is not JSON serializable")
+  _writers[cls] = writer
+  return writer
+
+
+def register_encoder(for_class: type, encode: Callable[[Any], Any]) -> None:
+  """Serialize instances of a type (and its subclasses) as whatever `encode` returns for them.
+
+  E.g. `register_encoder(Decimal, str)`.
+  """
+
+  def write(value, out: _Writer, nl: str) -> None:
+    _encode(encode(value), out, nl)
+
+  _registered[for_class] = write
+  _writers.clear()  # Subclasses may have been resolved to another writer
+  _writers.update(_registered)
+
+
+def to_json(obj, indent: int | None = None) -> str:
+  """Serialize an object as JSON; compact unless `indent` is given.
+
+  Raises TypeError for values that can't be serialized, and ValueError for circular references.
+  """
+  pieces: list[str] = []
+  try:
+    _encode(obj, _Writer(pieces.append, indent), "" if indent is None else "\n")
+  except RecursionError as e:
+    raise ValueError("Circular reference detected") from e
+  return "".join(pieces)
@@ -9,6 +9,9 @@ REPO_ROOT = Path(__file__).parent.parent.parent
 SCAF_FOLDER_NAME = ".scaf"
 ALIASES_FILENAME = "aliases"
 SETTINGS_FILENAME = "settings.json"
+MANIFEST_FILENAME = "manifest.json"
+DAEMON_SOCKET_FILENAME = "daemon.sock"
+CACHE_FOLDER_NAME = "cache"
 
 
 def configure_logging(verbosity: int):
@@ -2,6 +2,7 @@ import logging
 from pathlib import Path
 
 from scaf.action_package.load.handler import _load_module_from_file
+from scaf.cache.tools import get_bytecode_folder
 
 logger = logging.getLogger(__name__)
 
@@ -10,7 +11,9 @@ def get_settings_class(root: Path, domain: Path) -> type | None:
   settings_module_file = root / domain / "settings.py"
   if settings_module_file.exists():
     logger.debug(f"Loading {settings_module_file=}")
-    module = _load_module_from_file(settings_module_file)
+    module = _load_module_from_file(
+      settings_module_file, bytecode_folder=get_bytecode_folder(root)
+    )
   else:
     logger.warning("No settings module found for domain '%s'", domain)
     return None
@@ -2,7 +2,14 @@ from dataclasses import dataclass, field
 from functools import cached_property
 from pathlib import Path
 
-from scaf.config import ALIASES_FILENAME, SCAF_FOLDER_NAME, SETTINGS_FILENAME
+from scaf.config import (
+  ALIASES_FILENAME,
+  CACHE_FOLDER_NAME,
+  DAEMON_SOCKET_FILENAME,
+  MANIFEST_FILENAME,
+  SCAF_FOLDER_NAME,
+  SETTINGS_FILENAME,
+)
 from scaf.core import Shape
 from scaf.deck.rules import must_be_real_dir
 
@@ -25,5 +32,17 @@ class Deck(Shape):
   def settings_file(self) -> Path:
     return self.scaf_folder / SETTINGS_FILENAME
 
+  @cached_property
+  def manifest_file(self) -> Path:
+    return self.scaf_folder / MANIFEST_FILENAME
+
+  @cached_property
+  def cache_folder(self) -> Path:
+    return self.scaf_folder / CACHE_FOLDER_NAME
+
+  @cached_property
+  def daemon_socket(self) -> Path:
+    return self.scaf_folder / DAEMON_SOCKET_FILENAME
+
   def prepare(self):
     must_be_real_dir(self.scaf_folder)
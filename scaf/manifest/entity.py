@@ -0,0 +1,95 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+
+MANIFEST_VERSION = 1
+
+WALK_BACKEND = "walk"
+GIT_BACKEND = "git"
+BACKENDS = (WALK_BACKEND, GIT_BACKEND)
+
+
+@dataclass
+class ManifestEntry:
+  """An action package, as recorded in a manifest."""
+
+  action: Path = field(doc="Path to the action folder, relative to the manifest root.")
+  kind: str = field(doc="Either 'command' or 'query'.")
+  doc: str = field(default="", doc="Docstring of the action's shape class.")
+  mtimes: dict[str, int] = field(
+    default_factory=dict,
+    doc="st_mtime_ns of each package file when the entry was recorded, by filename.",
+  )
+
+  @property
+  def depth(self) -> int:
+    return len(self.action.parts)
+
+  def to_dict(self) -> dict:
+    return {"kind": self.kind, "doc": self.doc, "mtimes": self.mtimes}
+
+  @classmethod
+  def from_dict(cls, action: str, data: dict) -> ManifestEntry:
+    return cls(
+      action=Path(action),
+      kind=data["kind"],
+      doc=data.get("doc", ""),
+      mtimes=dict(data.get("mtimes", {})),
+    )
+
+
+@dataclass
+class Manifest:
+  """Every action package found under a root folder, plus enough state to tell when it's stale."""
+
+  root: Path = field(doc="Folder the manifest was built from.")
+  max_depth: int = field(doc="How many levels below the root were searched.")
+  ignore: list[str] = field(default_factory=list, doc="Patterns loaded from .scafignore.")
+  scanned_at: int = field(default=0, doc="time_ns() when the folders were last scanned.")
+  backend: str = field(
+    default=WALK_BACKEND,
+    doc="How actions were found: by walking the folders, or from the files git knows about.",
+  )
+  dirs: dict[str, int] = field(
+    default_factory=dict,
+    doc="st_mtime_ns of every searched folder, keyed by its posix path relative to the root. "
+    "Empty when actions were found via git, which is asked again on every load.",
+  )
+  entries: dict[str, ManifestEntry] = field(
+    default_factory=dict,
+    doc="Action packages, keyed by their posix path relative to the root.",
+  )
+
+  def find(self, action: Path) -> ManifestEntry | None:
+    return self.entries.get(action.as_posix())
+
+  def actions_within(self, max_depth: int) -> list[Path]:
+    return sorted(e.action for e in self.entries.values() if e.depth <= max_depth)
+
+  def to_dict(self) -> dict:
+    return {
+      "version": MANIFEST_VERSION,
+      "max_depth": self.max_depth,
+      "ignore": self.ignore,
+      "scanned_at": self.scanned_at,
+      "backend": self.backend,
+      "dirs": self.dirs,
+      "entries": {key: entry.to_dict() for key, entry in sorted(self.entries.items())},
+    }
+
+  @classmethod
+  def from_dict(cls, root: Path, data: dict) -> Manifest:
+    """Raises ValueError if the data was not written by this version of scaf."""
+    if data.get("version") != MANIFEST_VERSION:
+      raise ValueError(f"Unsupported manifest version: {data.get('version')!r}")
+    try:
+      return cls(
+        root=root,
+        max_depth=int(data["max_depth"]),
+        ignore=list(data["ignore"]),
+        scanned_at=int(data["scanned_at"]),
+        backend=str(data.get("backend", WALK_BACKEND)),
+        dirs={k: int(v) for k, v in data["dirs"].items()},
+        entries={k: ManifestEntry.from_dict(k, v) for k, v in data["entries"].items()},
+      )
+    except (KeyError, TypeError, AttributeError) as e:
+      raise ValueError(f"Malformed manifest: {e}") from e
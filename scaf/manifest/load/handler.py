@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from scaf.action_package.tools import find_shape_file, read_shape_metadata
+from scaf.config import MANIFEST_FILENAME, SCAF_FOLDER_NAME
+from scaf.manifest.entity import GIT_BACKEND, WALK_BACKEND, Manifest, ManifestEntry
+from scaf.manifest.load.query import LoadManifest
+from scaf.manifest.tools import (
+  load_scafignore,
+  rescan_changed_folders,
+  scan_action_folders,
+  scan_git_action_folders,
+)
+from scaf.tools import read_json_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DEPTH = 5
+"""Used when neither the caller nor an existing manifest says how deep to search."""
+
+_RACY_WINDOW_NS = 2_000_000_000
+"""A file or folder modified this close to a scan may change again without its mtime moving."""
+
+
+def _is_fresh(recorded: int, current: int, scanned_at: int) -> bool:
+  return recorded == current and recorded + _RACY_WINDOW_NS < scanned_at
+
+
+def _stat_package_files(action_folder: Path) -> dict[str, int]:
+  mtimes = {}
+  for filename in ("__init__.py", "handler.py", "command.py", "query.py"):
+    try:
+      mtimes[filename] = (action_folder / filename).stat().st_mtime_ns
+    except OSError:
+      continue
+  return mtimes
+
+
+def _build_entry(root: Path, action: Path, mtimes: dict[str, int]) -> ManifestEntry:
+  action_folder = root / action
+  shape_file = find_shape_file(action_folder)
+  metadata = read_shape_metadata(shape_file) if shape_file else None
+  return ManifestEntry(
+    action=action,
+    kind=shape_file.stem if shape_file else "",
+    doc=metadata.doc if metadata else "",
+    mtimes=mtimes,
+  )
+
+
+def _refresh_entry(
+  root: Path, action: Path, previous: ManifestEntry | None, scanned_at: int
+) -> ManifestEntry:
+  """Re-read the package's metadata only if one of its files has changed."""
+  mtimes = _stat_package_files(root / action)
+  if (
+    previous
+    and previous.mtimes.keys() == mtimes.keys()
+    and all(_is_fresh(previous.mtimes[k], v, scanned_at) for k, v in mtimes.items())
+  ):
+    return previous
+  logger.debug("Reading metadata for %s", action.as_posix())
+  return _build_entry(root, action, mtimes)
+
+
+def _changed_dirs(root: Path, manifest: Manifest) -> list[str]:
+  changed = []
+  scanned_at = manifest.scanned_at
+  root_path = os.fspath(root)
+  for key, recorded in manifest.dirs.items():
+    try:
+      # os.stat on a str skips pathlib's overhead, which dominates across thousands of folders
+      current = os.stat(os.path.join(root_path, key)).st_mtime_ns
+    except OSError:
+      current = None
+    if current is None or not _is_fresh(recorded, current, scanned_at):
+      logger.debug("Folder changed since last scan: %s", key)
+      changed.append(key)
+  return changed
+
+
+def _read_manifest(manifest_file: Path, root: Path) -> Manifest | None:
+  if not manifest_file.exists():
+    return None
+  try:
+    return Manifest.from_dict(root, read_json_file(manifest_file))
+  except ValueError as e:
+    logger.info("Discarding manifest at %s: %s", manifest_file, e)
+    return None
+
+
+def _write_manifest(manifest_file: Path, manifest: Manifest) -> None:
+  # Write-then-rename, so concurrent readers never see a partial file
+  tmp_file = manifest_file.with_name(
+    f".{manifest_file.name}.{os.getpid()}.{threading.get_ident()}"
+  )
+  tmp_file.write_text(json.dumps(manifest.to_dict(), indent=2) + "\n", encoding="utf-8")
+  os.replace(tmp_file, manifest_file)
+
+
+def _rescan(
+  root: Path, max_depth: int, ignore: list[str], previous: Manifest | None, backend: str
+) -> Manifest:
+  scanned_at = time.time_ns()
+  actions = None
+  dirs: dict[str, int] = {}
+  if backend == GIT_BACKEND:
+    actions = scan_git_action_folders(root, max_depth, ignore)
+    if actions is None:
+      logger.info("%s is not in a git work tree; walking it instead", root.as_posix())
+  if actions is None:
+    backend = WALK_BACKEND
+    actions, dirs = scan_action_folders(root, max_depth, ignore)
+
+  old_entries = previous.entries if previous else {}
+  old_scanned_at = previous.scanned_at if previous else 0
+  entries = {}
+  for action in actions:
+    key = action.as_posix()
+    entries[key] = _refresh_entry(root, action, old_entries.get(key), old_scanned_at)
+  return Manifest(
+    root=root,
+    max_depth=max_depth,
+    ignore=ignore,
+    scanned_at=scanned_at,
+    backend=backend,
+    dirs=dirs,
+    entries=entries,
+  )
+
+
+def _is_rescan_unchanged(manifest: Manifest, previous: Manifest | None) -> bool:
+  """Whether a rescan found exactly what's on record, down to reusing every entry."""
+  return (
+    previous is not None
+    and (manifest.backend, manifest.max_depth, manifest.ignore, manifest.dirs)
+    == (previous.backend, previous.max_depth, previous.ignore, previous.dirs)
+    and manifest.entries.keys() == previous.entries.keys()
+    and all(entry is previous.entries[key] for key, entry in manifest.entries.items())
+  )
+
+
+def _update(root: Path, manifest: Manifest) -> bool:
+  """Rescan only the folders, and re-read only the entries, that changed since the manifest was
+  saved. Returns True if anything changed.
+  """
+  scanned_at = time.time_ns()
+  changed = False
+  if changed_dirs := _changed_dirs(root, manifest):
+    actions = set(manifest.entries)
+    rescan_changed_folders(
+      root, manifest.max_depth, manifest.ignore, changed_dirs, actions, manifest.dirs
+    )
+    for key in manifest.entries.keys() - actions:
+      del manifest.entries[key]
+    changed = True
+  else:
+    actions = manifest.entries.keys()
+
+  for key, entry in list(manifest.entries.items()):
+    refreshed = _refresh_entry(root, entry.action, entry, manifest.scanned_at)
+    if refreshed is not entry:
+      manifest.entries[key] = refreshed
+      changed = True
+
+  for key in sorted(actions - manifest.entries.keys()):
+    logger.debug("Reading metadata for %s", key)
+    manifest.entries[key] = _build_entry(root, Path(key), _stat_package_files(root / key))
+
+  if changed:
+    # Whatever was racy as of the last scan has just been re-read
+    manifest.scanned_at = scanned_at
+  return changed
+
+
+def handle(query: LoadManifest) -> Manifest:
+  logger.debug(f"Handling {query=}")
+  root = query.root
+  scaf_folder = root / SCAF_FOLDER_NAME
+  manifest_file = scaf_folder / MANIFEST_FILENAME
+  persist = scaf_folder.is_dir()
+
+  previous = _read_manifest(manifest_file, root) if persist else None
+  ignore = load_scafignore(root)
+  max_depth = query.max_depth
+  if max_depth is None:
+    max_depth = previous.max_depth if previous else DEFAULT_MAX_DEPTH
+
+  backend = query.backend or (previous.backend if previous else WALK_BACKEND)
+  if query.full:
+    manifest = _rescan(root, max_depth, ignore, None, backend)
+    changed = True
+  elif (
+    previous
+    and backend == previous.backend == WALK_BACKEND
+    and previous.ignore == ignore
+    and previous.max_depth >= max_depth
+  ):
+    manifest = previous
+    changed = _update(root, manifest)
+  else:
+    # Git is quick to ask, and has no snapshot of folders to check against, so ask it every time
+    if previous:
+      max_depth = max(max_depth, previous.max_depth)
+    manifest = _rescan(root, max_depth, ignore, previous, backend)
+    changed = not _is_rescan_unchanged(manifest, previous)
+    if not changed:
+      manifest = previous  # type: ignore
+
+  if persist and changed:
+    logger.info("Saving manifest with %d action(s) to %s", len(manifest.entries), manifest_file)
+    _write_manifest(manifest_file, manifest)
+
+  return manifest
@@ -0,0 +1,29 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from scaf.core import Shape
+
+
+@dataclass
+class LoadManifest(Shape):
+  """Load the action manifest for a folder, rescanning whatever has changed since it was saved."""
+
+  root: Path = field(doc="Folder to search for action packages (usually a deck root).")
+  max_depth: int | None = field(
+    default=None,
+    doc="Search at least this many levels deep; defaults to the depth already on record.",
+  )
+  backend: str = field(
+    default="",
+    doc="'git' to find actions from the files git knows about (falling back to walking the "
+    "folders outside a git work tree), or 'walk'; defaults to the backend already on record.",
+  )
+  full: bool = field(
+    default=False,
+    doc="Rescan every folder and re-read every entry, rather than only those that changed.",
+  )
+
+  def execute(self):
+    from scaf.manifest.load.handler import handle
+
+    return handle(self)
@@ -0,0 +1,8 @@
+from scaf.manifest.entity import BACKENDS
+
+
+def fit_backend(value: str) -> str:
+  value = value.strip().lower()
+  if value and value not in BACKENDS:
+    raise ValueError(f"must be one of: {', '.join(BACKENDS)}")
+  return value
@@ -0,0 +1,368 @@
+import functools
+import logging
+import os
+import posixpath
+import re
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import batched
+from pathlib import Path
+
+from scaf.action_package.rules import must_contain_required_files
+from scaf.config import SCAF_FOLDER_NAME
+
+logger = logging.getLogger(__name__)
+
+WALK_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+"""Threads listing folders at once when scanning a deck, as `ThreadPoolExecutor` would default to."""
+
+_MAX_WALK_BATCH = 256
+
+
+def load_scafignore(domain_folder: Path) -> list[str]:
+  """Load .scafignore file from domain folder, if it exists.
+
+  Patterns follow .gitignore's rules; see `PathMatcher`.
+  """
+  ignore_file = domain_folder / ".scafignore"
+  ignore_patterns = []
+  if ignore_file.exists():
+    with ignore_file.open("r", encoding="utf-8") as f:
+      for line in f:
+        line = line.strip()
+        if line and not line.startswith("#"):
+          ignore_patterns.append(line)
+    logger.info("Loaded .scafignore with %d pattern(s)", len(ignore_patterns))
+  return ignore_patterns
+
+
+class PathMatcher:
+  """Gitignore-style patterns, compiled once, for matching posix paths relative to a root.
+
+  A pattern without a slash (other than a trailing one) matches a name at any depth; otherwise
+  it's anchored to the root. `*` and `?` don't match `/`, `**` matches any number of folders,
+  and `!` re-includes what an earlier pattern matched, the last matching pattern winning.
+  Every path is taken to be a folder.
+  """
+
+  def __init__(self, patterns: list[str], anchored: bool = False):
+    """With `anchored`, every pattern is anchored to the root, as if it started with `/`."""
+    rules = []
+    for pattern in patterns:
+      negate = pattern.startswith("!")
+      pattern = pattern.removeprefix("!").rstrip("/")
+      if not pattern:
+        continue
+      is_anchored = anchored or "/" in pattern
+      regex = _translate_glob(pattern.lstrip("/"))
+      rules.append((regex if is_anchored else f"(?:[^/]*/)*{regex}", negate))
+
+    self.patterns = patterns
+    self._rules = [(re.compile(regex).fullmatch, negate) for regex, negate in reversed(rules)]
+    if not any(negate for _, negate in rules):
+      # Without negation, order doesn't matter, so one combined pattern will do
+      combined = "|".join(f"(?:{regex})" for regex, _ in rules)
+      self._rules = [(re.compile(combined).fullmatch, False)] if rules else []
+
+  def __bool__(self) -> bool:
+    return bool(self._rules)
+
+  def __call__(self, path: str) -> bool:
+    for match, negate in self._rules:
+      if match(path):
+        return not negate
+    return False
+
+  def matches_within(self, path: str) -> bool:
+    """Whether the path, or any folder it's in, is matched."""
+    prefix = ""
+    for part in path.split("/"):
+      prefix = f"{prefix}/{part}" if prefix else part
+      if self(prefix):
+        return True
+    return False
+
+
+def _translate_glob(pattern: str) -> str:
+  """Translate a gitignore-style glob to a regex matching whole posix paths."""
+  out = []
+  i = 0
+  n = len(pattern)
+  while i < n:
+    c = pattern[i]
+    if c == "*" and pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/"):
+      if i + 2 == n:
+        out.append(".*")  # Trailing `/**`: everything inside
+        i += 2
+        continue
+      if pattern[i + 2] == "/":
+        out.append("(?:[^/]*/)*")  # `**/`: any number of folders, including none
+        i += 3
+        continue
+    if c == "*":
+      out.append("[^/]*")
+    elif c == "?":
+      out.append("[^/]")
+    elif c == "\\" and i + 1 < n:
+      i += 1
+      out.append(re.escape(pattern[i]))
+    elif c == "[" and (end := _find_bracket_end(pattern, i)) != -1:
+      content = pattern[i + 1 : end].replace("\\", "\\\\")
+      if content[0] in "!^":
+        content = "^" + content[1:]
+      out.append(f"(?!/)[{content}]")
+      i = end
+    else:
+      out.append(re.escape(c))
+    i += 1
+  return "".join(out)
+
+
+def _find_bracket_end(pattern: str, start: int) -> int:
+  """Index of the `]` closing the bracket expression at `start`, or -1 if it isn't closed."""
+  i = start + 1
+  if i < len(pattern) and pattern[i] in "!^":
+    i += 1
+  if i < len(pattern) and pattern[i] == "]":
+    i += 1  # A leading `]` is part of the set
+  end = pattern.find("]", i)
+  return end
+
+
+def _list_folder(path: str) -> tuple[list[str], list[str]]:
+  """Return (`subdirs`, `files`) like `Path.walk`, leaving out symlinked folders it wouldn't enter.
+
+  Raises OSError if the folder can't be listed.
+  """
+  subdirs = []
+  files = []
+  with os.scandir(path) as it:
+    for entry in it:
+      try:
+        is_dir = entry.is_dir()
+      except OSError:
+        is_dir = False
+      if not is_dir:
+        files.append(entry.name)
+      elif not entry.is_symlink():
+        subdirs.append(entry.name)
+  return subdirs, files
+
+
+def _is_action_folder(key: str, files: list[str]) -> bool:
+  if key == ".":
+    return False  # Skip root
+
+  name = key.rpartition("/")[2]
+  if name.startswith((".", "_")):
+    return False  # Skip hidden/private folders
+
+  if not files:
+    return False  # Skip folders without files, as they can't be action packages
+
+  try:
+    must_contain_required_files(files)
+  except ValueError:
+    return False
+  return True
+
+
+_ScannedFolder = tuple[int, bool, list[str]]
+"""A folder's st_mtime_ns, whether it's an action package, and the subfolders to scan next."""
+
+
+def _scan_folder(
+  root: str, key: str, max_depth: int, ignored: PathMatcher
+) -> _ScannedFolder | None:
+  """Stat and list a folder, given its posix path relative to the root (or "." for the root).
+
+  Ignored subfolders are left out, so their contents are never listed. Returns None if the
+  folder no longer exists.
+  """
+  path = os.path.join(root, key)
+  try:
+    # Stat before listing, so anything added meanwhile moves the mtime past what's recorded
+    mtime = os.stat(path).st_mtime_ns
+    subdirs, files = _list_folder(path)
+  except OSError:
+    return None
+
+  depth = 0 if key == "." else key.count("/") + 1
+  if depth >= max_depth:
+    children = []  # Don't recurse further into this directory
+  else:
+    prefix = "" if key == "." else key + "/"
+    # Scaf's own files (including the manifest) live here, so never treat it as searchable
+    children = [prefix + name for name in subdirs if name != SCAF_FOLDER_NAME]
+    if ignored:
+      children = [child for child in children if not ignored(child)]
+  return mtime, _is_action_folder(key, files), children
+
+
+def _scan_folders(
+  root: str, keys: tuple[str, ...], max_depth: int, ignored: PathMatcher
+) -> list[_ScannedFolder | None]:
+  return [_scan_folder(root, key, max_depth, ignored) for key in keys]
+
+
+def scan_action_folders(
+  root: Path, max_depth: int, ignore_patterns: list[str], workers: int = WALK_WORKERS
+) -> tuple[list[Path], dict[str, int]]:
+  """Walk the root and return (`actions`, `dirs`).
+
+  Each level of the tree is listed by a pool of `workers` threads, since on network and overlay
+  filesystems the walk spends most of its time waiting on the filesystem. Folders matched by
+  `ignore_patterns` (see `PathMatcher`) are pruned, along with everything in them.
+
+  `actions`:
+    Folders that look like action packages, relative to the root, sorted.
+  `dirs`:
+    st_mtime_ns of every folder whose contents can affect `actions`, keyed by posix path.
+  """
+  logger.info("Searching for action packages in domain folder: %s", root.as_posix())
+  scan = functools.partial(
+    _scan_folders, os.fspath(root), max_depth=max_depth, ignored=PathMatcher(ignore_patterns)
+  )
+  actions: list[str] = []
+  dirs: dict[str, int] = {}
+
+  pool = ThreadPoolExecutor(workers, thread_name_prefix="scaf-walk") if workers > 1 else None
+  try:
+    level = ["."]
+    while level:
+      # A few batches per worker, so threads aren't left idle behind one big folder
+      batch_size = max(1, min(_MAX_WALK_BATCH, len(level) // (workers * 4)))
+      batches = list(batched(level, batch_size))
+      results = pool.map(scan, batches) if pool and len(batches) > 1 else map(scan, batches)
+      level = []
+      for batch, scanned in zip(batches, results, strict=True):
+        for key, folder in zip(batch, scanned, strict=True):
+          if folder is None:
+            continue  # Vanished mid-walk
+          mtime, is_action, children = folder
+          dirs[key] = mtime
+          if is_action:
+            actions.append(key)
+          level.extend(children)
+  finally:
+    if pool:
+      pool.shutdown()
+
+  return sorted(Path(action) for action in actions), dict(sorted(dirs.items()))
+
+
+def rescan_changed_folders(
+  root: Path,
+  max_depth: int,
+  ignore_patterns: list[str],
+  changed: list[str],
+  actions: set[str],
+  dirs: dict[str, int],
+) -> None:
+  """Bring `actions` and `dirs` from an earlier scan up to date, given the folders that changed.
+
+  A folder's mtime moves whenever an entry is added to, removed from or renamed in it, so only
+  the changed folders (and any new folders found in them) are listed again. The outcome is the
+  same as that of a full `scan_action_folders`.
+  """
+  logger.info("Rescanning %d changed folder(s) in %s", len(changed), root.as_posix())
+  root_path = os.fspath(root)
+  ignored = PathMatcher(ignore_patterns)
+  children: dict[str, set[str]] = {}
+  for key in dirs:
+    if key != ".":
+      children.setdefault(posixpath.dirname(key) or ".", set()).add(key)
+
+  def forget(key: str) -> None:
+    stack = [key]
+    while stack:
+      key = stack.pop()
+      dirs.pop(key, None)
+      actions.discard(key)
+      stack.extend(children.pop(key, ()))
+
+  # Parents first, so folders that were removed along with a parent aren't listed
+  pending = deque(sorted(changed, key=lambda key: key.count("/") if key != "." else -1))
+  while pending:
+    key = pending.popleft()
+    if key != "." and key not in children.get(posixpath.dirname(key) or ".", ()):
+      forget(key)  # Its parent no longer lists it
+      continue
+    folder = _scan_folder(root_path, key, max_depth, ignored)
+    if folder is None:
+      forget(key)
+      continue
+    mtime, is_action, found = folder
+    dirs[key] = mtime
+    if is_action:
+      actions.add(key)
+    else:
+      actions.discard(key)
+    old_children = children.get(key, set())
+    new_children = set(found)
+    for gone in old_children - new_children:
+      forget(gone)
+    pending.extend(sorted(new_children - old_children))
+    children[key] = new_children
+
+
+def list_git_files(root: Path) -> list[str] | None:
+  """Files under the root that git tracks, or would track if added, as posix paths relative to
+  it. Returns None if the root isn't in a git work tree (or git isn't installed).
+  """
+  try:
+    proc = subprocess.run(
+      ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+      cwd=root,
+      capture_output=True,
+      check=False,
+    )
+  except OSError as e:
+    logger.debug("Can't run git in %s: %s", root, e)
+    return None
+  if proc.returncode != 0:
+    logger.debug("git ls-files failed in %s: %s", root, proc.stderr.decode(errors="replace"))
+    return None
+  return proc.stdout.decode("utf-8", errors="surrogateescape").split("\0")[:-1]
+
+
+def scan_git_action_folders(
+  root: Path, max_depth: int, ignore_patterns: list[str]
+) -> list[Path] | None:
+  """Like `scan_action_folders`, but reading the file list from git rather than walking the
+  root, so untracked build trees covered by .gitignore are never listed.
+
+  Returns the sorted actions, or None if the root isn't in a git work tree.
+  """
+  paths = list_git_files(root)
+  if paths is None:
+    return None
+  logger.info("Searching %d file(s) known to git in %s", len(paths), root.as_posix())
+
+  folders: dict[str, set[str]] = {}
+  for path in paths:
+    folder, _, name = path.rpartition("/")
+    if folder:
+      folders.setdefault(folder, set()).add(name)
+
+  ignored = PathMatcher(ignore_patterns)
+  root_path = os.fspath(root)
+  actions = []
+  for folder, names in folders.items():
+    parts = folder.split("/")
+    if (
+      len(parts) > max_depth
+      or SCAF_FOLDER_NAME in parts
+      or not _is_action_folder(folder, list(names))
+      or (ignored and ignored.matches_within(folder))
+    ):
+      continue
+    # The index still lists files that were deleted since, so check what's really there
+    try:
+      _, files = _list_folder(os.path.join(root_path, folder))
+    except OSError:
+      continue
+    if _is_action_folder(folder, files):
+      actions.append(Path(folder))
+  return sorted(actions)
@@ -1,12 +1,16 @@
 import json
 import logging
 import sys
+from collections.abc import Iterable, Iterator
 from dataclasses import asdict, is_dataclass
 from datetime import datetime
 from pathlib import Path
 from pprint import pprint
 from uuid import UUID
 
+from scaf.codec.binary import encode, frame
+from scaf.codec.json_writer import register_encoder, to_json  # noqa: F401
+
 # Colors for output
 RED = "\033[0;31m"
 GREEN = "\033[0;32m"
@@ -47,11 +51,36 @@ def print_result(result) -> None:
   """Print action response as JSON if possible, fallback to pprint if serialization fails."""
   if result is None:
     return
+  if isinstance(result, Iterator):
+    print_stream(result)
+    return
 
   try:
-    json_output = json.dumps(result, cls=JSONEncoder, indent=2, ensure_ascii=False)
+    json_output = to_json(result, indent=2)  # Rendered in full first, so a failure prints nothing
     print(json_output)
   except (TypeError, ValueError) as e:
     # JSON serialization failed, fall back to pprint
     logger.warning(f"JSON serialization failed: {e}. Using pprint fallback.")
     pprint(result)
+
+
+def to_json_line(obj) -> str:
+  """Serialize an object as a single line of compact JSON."""
+  return to_json(obj)
+
+
+def print_stream(items: Iterable) -> None:
+  """Print each item as a line of JSON as soon as it's produced, never holding on to them."""
+  for item in items:
+    print(to_json_line(item), flush=True)
+
+
+def print_binary(result) -> None:
+  """Write a result to stdout as one binary frame, or one frame per item if it's a stream."""
+  if result is None:
+    return
+  sys.stdout.flush()  # Keep anything already printed ahead of the frames
+  out = sys.stdout.buffer
+  for item in result if isinstance(result, Iterator) else (result,):
+    out.write(frame(encode(item)))
+    out.flush()
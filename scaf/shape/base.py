@@ -1,19 +1,46 @@
 import inspect
 import logging
 from dataclasses import dataclass
+from typing import ClassVar
 
 from scaf.rules import values_must_fit
+from scaf.shape.tools import get_validator
 
 logger = logging.getLogger(__name__)
 
 
 @dataclass
 class Shape:
-  """Base class for dataclasses that define the structure of domain actions."""
+  """Base class for dataclasses that define the structure of domain actions.
+
+  Subclasses declared with `class MyShape(Shape, codegen=True)` fit their values with a validator
+  generated for the class, rather than the generic `values_must_fit` loop.
+
+  Queries declared with `class MyQuery(Shape, cache_ttl=60)` have their results cached on disk
+  for that many seconds, keyed by the fitted values and the action's source.
+  """
+
+  __scaf_codegen__: ClassVar[bool] = False
+  __scaf_cache_ttl__: ClassVar[float | None] = None
+
+  def __init_subclass__(
+    cls, codegen: bool | None = None, cache_ttl: float | None = None, **kwargs
+  ):
+    super().__init_subclass__(**kwargs)
+    if codegen is not None:
+      cls.__scaf_codegen__ = codegen
+    if cache_ttl is not None:
+      if cache_ttl <= 0:
+        raise ValueError(f"cache_ttl must be positive, got {cache_ttl!r}")
+      cls.__scaf_cache_ttl__ = cache_ttl
 
   def __post_init__(self):
-    logger.debug(f"👋 {type(self).__name__}.{self.__post_init__.__name__}")
-    values_must_fit(self)
+    logger.debug("👋 %s.__post_init__", type(self).__name__)
+    if self.__scaf_codegen__:
+      get_validator(type(self))(self)
+    else:
+      values_must_fit(self)
     if prepare := getattr(type(self), "prepare", None):
-      logger.debug(f"📞 {type(self).__name__}.{prepare.__name__} @ {inspect.getmodule(prepare)}")
+      if logger.isEnabledFor(logging.DEBUG):  # getmodule is too slow to call for every instance
+        logger.debug(f"📞 {type(self).__name__}.{prepare.__name__} @ {inspect.getmodule(prepare)}")
       prepare(self)
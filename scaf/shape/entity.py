@@ -0,0 +1,27 @@
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass(frozen=True)
+class FieldPlan:
+  """How to fit the value of one dataclass field."""
+
+  name: str = field(doc="Name of the field.")
+  init: bool = field(doc="Whether the field is passed to `__init__` (and so needs fitting).")
+  fitter: Callable[[Any], Any] = field(doc="Turns a raw value into one the domain accepts.")
+  canonical_type: Any = field(doc="See `get_acceptable_types`.")
+  proxy_type: Any = field(doc="See `get_acceptable_types`.")
+  optional: bool = field(doc="Whether the field can be None.")
+  check_type: type | None = field(
+    default=None,
+    doc="Set if `fitter` is a plain type check, which leaves instances of this type unchanged.",
+  )
+
+
+@dataclass(frozen=True)
+class FitPlan:
+  """Everything needed to fit a dataclass's values, resolved once per class."""
+
+  fields: dict[str, FieldPlan] = field(doc="Plans for every field, in declaration order.")
+  generation: int = field(doc="Plans from an older generation are rebuilt before use.")
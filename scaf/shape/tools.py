@@ -0,0 +1,73 @@
+import logging
+from collections.abc import Callable
+
+from scaf.errors import FittingError
+from scaf.shape.entity import FitPlan
+from scaf.tools import get_fit_plan
+
+logger = logging.getLogger(__name__)
+
+_VALIDATOR_ATTRIBUTE = "__scaf_validator__"
+
+
+def _raise_fitting_error(fitter: Callable, class_name: str, field_name: str, e: Exception):
+  raise FittingError(f"{fitter.__name__} failed: {class_name}.{field_name} {e}") from e
+
+
+def build_validator(for_class: type, plan: FitPlan) -> Callable[[object], None]:
+  """Generate a function that fits an instance's values in place, specialized for the plan.
+
+  It does what `values_must_fit` does, but with the loop unrolled, each fitter bound to a local,
+  and plain type checks inlined so values that already have the right type are left alone.
+  """
+  namespace: dict = {"_raise_fitting_error": _raise_fitting_error}
+  lines = ["def validate(self):", "  values = self.__dict__"]
+
+  for i, field_plan in enumerate(plan.fields.values()):
+    if not field_plan.init:
+      continue
+    name = field_plan.name
+    fitter = f"_fit_{i}"
+    namespace[fitter] = field_plan.fitter
+
+    if field_plan.check_type is None:
+      condition = None  # A custom fitter, which may transform any value
+    elif field_plan.check_type is object:
+      if field_plan.optional:
+        continue  # Any value fits
+      condition = "value is None"
+    else:
+      namespace[f"_type_{i}"] = field_plan.check_type
+      if field_plan.optional:
+        condition = f"value is not None and not isinstance(value, _type_{i})"
+      else:
+        condition = f"value is None or not isinstance(value, _type_{i})"
+
+    lines.append(f"  value = values[{name!r}]")
+    indent = "  "
+    if condition:
+      lines.append(f"  if {condition}:")
+      indent = "    "
+    lines += [
+      f"{indent}try:",
+      f"{indent}  values[{name!r}] = {fitter}(value)",
+      f"{indent}except (ValueError, TypeError) as e:",
+      f"{indent}  _raise_fitting_error({fitter}, {for_class.__name__!r}, {name!r}, e)",
+    ]
+
+  source = "\n".join(lines) + "\n"
+  logger.debug("Generated validator for %s:\n%s", for_class.__qualname__, source)
+  exec(compile(source, f"<scaf validator for {for_class.__qualname__}>", "exec"), namespace)  # noqa: S102
+  validate = namespace["validate"]
+  validate.__qualname__ = f"{for_class.__qualname__}.{validate.__name__}"
+  return validate
+
+
+def get_validator(for_class: type) -> Callable[[object], None]:
+  """Return the generated validator for a dataclass, rebuilding it whenever its plan is rebuilt."""
+  plan = get_fit_plan(for_class)
+  cached = for_class.__dict__.get(_VALIDATOR_ATTRIBUTE)
+  if cached is None or cached[0] is not plan:
+    cached = (plan, build_validator(for_class, plan))
+    setattr(for_class, _VALIDATOR_ATTRIBUTE, cached)
+  return cached[1]
@@ -1,5 +1,6 @@
 """May touch filesystem, but not DB or network."""
 
+import dataclasses
 import importlib.util
 import inspect
 import json
@@ -15,8 +16,9 @@ from types import ModuleType
 from typing import get_args, get_origin
 from zoneinfo import ZoneInfo
 
+from scaf.codec.json_writer import to_json
 from scaf.config import SCAF_FOLDER_NAME
-from scaf.output import JSONEncoder
+from scaf.shape.entity import FieldPlan, FitPlan
 
 logger = logging.getLogger(__name__)
 
@@ -140,64 +142,63 @@ def get_acceptable_types(field: Field):
   return t, t, False
 
 
-def get_fitter(for_class: type, field_name: str):
-  logger.debug(f"👋 {get_fitter.__name__} {for_class=} {field_name=}")
-  try:
-    fields = for_class.__dataclass_fields__
-  except AttributeError:
-    logger.warning(f"Failed to get fitter for {field_name}. {for_class} is not a dataclass.")
-    return lambda x: x
+_FIT_PLAN_ATTRIBUTE = "__scaf_fit_plan__"
 
-  try:
-    field = fields[field_name]
-  except KeyError:
-    logger.warning(f"Failed to get fitter for {field_name}. Field not found in {for_class}.")
-    return lambda x: x
+_fit_plan_generation = 0
+_rules_modules: dict[Path, ModuleType | None] = {}
 
-  # 1. Convention: fit_<field_name> in the sibling rules module
+
+def invalidate_fit_plans() -> None:
+  """Make every class rebuild its fit plan, re-reading its `rules.py`, before its next use."""
+  global _fit_plan_generation
+  _fit_plan_generation += 1
+  _rules_modules.clear()
+
+
+def _load_rules_module(for_class: type) -> ModuleType | None:
+  """The `rules.py` next to the file defining the class, loaded at most once per generation."""
   try:
-    class_file = inspect.getfile(for_class)
-    logger.debug(f"{class_file=}")
-    rules_file = Path(class_file).parent / "rules.py"
-    logger.debug(f"{rules_file=}")
+    rules_file = Path(inspect.getfile(for_class)).parent / "rules.py"
+  except (TypeError, OSError) as e:
+    logger.debug(f"Failed to locate rules module for {for_class}: {e}")
+    return None
+
+  if rules_file not in _rules_modules:
+    rules_mod = None
     if rules_file.exists():
       spec = importlib.util.spec_from_file_location(rules_file.as_posix(), str(rules_file))
       if spec and spec.loader:
         rules_mod = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(rules_mod)
-        if fn := getattr(rules_mod, f"fit_{field_name}", None):
-          if callable(fn):
-            logger.debug(f"Using {rules_file}::fit_{field_name} for {field_name}")
-            return fn
-  except (TypeError, OSError) as e:
-    logger.debug(f"Failed to get fitter from rules module: {e}")
+        try:
+          spec.loader.exec_module(rules_mod)
+        except (TypeError, OSError) as e:
+          logger.debug(f"Failed to load rules module {rules_file}: {e}")
+          rules_mod = None
+    _rules_modules[rules_file] = rules_mod
+  return _rules_modules[rules_file]
 
-  # 2. Explicit fitter in field metadata
-  if fitter := field.metadata.get("fitter", None):
-    logger.warning(f"Using deprecated metadata {fitter=} for {field_name=}")
-    return fitter
 
-  logger.debug(msg=f"No fitter defined for {field_name}; using simple type check")
+def _get_check_type(domain_type) -> type:
+  """The type `fit_by_type` checks values against; `object` if it can't check them."""
+  if not isinstance(domain_type, type):
+    return object
+  return get_origin(domain_type) or domain_type  # e.g. list[str] -> list
 
-  def fit_by_type(value):
-    domain_type, proxy_type, optional = get_acceptable_types(field)
 
+def _make_type_fitter(field_name: str, domain_type, proxy_type, optional: bool):
+  if (check_type := _get_check_type(domain_type)) is object:
+    logger.debug(f"Unable to infer domain type for {field_name}. Fitting will be skipped.")
+
+  def fit_by_type(value):
     if value is None:
       if optional:
         return None
       else:
         raise ValueError(f"{field_name} cannot be None")
 
-    if not isinstance(domain_type, type):
-      logger.debug(f"Unable to infer domain type for {field_name}. Skipping fitting.")
+    if isinstance(value, check_type):
       return value
-
-    if origin_type := get_origin(domain_type):  # e.g. list[str]
-      domain_type = origin_type
-
-    if isinstance(value, domain_type):
-      return value
-    elif domain_type is datetime:
+    elif check_type is datetime:
       return parse_datetime(value)
 
     return proxy_type(value)  # type: ignore
@@ -205,6 +206,61 @@ def get_fitter(for_class: type, field_name: str):
   return fit_by_type
 
 
+def _build_fit_plan(for_class: type) -> FitPlan:
+  logger.debug(f"Building fit plan for {for_class}")
+  rules_mod = _load_rules_module(for_class)
+  fields = {}
+  for field in dataclasses.fields(for_class):  # Unlike __dataclass_fields__, skips ClassVars
+    field_name = field.name
+    canonical_type, proxy_type, optional = get_acceptable_types(field)
+
+    check_type = None
+
+    # 1. Convention: fit_<field_name> in the sibling rules module
+    if callable(fitter := getattr(rules_mod, f"fit_{field_name}", None)):
+      logger.debug(f"Using {rules_mod.__name__}::fit_{field_name} for {field_name}")
+    # 2. Explicit fitter in field metadata
+    elif fitter := field.metadata.get("fitter", None):
+      logger.warning(f"Using deprecated metadata {fitter=} for {field_name=}")
+    else:
+      logger.debug(msg=f"No fitter defined for {field_name}; using simple type check")
+      fitter = _make_type_fitter(field_name, canonical_type, proxy_type, optional)
+      check_type = _get_check_type(canonical_type)
+
+    fields[field_name] = FieldPlan(
+      name=field_name,
+      init=field.init,
+      fitter=fitter,
+      canonical_type=canonical_type,
+      proxy_type=proxy_type,
+      optional=optional,
+      check_type=check_type,
+    )
+  return FitPlan(fields=fields, generation=_fit_plan_generation)
+
+
+def get_fit_plan(for_class: type) -> FitPlan:
+  """Return the dataclass's fit plan, building it on first use and caching it on the class."""
+  plan = for_class.__dict__.get(_FIT_PLAN_ATTRIBUTE)
+  if plan is None or plan.generation != _fit_plan_generation:
+    plan = _build_fit_plan(for_class)
+    setattr(for_class, _FIT_PLAN_ATTRIBUTE, plan)
+  return plan
+
+
+def get_fitter(for_class: type, field_name: str):
+  logger.debug(f"👋 {get_fitter.__name__} {for_class=} {field_name=}")
+  if not hasattr(for_class, "__dataclass_fields__"):
+    logger.warning(f"Failed to get fitter for {field_name}. {for_class} is not a dataclass.")
+    return lambda x: x
+
+  try:
+    return get_fit_plan(for_class).fields[field_name].fitter
+  except KeyError:
+    logger.warning(f"Failed to get fitter for {field_name}. Field not found in {for_class}.")
+    return lambda x: x
+
+
 def get_scaf_folder(root: Path) -> Path:
   return root / SCAF_FOLDER_NAME
 
@@ -221,4 +277,4 @@ def read_json_file(path: Path) -> dict:
 
 
 def write_json_file(path: Path, data: dict) -> None:
-  path.write_text(json.dumps(data, indent=2, cls=JSONEncoder) + "\n", encoding="utf-8")
+  path.write_text(to_json(data, indent=2) + "\n", encoding="utf-8")
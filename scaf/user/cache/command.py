@@ -0,0 +1,42 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from scaf.core import Shape
+from scaf.deck.entity import Deck
+
+
+@dataclass
+class Cache(Shape):
+  """Report on (and optionally prune) the files scaf caches in a deck's .scaf folder."""
+
+  deck: Deck = field(
+    doc="Path to the scaf deck whose cache should be inspected.",
+  )
+  prune: bool = field(
+    default=False,
+    doc="Delete entries that can no longer be used, e.g. because their source file changed or "
+    "their result expired.",
+  )
+  clear: bool = field(
+    default=False,
+    doc="Delete every entry.",
+  )
+
+  @dataclass
+  class Result:
+    folder: Path
+    entries: int
+    bytes: int
+    stale: int
+    removed: int
+    results: int
+    results_bytes: int
+    expired: int
+    hits: int
+    misses: int
+    hit_rate: float
+
+  def execute(self):
+    from scaf.user.cache.handler import handle
+
+    return handle(self)
@@ -0,0 +1,67 @@
+import logging
+
+from scaf.cache.tools import (
+  BYTECODE_FOLDER_NAME,
+  RESULTS_FOLDER_NAME,
+  clear_result_stats,
+  is_stale,
+  read_result_stats,
+  scan_bytecode_cache,
+  scan_result_cache,
+)
+from scaf.user.cache.command import Cache
+
+logger = logging.getLogger(__name__)
+
+
+def handle(command: Cache) -> Cache.Result:
+  logger.debug(f"Handling {command=}")
+  bytecode_folder = command.deck.cache_folder / BYTECODE_FOLDER_NAME
+
+  entries = total_bytes = stale = removed = 0
+  for bytecode_file, entry in scan_bytecode_cache(bytecode_folder):
+    try:
+      size = bytecode_file.stat().st_size
+    except OSError:
+      continue  # Removed by another process
+    is_unusable = entry is None or is_stale(entry)
+    if command.clear or (command.prune and is_unusable):
+      logger.debug(f"Removing {bytecode_file}")
+      bytecode_file.unlink(missing_ok=True)
+      removed += 1
+      continue
+    entries += 1
+    total_bytes += size
+    stale += is_unusable
+
+  results_folder = command.deck.cache_folder / RESULTS_FOLDER_NAME
+  results = results_bytes = expired = 0
+  for result_file, entry in scan_result_cache(results_folder):
+    is_unusable = entry is None or entry.expired
+    if command.clear or (command.prune and is_unusable):
+      logger.debug(f"Removing {result_file}")
+      result_file.unlink(missing_ok=True)
+      removed += 1
+      continue
+    results += 1
+    results_bytes += entry.size if entry else 0
+    expired += is_unusable
+
+  if command.clear:
+    clear_result_stats(results_folder)
+  stats = read_result_stats(results_folder)
+  lookups = stats.hits + stats.misses
+
+  return Cache.Result(
+    folder=bytecode_folder,
+    entries=entries,
+    bytes=total_bytes,
+    stale=stale,
+    removed=removed,
+    results=results,
+    results_bytes=results_bytes,
+    expired=expired,
+    hits=stats.hits,
+    misses=stats.misses,
+    hit_rate=stats.hits / lookups if lookups else 0.0,
+  )
@@ -0,0 +1 @@
+from scaf.user.discover.rules import fit_deck  # noqa: F401
@@ -16,9 +16,39 @@ class Call(Shape):
   )
   args: list[str] = field(
     default_factory=list,
-    doc="Arguments to pass to the action.",
+    doc="Arguments to pass to the action. Everything after the action path is passed on as is, "
+    "so scaf's own options go before it.",
     metadata={"nargs": argparse.REMAINDER},
   )
+  batch: str = field(
+    default="",
+    doc="Read JSON objects from this file ('-' for stdin), one per line, and call the action "
+    "with each, printing one JSON line per result.",
+  )
+  jobs: int = field(
+    default=1,
+    doc="With --batch, run records in this many worker processes.",
+  )
+  concurrency: int = field(
+    default=1,
+    doc="With --batch, let an async handler work on this many records at once in each process.",
+  )
+  format: str = field(
+    default="json",
+    doc="How to write results (and, with --batch, read records): 'json' or 'binary'.",
+  )
+  no_cache: bool = field(
+    default=False,
+    doc="Always run the handler, ignoring (and not storing) cached query results.",
+  )
+  refresh: bool = field(
+    default=False,
+    doc="Run the handler even if a cached query result is fresh, and cache the new result.",
+  )
+  unordered: bool = field(
+    default=False,
+    doc="With --jobs or --concurrency, print results as they complete instead of in input order.",
+  )
 
   def execute(self):
     from scaf.user.call.handler import handle
@@ -4,9 +4,12 @@ import sys
 from scaf.action_package.create.command import CreateActionPackage
 from scaf.action_package.entity import ActionPackage
 from scaf.action_package.invoke.command import InvokeActionPackage
+from scaf.action_package.invoke_batch.command import InvokeActionPackageBatch
 from scaf.action_package.load.command import LoadActionPackage
+from scaf.cache.tools import get_results_folder
 from scaf.deck.entity import Deck
 from scaf.deck.locate.command import LocateDeck
+from scaf.output import print_binary
 from scaf.user.call.command import Call
 
 logger = logging.getLogger(__name__)
@@ -37,4 +40,27 @@ def handle(command: Call):
     action_package = LoadActionPackage(root=root, action=action).execute()
   except ActionPackage.DoesNotExist:
     action_package = CreateActionPackage(deck=deck, action=action).execute()
-  return InvokeActionPackage(action_package, command.args).execute()
+
+  if command.batch:
+    if command.args:
+      raise ValueError(f"Action arguments can't be combined with --batch: {command.args}")
+    return InvokeActionPackageBatch(
+      action_package,
+      command.batch,
+      root=root,
+      jobs=command.jobs,
+      concurrency=command.concurrency,
+      ordered=not command.unordered,
+      format=command.format,
+    ).execute()
+
+  result = InvokeActionPackage(
+    action_package,
+    command.args,
+    results_folder=None if command.no_cache else get_results_folder(root),
+    refresh=command.refresh,
+  ).execute()
+  if command.format == "binary":
+    print_binary(result)
+    return None
+  return result
@@ -3,6 +3,8 @@ from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+FORMATS = ("json", "binary")
+
 
 def fit_action(value: Path | str) -> Path:
   if isinstance(value, str):
@@ -12,3 +14,21 @@ def fit_action(value: Path | str) -> Path:
   if value.as_posix() == ".":
     raise ValueError("must not be empty")
   return value
+
+
+def fit_jobs(value: int | str) -> int:
+  value = int(value)
+  if value < 1:
+    raise ValueError("must be at least 1")
+  return value
+
+
+def fit_concurrency(value: int | str) -> int:
+  return fit_jobs(value)
+
+
+def fit_format(value: str) -> str:
+  value = value.strip().lower()
+  if value not in FORMATS:
+    raise ValueError(f"must be one of: {', '.join(FORMATS)}")
+  return value
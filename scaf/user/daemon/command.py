@@ -0,0 +1,26 @@
+from dataclasses import dataclass, field
+
+from scaf.core import Shape
+from scaf.deck.entity import Deck
+
+
+@dataclass
+class Daemon(Shape):
+  """Keep a deck's action packages loaded, so `scaf call` can skip cold starts."""
+
+  deck: Deck = field(
+    doc="Path to the scaf deck whose actions should be kept warm.",
+  )
+  depth: int = field(
+    default=5,
+    doc="Preload actions up to this many levels below the deck root.",
+  )
+  poll_interval: float = field(
+    default=1.0,
+    doc="Seconds between checks for changed source files.",
+  )
+
+  def execute(self):
+    from scaf.user.daemon.handler import handle
+
+    return handle(self)
@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+from scaf.action_package.load.command import LoadActionPackage
+from scaf.deck.entity import Deck
+from scaf.user.call.handler import ensure_import_path
+from scaf.user.daemon.command import Daemon
+from scaf.user.daemon.tools import STATUS_SIZE, recv_frame
+from scaf.user.discover.handler import find_available_actions
+from scaf.user.serve.handler import FileWatcher
+
+logger = logging.getLogger(__name__)
+
+_STDIO_FDS = 3
+
+
+def _exit_code(e: SystemExit) -> int:
+  if e.code is None:
+    return 0
+  if isinstance(e.code, int):
+    return e.code
+  print(e.code, file=sys.stderr)
+  return 1
+
+
+def _run_forwarded_call(request: dict, fds: list[int]) -> int:
+  """Run a forwarded `scaf` invocation as if it had been started by the client."""
+  from scaf.cli import dispatch
+
+  for target_fd, fd in enumerate(fds):
+    os.dup2(fd, target_fd)
+    os.close(fd)
+  os.chdir(request["cwd"])
+  os.environ.clear()
+  os.environ.update(request["env"])
+  logging.root.handlers.clear()  # Let the call configure its own verbosity
+
+  try:
+    dispatch(request["argv"])
+    return 0
+  except SystemExit as e:
+    return _exit_code(e)
+  except Exception:
+    logger.exception("Unhandled error in forwarded call")
+    return 1
+  finally:
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+
+class _CallHandler(socketserver.BaseRequestHandler):
+  """Runs in a child forked from the warm daemon, once per forwarded call."""
+
+  def handle(self):
+    _, fds, _, _ = socket.recv_fds(self.request, 1, _STDIO_FDS)
+    if len(fds) != _STDIO_FDS:
+      logger.warning("Expected %d stdio fds from client, got %d", _STDIO_FDS, len(fds))
+      return
+    request = json.loads(recv_frame(self.request))
+    code = _run_forwarded_call(request, fds)
+    self.request.sendall(code.to_bytes(STATUS_SIZE, "big", signed=True))
+
+
+class _DaemonServer(socketserver.ForkingUnixStreamServer):
+  def __init__(
+    self,
+    socket_path: str,
+    watcher: FileWatcher,
+    poll_interval: float,
+    deck: Deck,
+    actions: list[Path],
+  ):
+    self._watcher = watcher
+    self._poll_interval = poll_interval
+    self._last_poll = time.monotonic()
+    self._deck = deck
+    self._actions = actions
+    super().__init__(socket_path, _CallHandler)
+
+  def process_request(self, request, client_address):
+    logger.info("Forking for forwarded call")
+    if self._watcher.backend == "inotify":
+      self._reload_changes()  # Cheap with inotify, so the call sees an edit made just before it
+    super().process_request(request, client_address)
+
+  def service_actions(self):
+    # Poll from the serving loop rather than a thread, so forking stays safe
+    super().service_actions()
+    if time.monotonic() - self._last_poll >= self._poll_interval:
+      self._reload_changes()
+      self._last_poll = time.monotonic()
+
+  def _reload_changes(self):
+    if self._watcher.poll():
+      # Bring the loader's cache up to date here, or every forked call would load the package again
+      load_actions(self._deck, self._actions)
+
+
+def load_actions(deck: Deck, actions: Iterable[Path]) -> list[Path]:
+  """Load each action package in the deck, or reuse it if it's unchanged. Returns those loaded."""
+  loaded = []
+  for action in actions:
+    try:
+      LoadActionPackage(root=deck.root, action=action).execute()
+      loaded.append(action)
+    except Exception as e:  # noqa: BLE001
+      logger.warning("Failed to load action package %s: %s", action.as_posix(), e)
+  return loaded
+
+
+def preload_actions(deck: Deck, depth: int) -> list[Path]:
+  """Load scaf's call path and every action in the deck. Returns the actions loaded."""
+  import scaf.cli
+
+  # Loaded as scaf's own dispatch loads it, so forked calls find it cached
+  LoadActionPackage(root=scaf.cli.USER_ROOT, action=Path("call")).execute()
+  ensure_import_path(deck)
+  return load_actions(deck, find_available_actions(deck.root, depth))
+
+
+def _is_serving(socket_path) -> bool:
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+    try:
+      sock.connect(str(socket_path))
+      return True
+    except OSError:
+      return False
+
+
+def handle(command: Daemon) -> None:
+  logger.debug(f"Handling {command=}")
+  deck = command.deck
+  socket_path = deck.daemon_socket
+
+  if socket_path.exists():
+    if _is_serving(socket_path):
+      raise RuntimeError(f"A daemon is already serving {deck.root.as_posix()}")
+    socket_path.unlink()  # Left behind by a daemon that didn't shut down cleanly
+
+  actions = preload_actions(deck, command.depth)
+  watcher = FileWatcher(deck.root, poll_interval=command.poll_interval)
+  watcher.poll()  # Record initial mtimes
+
+  server = _DaemonServer(str(socket_path), watcher, command.poll_interval, deck, actions)
+  signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # Clean up the socket on kill
+  print(f"scaf daemon serving {len(actions)} action(s) on {socket_path}", file=sys.stderr)
+  sys.stderr.flush()  # Anything left in the buffer would be duplicated into forked calls
+  try:
+    server.serve_forever(poll_interval=min(command.poll_interval, 0.5))
+  except KeyboardInterrupt:
+    logger.info("Daemon stopped.")
+  finally:
+    server.server_close()
+    socket_path.unlink(missing_ok=True)
@@ -0,0 +1,8 @@
+from scaf.user.discover.rules import fit_deck  # noqa: F401
+
+
+def fit_poll_interval(value: float | str) -> float:
+  value = float(value)
+  if value <= 0:
+    raise ValueError("must be positive")
+  return value
@@ -0,0 +1,123 @@
+"""Client side of `scaf daemon`. Kept import-light, since it runs before anything else."""
+
+import dataclasses
+import functools
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+from scaf.config import DAEMON_SOCKET_FILENAME, SCAF_FOLDER_NAME
+
+NO_DAEMON_ENV_VAR = "SCAF_NO_DAEMON"
+"""Set this to anything to always run calls in-process."""
+
+STATUS_SIZE = 4
+"""Bytes used to send a call's exit code back to the client."""
+
+
+def send_frame(sock: socket.socket, data: bytes) -> None:
+  sock.sendall(len(data).to_bytes(4, "big") + data)
+
+
+def recv_exactly(sock: socket.socket, size: int) -> bytes:
+  chunks = []
+  while size:
+    chunk = sock.recv(size)
+    if not chunk:
+      raise ConnectionError("Connection closed before the message was complete")
+    chunks.append(chunk)
+    size -= len(chunk)
+  return b"".join(chunks)
+
+
+def recv_frame(sock: socket.socket) -> bytes:
+  size = int.from_bytes(recv_exactly(sock, 4), "big")
+  return recv_exactly(sock, size)
+
+
+def find_daemon_socket(action: str) -> Path | None:
+  """Mirror `LocateDeck`: look for a running daemon in the action's parents."""
+  for parent in Path(action).parents:
+    candidate = parent / SCAF_FOLDER_NAME / DAEMON_SOCKET_FILENAME
+    if candidate.is_socket():
+      return candidate
+  return None
+
+
+@functools.cache
+def get_call_options() -> dict[str, bool]:
+  """`scaf call`'s options, and whether each takes a value, as its parser defines them.
+
+  Only imported once a call passes options, so plain calls stay quick to forward.
+  """
+  from scaf.tools import to_slug_case
+  from scaf.user.call.command import Call
+
+  return {
+    f"--{to_slug_case(field.name)}": field.type is not bool
+    for field in dataclasses.fields(Call)
+    if field.name not in ("action", "args")  # Positionals
+  }
+
+
+def _match_call_option(token: str) -> str | None:
+  """The option a token names, allowing unambiguous abbreviations as argparse does."""
+  options = get_call_options()
+  if token in options:
+    return token
+  matches = [option for option in options if option.startswith(token)]
+  return matches[0] if len(matches) == 1 and token.startswith("--") else None
+
+
+def _find_call_target(argv: list[str]) -> str | None:
+  """Return the action path if argv is a `scaf call`, e.g. `-v call --jobs 2 path/to/action`.
+
+  Returns None for options it can't tell apart, leaving the call to be parsed in-process.
+  """
+  tokens = iter(argv)
+  if next((token for token in tokens if not token.startswith("-")), None) != "call":
+    return None
+  for token in tokens:
+    if not token.startswith("-"):
+      return token
+    name, has_value, _ = token.partition("=")
+    if not (option := _match_call_option(name)):
+      return None
+    if get_call_options()[option] and not has_value:
+      next(tokens, None)  # The option's value
+  return None
+
+
+def forward_to_daemon(argv: list[str]) -> int | None:
+  """Run a `scaf call` in a warm daemon, if one is serving the action's deck.
+
+  Returns the call's exit code, or None if the caller should run it in-process instead.
+  """
+  if os.environ.get(NO_DAEMON_ENV_VAR) or not hasattr(socket, "send_fds"):
+    return None
+  if sys.stdout is not sys.__stdout__ or sys.stderr is not sys.__stderr__:
+    return None  # stdio is redirected in-process, which a daemon can't write to
+  if not (action := _find_call_target(argv)):
+    return None
+  if not (socket_path := find_daemon_socket(action)):
+    return None
+
+  sys.stdout.flush()
+  sys.stderr.flush()
+  request = {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+    try:
+      sock.connect(str(socket_path))
+      socket.send_fds(sock, [b"\0"], [0, 1, 2])
+      send_frame(sock, json.dumps(request).encode("utf-8"))
+    except OSError:
+      return None  # Stale socket; nothing has run yet, so it's safe to run in-process
+
+    try:
+      return int.from_bytes(recv_exactly(sock, STATUS_SIZE), "big", signed=True)
+    except OSError as e:
+      # The call may have had side effects already, so don't run it a second time
+      print(f"scaf: lost connection to daemon at {socket_path}: {e}", file=sys.stderr)
+      return 1
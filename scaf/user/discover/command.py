@@ -17,9 +17,18 @@ class Discover(Shape):
     default=5,
   )
   filter: str = field(
-    doc="return only aliases starting with this glob pattern (e.g. 'mydomain/*')",
+    doc="return only aliases whose action path starts with this glob (e.g. 'mydomain/*')",
     default="",
   )
+  backend: str = field(
+    doc="'git' to find actions from the files git knows about, skipping untracked build trees, "
+    "or 'walk' to walk the folders (the default, until 'git' is chosen once)",
+    default="",
+  )
+  full: bool = field(
+    doc="rescan every folder, rather than only those changed since the last discovery",
+    default=False,
+  )
   user: bool = field(
     doc="exit with code 0 after printing the listing (instead of returning it to the caller)",
     default=True,
@@ -2,11 +2,11 @@ import logging
 import sys
 from pathlib import Path
 
-from scaf.action_package.entity import ActionPackage
-from scaf.action_package.load.command import LoadActionPackage
-from scaf.action_package.rules import must_contain_required_files
+from scaf.action_package.tools import find_shape_file, find_unresolved_imports, read_shape_metadata
 from scaf.alias.entity import Alias
 from scaf.alias.tools import append_aliases, parse_all_aliases
+from scaf.manifest.load.query import LoadManifest
+from scaf.manifest.tools import PathMatcher
 from scaf.tools import to_dot_path, to_slug_case
 from scaf.user.call.handler import ensure_import_path
 from scaf.user.discover.command import Discover
@@ -15,55 +15,12 @@ from scaf.user.show.handler import _print_alias_listing
 logger = logging.getLogger(__name__)
 
 
-def load_scafignore(domain_folder: Path) -> list[str]:
-  """Load .scafignore file from domain folder, if it exists."""
-  ignore_file = domain_folder / ".scafignore"
-  ignore_patterns = []
-  if ignore_file.exists():
-    with ignore_file.open("r", encoding="utf-8") as f:
-      for line in f:
-        line = line.strip()
-        if line and not line.startswith("#"):
-          ignore_patterns.append(line)
-    logger.info("Loaded .scafignore with %d pattern(s)", len(ignore_patterns))
-  return ignore_patterns
-
-
-def find_available_actions(root: Path, max_depth: int) -> list[Path]:
-  logger.info("Searching for action packages in domain folder: %s", root.as_posix())
-  ignore_patterns = load_scafignore(root)
-  actions = []
-
-  for base, dirs, files in root.walk():
-    if base == root:
-      continue  # Skip root
-
-    if base.name.startswith(".") or base.name.startswith("_"):
-      continue  # Skip hidden/private folders
-
-    if not files:
-      continue  # Skip folders without files, as they can't be action packages
-
-    logger.debug(f"{base=}, {dirs=}, {files=}")
-    folder = base.relative_to(root)
-    depth = len(folder.parts)
-
-    if depth > max_depth:
-      dirs[:] = []  # Don't recurse further into this directory
-      continue
-    elif depth > 0:  # Skip root
-      # Apply ignore patterns, e.g. temp* or */logs
-      if any(folder.match(pattern) for pattern in ignore_patterns):
-        logger.debug("Ignoring folder due to .scafignore: %s", folder)
-        continue
-
-      try:
-        must_contain_required_files(files)
-        actions.append(folder)
-      except ValueError:
-        continue
-
-  return sorted(actions)
+def find_available_actions(
+  root: Path, max_depth: int, full: bool = False, backend: str = ""
+) -> list[Path]:
+  """List action packages under the root, reading from (and refreshing) the deck's manifest."""
+  manifest = LoadManifest(root=root, max_depth=max_depth, backend=backend, full=full).execute()
+  return manifest.actions_within(max_depth)
 
 
 # TODO: use this
@@ -80,27 +37,42 @@ def generate_verb_noun_name(action_name: str, capability: str) -> str:
   return f"{action_slug}-{capability_slug}"
 
 
-def generate_alias_name(root: Path, action_package: ActionPackage) -> str:
+def generate_alias_name(action: Path) -> str:
   # TODO: handle capable entities
-  return to_dot_path(action_package.action_folder.relative_to(root)).replace("_", "-")
+  return to_dot_path(action).replace("_", "-")
+
+
+def check_action_package(root: Path, action: Path) -> None:
+  """Statically check that the action could be loaded from the root, without importing it.
+
+  Raises ValueError if it has no shape class, or imports modules that aren't on `sys.path`.
+  """
+  action_folder = root / action
+  shape_file = find_shape_file(action_folder)
+  if not shape_file or not read_shape_metadata(shape_file):
+    raise ValueError(f"No shape class found in {action_folder.as_posix()}")
+  for source_file in (shape_file, action_folder / "handler.py"):
+    if unresolved := find_unresolved_imports(source_file):
+      raise ValueError(f"No module named {unresolved[0]!r} (imported by {source_file.name})")
 
 
 def generate_action_aliases(root: Path, actions: list[Path], filter="") -> list[Alias]:
   logger.info("Generating aliases for %d actions", len(actions))
   aliases: list[Alias] = []
+  included = PathMatcher([filter], anchored=True)
 
   for action in actions:
-    if filter and not action.match(filter):
+    if filter and not included.matches_within(action.as_posix()):
       logger.debug("Skipping action '%s' due to filter '%s'", action, filter)
       continue
 
     try:
-      ap = LoadActionPackage(root=root, action=action).execute()
-    except Exception as e:
+      check_action_package(root, action)
+    except ValueError as e:
       logger.warning("Failed to load action package %s: %s", action, e)
       continue
 
-    alias_name = generate_alias_name(root, ap)
+    alias_name = generate_alias_name(action)
     aliases.append(Alias(name=alias_name, root=root, action=action))
 
   return aliases
@@ -111,7 +83,7 @@ def handle(command: Discover):
   ensure_import_path(deck)
 
   # Discover available actions and generate aliases for them
-  actions = find_available_actions(deck.root, command.depth)
+  actions = find_available_actions(deck.root, command.depth, command.full, command.backend)
   discovered_aliases = generate_action_aliases(deck.root, actions, command.filter)
 
   if not command.user:
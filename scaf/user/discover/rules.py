@@ -2,6 +2,7 @@ import logging
 
 from scaf.deck.entity import Deck
 from scaf.deck.rules import fit_root
+from scaf.manifest.load.rules import fit_backend  # noqa: F401
 
 logger = logging.getLogger(__name__)
 
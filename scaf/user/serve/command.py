@@ -15,6 +15,22 @@ class Serve(Shape):
     default=54545,
     doc="Port number to listen on.",
   )
+  test_timeout: float = field(
+    default=60.0,
+    doc="Seconds a test run may take before its worker process is killed and replaced.",
+  )
+  threads: int = field(
+    default=16,
+    doc="Requests handled at once; any more wait for a thread to free up.",
+  )
+  keep_alive: float = field(
+    default=2.0,
+    doc="Seconds an idle connection is kept open for another request, unless others are waiting.",
+  )
+  concurrency: int = field(
+    default=8,
+    doc="Calls to async handlers that may run at once; any more wait for one to finish.",
+  )
 
   def execute(self):
     from scaf.user.serve.handler import handle
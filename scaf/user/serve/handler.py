@@ -1,45 +1,78 @@
 import ast
+import inspect
 import json
 import logging
-import os
+import queue
+import select
 import sys
 import threading
+import time
 import uuid
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from urllib.parse import urlparse
 
+from scaf.action_package.entity import ActionPackage
+from scaf.action_package.invoke.tools import call_with_cache, resolve_result
+from scaf.action_package.load.command import LoadActionPackage
+from scaf.cache.tools import get_results_folder
+from scaf.codec.binary import CONTENT_TYPE as BINARY_CONTENT_TYPE
+from scaf.codec.binary import decode, encode, frame
 from scaf.deck.entity import Deck
+from scaf.errors import FittingError
+from scaf.output import to_json, to_json_line
+from scaf.tools import invalidate_fit_plans
+from scaf.user.call.handler import ensure_import_path
 from scaf.user.serve.command import Serve
+from scaf.user.serve.tools import DEFAULT_TEST_TIMEOUT, Inotify, TestWorkerPool
 
 logger = logging.getLogger(__name__)
 
 _MAX_DISCOVER_DEPTH = 10
 
-_PYTEST_RUN_OPTS = [
-  "--override-ini=addopts=",
-  "--override-ini=python_files=test_fixtures.py",
-  "--override-ini=testpaths=",
-  "--import-mode=importlib",
-  "-p",
-  "no:cacheprovider",
-  "-p",
-  "no:logging",
-  "-p",
-  "no:capture",
-  "-q",
-]
+DEFAULT_REQUEST_THREADS = 16
+"""Connections handled at once; any more wait for a thread to free up."""
+
+DEFAULT_KEEP_ALIVE = 2.0
+"""Seconds an idle keep-alive connection may hold on to its thread."""
+
+_IDLE_CHECK_INTERVAL = 0.05
+"""How often an idle keep-alive connection checks whether another is waiting for its thread."""
+
+DEFAULT_CONCURRENCY = 8
+"""Calls to async handlers running at once, unless the server is told otherwise."""
+
+_MAX_TEST_WORKERS = 4
+"""Test runs in progress at once, each in its own worker process; any more are queued."""
 
 
 class FileWatcher:
-  """Background thread that polls .py files under a directory and reloads changed modules."""
+  """Background thread that reloads changed modules under a directory.
 
-  def __init__(self, watch_dir, poll_interval: float = 1.0):
+  Changes are delivered by inotify where it's available, and found by polling the mtime of every
+  .py file otherwise.
+  """
+
+  def __init__(self, watch_dir, poll_interval: float = 1.0, inotify: bool = True):
     self._watch_dir = watch_dir
     self._poll_interval = poll_interval
     self._mtimes: dict = {}
     self._stop = threading.Event()
     self._thread: threading.Thread | None = None
+    self._inotify: Inotify | None = None
+    if inotify:
+      try:
+        self._inotify = Inotify(watch_dir)
+      except OSError as e:
+        logger.info("Polling for changes under %s instead of using inotify: %s", watch_dir, e)
+
+  @property
+  def backend(self) -> str:
+    return "poll" if self._inotify is None else "inotify"
 
   def start(self):
     self._thread = threading.Thread(target=self._run, daemon=True, name="scaf-filewatcher")
@@ -49,14 +82,45 @@ class FileWatcher:
     self._stop.set()
 
   def _run(self):
-    while not self._stop.wait(self._poll_interval):
-      self._poll()
-
-  def _poll(self):
+    while not self._stop.is_set():
+      if self._inotify is None:
+        self._stop.wait(self._poll_interval)
+      else:
+        # Wakes as soon as there are events; the timeout only bounds how long stopping takes
+        select.select([self._inotify.fd], [], [], self._poll_interval)
+      if not self._stop.is_set():
+        self.poll()
+    if self._inotify is not None:
+      self._inotify.close()
+      self._inotify = None
+
+  def poll(self) -> bool:
+    """Reload any watched file that changed since the last call. Returns whether any had."""
+    if self._inotify is None:
+      return self._poll_files()
+    try:
+      changed, overflowed = self._inotify.read_changes()
+    except OSError as e:
+      logger.warning("Polling for changes under %s from now on: %s", self._watch_dir, e)
+      self._inotify.close()
+      self._inotify = None
+      self._poll_files()  # Records the mtimes to compare against from here on
+      return True  # Anything could have changed since the last event was read
+    if overflowed:
+      logger.warning("Missed some file changes; reloading every module under %s", self._watch_dir)
+      changed.update(self._loaded_files())
+    changed_modules = sorted(path for path in changed if path.endswith(".py"))
+    for path in changed_modules:
+      self._reload(str(Path(path).resolve()))
+    return bool(changed_modules)
+
+  def _poll_files(self) -> bool:
+    """Check every watched file once, reloading any that changed since the last check."""
     try:
       py_files = list(self._watch_dir.rglob("*.py"))
     except OSError:
-      return
+      return False
+    reloaded = False
     for path in py_files:
       try:
         mtime = path.stat().st_mtime
@@ -65,7 +129,18 @@ class FileWatcher:
       path_str = str(path.resolve())
       if path_str in self._mtimes and self._mtimes[path_str] != mtime:
         self._reload(path_str)
+        reloaded = True
       self._mtimes[path_str] = mtime
+    return reloaded
+
+  def _loaded_files(self) -> set[str]:
+    root = self._watch_dir.resolve()
+    return {
+      str(file)
+      for mod in list(sys.modules.values())
+      if getattr(mod, "__file__", None)
+      and (file := Path(mod.__file__).resolve()).is_relative_to(root)
+    }
 
   def _reload(self, path_str: str):
     to_reload = [
@@ -76,6 +151,7 @@ class FileWatcher:
       and str(Path(mod.__file__).resolve()) == path_str
     ]
     logger.debug("Reloading %s — found %d matching module(s)", path_str, len(to_reload))
+    invalidate_fit_plans()  # The file may be a rules.py, which is never in sys.modules
     for name, mod in to_reload:
       try:
         source = Path(path_str).read_text(encoding="utf-8")
@@ -86,17 +162,129 @@ class FileWatcher:
         logger.warning("Failed to reload module %s: %s", name, exc)
 
 
-class _Runner:
-  """In-process pytest plugin: tracks pass/fail outcome for a single test run."""
+class _TestRun:
+  """One run's results so far, to poll, or to stream as each test finishes."""
 
   def __init__(self):
-    self.outcome = None
-
-  def pytest_runtest_logreport(self, report):
-    if report.failed:
-      self.outcome = "fail"
-    elif report.when == "call" and report.passed and self.outcome is None:
-      self.outcome = "pass"
+    self.future: Future = Future()
+    self.results: list[dict] = []
+    self._updates: queue.SimpleQueue[dict | None] = queue.SimpleQueue()
+
+  def add_result(self, result: dict) -> None:
+    self.results.append(result)
+    self._updates.put(result)
+
+  def stream(self) -> Iterator[dict]:
+    """Yield each result as it's added, until the run is over. Only one caller may stream."""
+    while (result := self._updates.get()) is not None:
+      yield result
+    self.future.result()  # Raise whatever ended the run early
+
+  def finish(self, future: Future) -> None:
+    self.future = future
+    future.add_done_callback(lambda _: self._updates.put(None))
+
+
+class _TestRuns:
+  """Runs action tests on a few background threads, off the request threads."""
+
+  def __init__(self, max_workers: int = _MAX_TEST_WORKERS, keep: int = 100):
+    self.keep = keep
+    self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scaf-tests")
+    self._runs: OrderedDict[str, _TestRun] = OrderedDict()
+    self._lock = threading.Lock()
+
+  def submit(self, fn, *args) -> tuple[str, _TestRun]:
+    """Run `fn(*args, on_result=...)`, which calls `on_result` with each result it produces."""
+    run_id = uuid.uuid4().hex
+    run = _TestRun()
+    run.finish(self._executor.submit(fn, *args, on_result=run.add_result))
+    with self._lock:
+      self._runs[run_id] = run
+      while len(self._runs) > self.keep:
+        self._runs.popitem(last=False)  # Forget the oldest
+    return run_id, run
+
+  def get(self, run_id: str) -> _TestRun | None:
+    with self._lock:
+      return self._runs.get(run_id)
+
+  def shutdown(self) -> None:
+    self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _describe_run(run_id: str, run: _TestRun) -> dict:
+  future = run.future
+  if not future.done():
+    status = "running" if future.running() else "queued"
+    return {"id": run_id, "status": status, "results": list(run.results)}
+  if future.cancelled():
+    return {"id": run_id, "status": "failed", "error": "Cancelled"}
+  if (exc := future.exception()) is not None:
+    return {"id": run_id, "status": "failed", "error": str(exc)}
+  return {"id": run_id, "status": "done", "results": future.result()}
+
+
+class DevServer(ThreadingHTTPServer):
+  """Handles each connection on a bounded pool of threads, so a slow request doesn't hold up the
+  rest. An idle keep-alive connection gives up its thread as soon as another connection is waiting
+  for one. Tests run in a pool of warm worker processes.
+  """
+
+  daemon_threads = True
+
+  def __init__(
+    self,
+    server_address,
+    handler_class,
+    deck: Deck,
+    test_timeout: float = DEFAULT_TEST_TIMEOUT,
+    max_workers: int = DEFAULT_REQUEST_THREADS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    keep_alive: float = DEFAULT_KEEP_ALIVE,
+  ):
+    super().__init__(server_address, handler_class)
+    self.async_calls = threading.BoundedSemaphore(concurrency)
+    self.keep_alive = keep_alive
+    self.test_workers = TestWorkerPool(
+      deck.root, _MAX_TEST_WORKERS, test_timeout, preload_depth=_MAX_DISCOVER_DEPTH
+    )
+    self.test_runs = _TestRuns(max_workers=_MAX_TEST_WORKERS)
+    self.watcher: FileWatcher | None = None
+    self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scaf-http")
+    self._waiting = 0  # Connections accepted, but not yet given a thread
+    self._waiting_lock = threading.Lock()
+
+  def process_request(self, request, client_address):
+    with self._waiting_lock:
+      self._waiting += 1
+    self._pool.submit(self._process_waiting_request, request, client_address)
+
+  def _process_waiting_request(self, request, client_address):
+    with self._waiting_lock:
+      self._waiting -= 1
+    self.process_request_thread(request, client_address)
+
+  def wait_for_request(self, connection) -> bool:
+    """Wait for the next request on a kept-alive connection. Returns False if the connection
+    should be closed instead, because it stayed idle too long or another is waiting for a thread.
+    """
+    deadline = time.monotonic() + self.keep_alive
+    while (remaining := deadline - time.monotonic()) > 0:
+      if self._waiting:
+        return False
+      readable, _, _ = select.select([connection], [], [], min(remaining, _IDLE_CHECK_INTERVAL))
+      if readable:
+        return True
+    return False
+
+  def server_close(self):
+    super().server_close()
+    self._pool.shutdown(wait=False, cancel_futures=True)
+    self.test_runs.shutdown()
+    self.test_workers.close()
+    if self.watcher:
+      self.watcher.stop()
 
 
 _INDEX_HTML = """\
@@ -231,16 +419,31 @@ _INDEX_HTML = """\
 
     fetch('/actions/' + action + '/run', {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', 'Prefer': 'respond-async' },
       body: JSON.stringify({ payload, description: descInput.value, tests }),
     })
       .then(r => r.json())
-      .then(data => renderResults(data.results || []))
+      .then(run => run.id ? pollRun(run.id) : run)
+      .then(data => {
+        if (data.error) { resultsDiv.innerHTML = '<p class="fail">' + esc(data.error) + '</p>'; return; }
+        renderResults(data.results || []);
+      })
       .catch(e => { resultsDiv.innerHTML = '<p class="fail">Request failed: ' + esc(String(e)) + '</p>'; })
       .finally(() => { submitBtn.disabled = false; submitBtn.textContent = 'Run'; });
   });
 
   // ── Helpers ────────────────────────────────────────────────────────────────
+  function pollRun(id) {
+    return new Promise(resolve => setTimeout(resolve, 300))
+      .then(() => fetch('/runs/' + id))
+      .then(r => r.json())
+      .then(run => {
+        if (run.status !== 'queued' && run.status !== 'running') return run;
+        if (run.results.length) renderResults(run.results);  // Those that have finished so far
+        return pollRun(id);
+      });
+  }
+
   function renderResults(results) {
     if (!results.length) { resultsDiv.innerHTML = '<p class="err">No tests selected.</p>'; return; }
     let html = '<table><thead><tr><th>Test</th><th>Expected</th><th>Actual</th><th>Verdict</th></tr></thead><tbody>';
@@ -271,14 +474,30 @@ def _make_handler_class(deck: Deck):
   """Return a BaseHTTPRequestHandler subclass with the Serve command baked in."""
 
   class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections alive between requests
+    server: DevServer
+
+    def setup(self):
+      self.timeout = self.server.keep_alive  # Also bounds a stalled read mid-request
+      super().setup()
+
+    def handle(self):
+      # Clients don't pipeline requests, so there's nothing buffered to read between them
+      self.close_connection = True
+      self.handle_one_request()
+      while not self.close_connection and self.server.wait_for_request(self.connection):
+        self.handle_one_request()
+
     def log_message(self, format, *args):
       logger.debug(format, *args)
 
-    def _send_json(self, data, status: int = 200):
-      body = json.dumps(data).encode()
+    def _send_json(self, data, status: int = 200, headers: dict[str, str] | None = None):
+      body = to_json(data).encode()
       self.send_response(status)
       self.send_header("Content-Type", "application/json")
       self.send_header("Content-Length", str(len(body)))
+      for name, value in (headers or {}).items():
+        self.send_header(name, value)
       self.end_headers()
       self.wfile.write(body)
 
@@ -289,6 +508,38 @@ def _make_handler_class(deck: Deck):
       self.end_headers()
       self.wfile.write(body)
 
+    def _send_bytes(self, body: bytes, content_type: str, status: int = 200):
+      self.send_response(status)
+      self.send_header("Content-Type", content_type)
+      self.send_header("Content-Length", str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def _send_stream(self, items: Iterator, binary: bool = False):
+      """Send each item in its own chunk, as soon as it's produced.
+
+      Items are sent as lines of JSON, or as binary frames.
+      """
+      self.send_response(200)
+      self.send_header("Content-Type", BINARY_CONTENT_TYPE if binary else "application/x-ndjson")
+      self.send_header("Transfer-Encoding", "chunked")
+      self.end_headers()
+      try:
+        for item in items:
+          chunk = frame(encode(item)) if binary else f"{to_json_line(item)}\n".encode()
+          self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+      except OSError as exc:
+        logger.info("Client went away mid-stream: %s", exc)
+        self.close_connection = True
+      except Exception:
+        # Too late for an error status; closing without the last chunk tells the client it failed
+        logger.exception("Unhandled error while streaming a result")
+        self.close_connection = True
+      finally:
+        if close := getattr(items, "close", None):
+          close()
+
     def do_GET(self):
       parsed = urlparse(self.path)
       path = parsed.path.rstrip("/")
@@ -298,6 +549,8 @@ def _make_handler_class(deck: Deck):
       elif path.startswith("/actions/") and path.endswith("/tests"):
         action_path = path[len("/actions/") : -len("/tests")]
         self._handle_get_action_tests(action_path)
+      elif path.startswith("/runs/"):
+        self._handle_get_run(path[len("/runs/") :])
       else:
         self._send_html(_INDEX_HTML.encode("utf-8"))
 
@@ -308,7 +561,11 @@ def _make_handler_class(deck: Deck):
       if path.startswith("/actions/") and path.endswith("/run"):
         action_path = path[len("/actions/") : -len("/run")]
         self._handle_post_action_run(action_path)
+      elif path.startswith("/actions/") and path.endswith("/call"):
+        action_path = path[len("/actions/") : -len("/call")]
+        self._handle_post_action_call(action_path)
       else:
+        self.close_connection = True  # The body wasn't read, so the connection can't be reused
         self._send_json({"error": "Not found"}, status=404)
 
     def _handle_post_action_run(self, action_path: str):
@@ -325,6 +582,61 @@ def _make_handler_class(deck: Deck):
         logger.exception("Unhandled error in POST /run")
         self._send_json({"error": str(exc)}, status=500)
 
+    def _handle_post_action_call(self, action_path: str):
+      content_length = int(self.headers.get("Content-Length", 0))
+      raw = self.rfile.read(content_length)
+      binary_request = self.headers.get("Content-Type", "").startswith(BINARY_CONTENT_TYPE)
+      binary_response = BINARY_CONTENT_TYPE in self.headers.get("Accept", "")
+      if not binary_request:
+        try:
+          payload = json.loads(raw or b"{}")
+        except json.JSONDecodeError as exc:
+          self._send_json({"error": f"Invalid JSON: {exc}"}, status=400)
+          return
+        if not isinstance(payload, dict):
+          self._send_json({"error": "Expected a JSON object of the action's fields"}, status=400)
+          return
+
+      try:
+        action_package = LoadActionPackage(root=deck.root, action=Path(action_path)).execute()
+      except ActionPackage.DoesNotExist:
+        self._send_json({"error": f"No such action: {action_path}"}, status=404)
+        return
+      shape_class = action_package.shape_class
+      try:
+        action = decode(raw, shape_class) if binary_request else shape_class(**payload)
+      except (TypeError, ValueError, FittingError) as exc:
+        self._send_json({"error": f"{type(exc).__name__}: {exc}"}, status=400)
+        return
+      handler = action_package.logic_module.handle
+      # Held until an async stream has been sent, since its items are produced as it's sent
+      slot = (
+        self.server.async_calls
+        if inspect.iscoroutinefunction(handler) or inspect.isasyncgenfunction(handler)
+        else nullcontext()
+      )
+      with slot:
+        try:
+          result = call_with_cache(
+            action_package,
+            action,
+            get_results_folder(deck.root),
+            lambda: resolve_result(handler(action)),
+            refresh="no-cache" in self.headers.get("Cache-Control", ""),
+          )
+          if isinstance(result, Iterator):
+            self._send_stream(result, binary=binary_response)
+            return
+          if binary_response:
+            body, content_type = frame(encode(result)), BINARY_CONTENT_TYPE
+          else:
+            body, content_type = to_json(result).encode(), "application/json"
+        except Exception as exc:
+          logger.exception("Unhandled error in POST /call")
+          self._send_json({"error": f"{type(exc).__name__}: {exc}"}, status=500)
+          return
+      self._send_bytes(body, content_type)
+
     def _run_action_tests(self, action_path: str, body: dict):
       payload = body.get("payload", {})
       tests = body.get("tests", [])
@@ -347,54 +659,32 @@ def _make_handler_class(deck: Deck):
         json.dumps(fixture_data, indent=2), encoding="utf-8"
       )
 
-      # Run each requested test in-process with SCAF_FIXTURE set
       try:
-        import pytest  # noqa: PLC0415
+        import pytest  # noqa: F401
       except ImportError:
         self._send_json({"error": "pytest is not installed. Run: pip install pytest"}, status=500)
         return
-      old_fixture = os.environ.get("SCAF_FIXTURE")
-      old_no_xfail = os.environ.get("SCAF_NO_XFAIL")
-      os.environ["SCAF_FIXTURE"] = fixture_filename
-      os.environ["SCAF_NO_XFAIL"] = "1"
-      try:
-        results = []
-        for test_spec in tests:
-          test_name = test_spec.get("name", "")
-          expected = test_spec.get("expect", "pass")
-          func_name = test_name.split("::")[-1]
-          runner = _Runner()
-          pytest.main(
-            [
-              str(action_folder),
-              "-k",
-              func_name,
-              "--rootdir",
-              str(action_folder),
-            ]
-            + _PYTEST_RUN_OPTS,
-            plugins=[runner],
-          )
-          actual = runner.outcome or "fail"
-          results.append(
-            {
-              "test": test_name,
-              "expected": expected,
-              "actual": actual,
-              "passed": actual == expected,
-            }
-          )
-      finally:
-        if old_fixture is None:
-          os.environ.pop("SCAF_FIXTURE", None)
-        else:
-          os.environ["SCAF_FIXTURE"] = old_fixture
-        if old_no_xfail is None:
-          os.environ.pop("SCAF_NO_XFAIL", None)
-        else:
-          os.environ["SCAF_NO_XFAIL"] = old_no_xfail
 
-      self._send_json({"results": results})
+      # Tests run in the server's worker processes; the client can wait for them, stream them
+      # as they finish, or poll for them
+      run_id, run = self.server.test_runs.submit(
+        self.server.test_workers.run, action_folder, fixture_filename, tests
+      )
+      if "respond-async" in self.headers.get("Prefer", ""):
+        self._send_json(
+          _describe_run(run_id, run), status=202, headers={"Location": f"/runs/{run_id}"}
+        )
+      elif "application/x-ndjson" in self.headers.get("Accept", ""):
+        self._send_stream(run.stream())
+      else:
+        self._send_json({"results": run.future.result()})
+
+    def _handle_get_run(self, run_id: str):
+      run = self.server.test_runs.get(run_id)
+      if run is None:
+        self._send_json({"error": f"No such run: {run_id}"}, status=404)
+        return
+      self._send_json(_describe_run(run_id, run))
 
     def _handle_get_actions(self):
       from scaf.user.discover.handler import find_available_actions
@@ -422,19 +712,43 @@ def _make_handler_class(deck: Deck):
   return _Handler
 
 
-def make_server(deck: Deck, port: int, poll_interval: float = 1.0) -> HTTPServer:
-  """Create an HTTPServer and start a FileWatcher background thread."""
+def make_server(
+  deck: Deck,
+  port: int,
+  poll_interval: float = 1.0,
+  test_timeout: float = DEFAULT_TEST_TIMEOUT,
+  concurrency: int = DEFAULT_CONCURRENCY,
+  threads: int = DEFAULT_REQUEST_THREADS,
+  keep_alive: float = DEFAULT_KEEP_ALIVE,
+) -> DevServer:
+  """Create a DevServer, starting its test workers and a FileWatcher background thread."""
+  ensure_import_path(deck)
   handler_cls = _make_handler_class(deck)
-  server = HTTPServer(("127.0.0.1", port), handler_cls)
-
-  watcher = FileWatcher(deck.root, poll_interval=poll_interval)
-  watcher.start()
+  server = DevServer(
+    ("127.0.0.1", port),
+    handler_cls,
+    deck,
+    test_timeout,
+    max_workers=threads,
+    concurrency=concurrency,
+    keep_alive=keep_alive,
+  )
+
+  server.watcher = FileWatcher(deck.root, poll_interval=poll_interval)
+  server.watcher.start()
 
   return server
 
 
 def handle(command: Serve) -> None:
-  server = make_server(command.deck, command.port)
+  server = make_server(
+    command.deck,
+    command.port,
+    test_timeout=command.test_timeout,
+    concurrency=command.concurrency,
+    threads=command.threads,
+    keep_alive=command.keep_alive,
+  )
   host, port = server.server_address[0], server.server_address[1]
   print(f"scaf dev server listening on http://{host}:{port}", file=sys.stderr)
   try:
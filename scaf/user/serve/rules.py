@@ -0,0 +1,29 @@
+from scaf.user.discover.rules import fit_deck  # noqa: F401
+
+
+def fit_test_timeout(value: float | str) -> float:
+  value = float(value)
+  if value <= 0:
+    raise ValueError("must be positive")
+  return value
+
+
+def fit_concurrency(value: int | str) -> int:
+  value = int(value)
+  if value < 1:
+    raise ValueError("must be at least 1")
+  return value
+
+
+def fit_threads(value: int | str) -> int:
+  value = int(value)
+  if value < 1:
+    raise ValueError("must be at least 1")
+  return value
+
+
+def fit_keep_alive(value: float | str) -> float:
+  value = float(value)
+  if value <= 0:
+    raise ValueError("must be positive")
+  return value
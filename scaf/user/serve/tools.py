@@ -0,0 +1,474 @@
+"""Running an action's tests for the dev server in warm worker processes, and watching the deck
+for changed files.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import struct
+import sys
+import threading
+import time
+from collections.abc import Callable
+from multiprocessing.connection import Connection
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_PLUGIN_NAME = "scaf_fixture_selection"
+"""What an action's conftest looks up to find the fixture a dev server run is for."""
+
+FIXTURE_ENV_VAR = "SCAF_FIXTURE"
+NO_XFAIL_ENV_VAR = "SCAF_NO_XFAIL"
+"""Also set for each run, for conftests written before the plugin, since a worker only has one
+run at a time.
+"""
+
+DEFAULT_TEST_TIMEOUT = 60.0
+"""Seconds a test run may take before its worker is killed and replaced."""
+
+WORKER_START_TIMEOUT = 60.0
+"""Seconds a new worker may take to import pytest and the deck before it's given up on."""
+
+# From <sys/inotify.h>
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+
+_INOTIFY_MASK = _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_ONLYDIR
+"""Files finished being written, touched or moved into place, and folders created."""
+
+_INOTIFY_EVENT = struct.Struct("iIII")
+"""`struct inotify_event`, up to the name that follows it: wd, mask, cookie and len."""
+
+_PYTEST_RUN_OPTS = [
+  "--override-ini=addopts=",
+  "--override-ini=python_files=test_fixtures.py",
+  "--override-ini=testpaths=",
+  "--import-mode=importlib",
+  "-p",
+  "no:cacheprovider",
+  "-p",
+  "no:logging",
+  "-p",
+  "no:capture",
+  "-q",
+]
+
+
+class FixtureSelection:
+  """Per-run pytest plugin that tells an action's conftest which fixture to parametrize with.
+
+  The conftest finds it with `config.pluginmanager.get_plugin(FIXTURE_PLUGIN_NAME)`. Unlike
+  environment variables, each run sees its own, so runs can overlap in one process.
+  """
+
+  def __init__(self, fixture: str, no_xfail: bool = False):
+    self.__name__ = FIXTURE_PLUGIN_NAME  # The name pytest registers the plugin under
+    self.fixture = fixture
+    self.no_xfail = no_xfail
+
+
+class _Runner:
+  """In-process pytest plugin: tracks the outcome of each requested test function in a session,
+  and reports each one as soon as all of its nodes have finished.
+  """
+
+  def __init__(self, names: set[str], on_finished: Callable[[str, str], None]):
+    self.names = names
+    self.outcomes: dict[str, str] = {}
+    self._on_finished = on_finished
+    self._functions: dict[str, str] = {}  # By node id
+    self._pending: dict[str, int] = {}  # Nodes left to finish, by function
+
+  def pytest_collection_modifyitems(self, config, items):
+    # `-k` matches substrings, so `test_value` would also select `test_value_positive`
+    selected = [item for item in items if getattr(item, "originalname", item.name) in self.names]
+    if deselected := [item for item in items if item not in selected]:
+      config.hook.pytest_deselected(items=deselected)
+      items[:] = selected
+
+  def pytest_collection_finish(self, session):
+    for item in session.items:
+      name = getattr(item, "originalname", item.name)
+      self._functions[item.nodeid] = name
+      self._pending[name] = self._pending.get(name, 0) + 1
+
+  def pytest_runtest_logreport(self, report):
+    name = self._functions.get(report.nodeid)
+    if name is None:
+      return
+    if report.failed:
+      self.outcomes[name] = "fail"
+    elif report.when == "call" and report.passed:
+      self.outcomes.setdefault(name, "pass")
+    if report.when == "teardown":
+      self._pending[name] -= 1
+      if not self._pending[name]:
+        self._on_finished(name, self.outcomes.setdefault(name, "fail"))
+
+
+def run_tests(
+  root: Path,
+  action_folder: Path,
+  fixture_filename: str,
+  tests: list[dict],
+  on_result: Callable[[dict], None] | None = None,
+) -> list[dict]:
+  """Run the requested tests in-process against one fixture, in a single pytest session,
+  reporting whether each went as expected.
+
+  Each result is passed to `on_result` as soon as its test finishes; the returned list is in the
+  order the tests were requested.
+  """
+  import pytest
+
+  specs_by_name: dict[str, list[dict]] = {}
+  for test_spec in tests:
+    specs_by_name.setdefault(test_spec.get("name", "").split("::")[-1], []).append(test_spec)
+  results_by_name: dict[str, list[dict]] = {}
+
+  def finished(name: str, actual: str) -> None:
+    for test_spec in specs_by_name.get(name, []):
+      expected = test_spec.get("expect", "pass")
+      result = {
+        "test": test_spec.get("name", ""),
+        "expected": expected,
+        "actual": actual,
+        "passed": actual == expected,
+      }
+      results_by_name.setdefault(name, []).append(result)
+      if on_result:
+        on_result(result)
+
+  if specs_by_name:
+    pytest.main(
+      [
+        str(action_folder),
+        "-k",
+        " or ".join(specs_by_name),
+        # Test modules are named from here, so each action's are distinct in `sys.modules`
+        "--rootdir",
+        str(root),
+      ]
+      + _PYTEST_RUN_OPTS,
+      plugins=[
+        _Runner(set(specs_by_name), finished),
+        FixtureSelection(fixture_filename, no_xfail=True),
+      ],
+    )
+    for name in specs_by_name.keys() - results_by_name.keys():
+      finished(name, "fail")  # Not collected, or the session ended before it ran
+
+  pending = {name: iter(results) for name, results in results_by_name.items()}
+  return [next(pending[name.split("::")[-1]]) for name in (t.get("name", "") for t in tests)]
+
+
+def _deck_module_files(root: str) -> dict[str, str]:
+  """The file of each imported module that lives under the deck, by module name."""
+  prefix = root.rstrip(os.sep) + os.sep
+  files = {}
+  for name, module in list(sys.modules.items()):
+    module_file = getattr(module, "__file__", None)
+    if module_file and module_file.startswith(prefix):
+      files[name] = module_file
+  return files
+
+
+def _stat_file(path: str) -> tuple[int, int] | None:
+  try:
+    stat = os.stat(path)
+  except OSError:
+    return None
+  return stat.st_mtime_ns, stat.st_size  # An edit may land within the same mtime tick
+
+
+def forget_changed_modules(root: str, signatures: dict[str, tuple[int, int] | None]) -> bool:
+  """Drop every module imported from the deck if any of their files changed since `signatures`
+  were recorded, so the next session imports (and collects) them afresh. Returns True if it did.
+
+  Modules hold on to each other's objects, so they're dropped together rather than one by one.
+  """
+  if all(_stat_file(path) == signature for path, signature in signatures.items()):
+    return False
+  logger.debug("Deck files changed; forgetting imported deck modules")
+  for name in _deck_module_files(root):
+    del sys.modules[name]
+  signatures.clear()
+  return True
+
+
+def record_module_signatures(root: str, signatures: dict[str, tuple[int, int] | None]) -> None:
+  for path in _deck_module_files(root).values():
+    if path not in signatures:
+      signatures[path] = _stat_file(path)
+
+
+def _serve_test_runs(
+  conn: Connection, root: str, path: list[str], preload_depth: int, log_level: int
+) -> None:
+  """A worker's loop: run each request that comes down the pipe, sending its results back."""
+  from scaf.deck.entity import Deck
+  from scaf.user.daemon.handler import preload_actions
+
+  signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is for the server, which stops workers
+  logging.basicConfig(level=log_level, format="%(levelname)s %(message)s", stream=sys.stderr)
+  sys.path[:] = path  # Spawned, so the deck needs to be put on the import path again
+  import pytest  # noqa: F401
+
+  preload_actions(Deck(root=Path(root)), preload_depth)
+  signatures: dict[str, tuple[int, int] | None] = {}
+  record_module_signatures(root, signatures)
+  try:
+    conn.send(("ready", os.getpid()))
+    while True:
+      _serve_test_run(conn, root, signatures)
+  except (EOFError, OSError) as e:
+    logger.debug("Test worker stopping: %s", e)  # The server closed its end
+
+
+def _serve_test_run(
+  conn: Connection, root: str, signatures: dict[str, tuple[int, int] | None]
+) -> None:
+  action_folder, fixture_filename, tests = conn.recv()
+  forget_changed_modules(root, signatures)
+  os.environ[FIXTURE_ENV_VAR] = fixture_filename
+  os.environ[NO_XFAIL_ENV_VAR] = "1"
+  try:
+    results = run_tests(
+      Path(root),
+      Path(action_folder),
+      fixture_filename,
+      tests,
+      on_result=lambda result: conn.send(("result", result)),
+    )
+    reply = ("done", results)
+  except Exception as e:
+    logger.exception("Failed to run tests in %s", action_folder)
+    reply = ("error", f"{type(e).__name__}: {e}")
+  # Before replying, so an edit made as soon as the server has the results isn't missed
+  record_module_signatures(root, signatures)
+  conn.send(reply)
+
+
+class _Worker:
+  """A warm process for running tests in, and the server's end of the pipe to it."""
+
+  def __init__(self, root: Path, preload_depth: int):
+    context = multiprocessing.get_context("spawn")  # Forking a threaded server isn't safe
+    self.conn, child_conn = context.Pipe()
+    self.process = context.Process(
+      target=_serve_test_runs,
+      args=(child_conn, os.fspath(root), list(sys.path), preload_depth, logging.root.level),
+      name="scaf-test-worker",
+      daemon=True,
+    )
+    self.process.start()
+    child_conn.close()
+    self.ready = False
+
+  def _wait_for_ready(self) -> None:
+    if not self.conn.poll(WORKER_START_TIMEOUT):
+      raise TimeoutError(f"Test worker didn't start within {WORKER_START_TIMEOUT}s")
+    self.conn.recv()
+    self.ready = True
+
+  def run(
+    self,
+    action_folder: Path,
+    fixture_filename: str,
+    tests: list[dict],
+    on_result: Callable[[dict], None] | None,
+    timeout: float,
+  ) -> list[dict]:
+    """Have the worker run the tests, passing on each result as it arrives.
+
+    Raises TimeoutError if they take longer than `timeout`, and EOFError or OSError if the worker
+    dies. Either way, the worker shouldn't be used again.
+    """
+    if not self.ready:
+      self._wait_for_ready()
+    self.conn.send((os.fspath(action_folder), fixture_filename, tests))
+    deadline = time.monotonic() + timeout
+    while True:
+      if not self.conn.poll(max(deadline - time.monotonic(), 0)):
+        raise TimeoutError(f"Tests took longer than {timeout}s")
+      kind, value = self.conn.recv()
+      if kind == "result":
+        if on_result:
+          on_result(value)
+      elif kind == "done":
+        return value
+      else:
+        raise RuntimeError(value)
+
+  def stop(self) -> None:
+    self.conn.close()  # A worker waiting for work exits when its end of the pipe closes
+    self.process.join(0.5)
+    if self.process.is_alive():
+      self.process.kill()
+      self.process.join()
+
+
+class TestWorkerPool:
+  """Warm processes that have already imported pytest and the deck, to run tests in.
+
+  One is started up front, and more as runs overlap, up to `size`. A run that hangs past the
+  timeout, or crashes its worker, gets the worker replaced rather than taking the server down.
+  """
+
+  __test__ = False  # Not a pytest test class, despite the name
+
+  def __init__(self, root: Path, size: int, timeout: float, preload_depth: int = 5):
+    self.root = root
+    self.size = size
+    self.timeout = timeout
+    self.preload_depth = preload_depth
+    self._idle: queue.SimpleQueue[_Worker] = queue.SimpleQueue()
+    self._workers: set[_Worker] = set()
+    self._lock = threading.Lock()
+    self._closed = False
+    with self._lock:
+      self._idle.put(self._start_worker())
+
+  def _start_worker(self) -> _Worker:
+    """Start a worker, while holding the lock."""
+    worker = _Worker(self.root, self.preload_depth)
+    self._workers.add(worker)
+    return worker
+
+  def _checkout(self) -> _Worker:
+    with self._lock:
+      try:
+        return self._idle.get_nowait()
+      except queue.Empty:
+        if len(self._workers) < self.size:
+          return self._start_worker()
+    return self._idle.get()
+
+  def _replace(self, worker: _Worker) -> _Worker | None:
+    """Stop a worker, starting another in its place unless the pool has been closed."""
+    worker.stop()
+    with self._lock:
+      self._workers.discard(worker)
+      if self._closed:
+        return None
+      logger.info("Replacing test worker %s", worker.process.pid)
+      return self._start_worker()
+
+  def _check_in(self, worker: _Worker | None) -> None:
+    """Make a worker available to the next run, unless it or the pool has been stopped."""
+    if worker is not None and not worker.process.is_alive():
+      worker = self._replace(worker)  # e.g. it exited just after sending its results
+    with self._lock:
+      if worker is not None and not self._closed:
+        self._idle.put(worker)
+
+  def run(
+    self,
+    action_folder: Path,
+    fixture_filename: str,
+    tests: list[dict],
+    on_result: Callable[[dict], None] | None = None,
+  ) -> list[dict]:
+    """Run the tests in an idle worker, waiting for one if they're all busy."""
+    if self._closed:
+      raise RuntimeError("The test worker pool is closed")
+    worker: _Worker | None = self._checkout()
+    try:
+      return worker.run(action_folder, fixture_filename, tests, on_result, self.timeout)
+    except TimeoutError as e:
+      worker = self._replace(worker)
+      raise TimeoutError(f"{e}; stopped them and replaced their worker") from None
+    except (EOFError, OSError) as e:
+      if self._closed:
+        raise RuntimeError("The test worker pool was closed mid-run") from e
+      dead, worker = worker, self._replace(worker)
+      raise RuntimeError(f"Test worker exited with code {dead.process.exitcode} mid-run") from e
+    finally:
+      self._check_in(worker)
+
+  def close(self) -> None:
+    with self._lock:
+      self._closed = True
+      workers, self._workers = self._workers, set()
+    for worker in workers:
+      worker.stop()
+
+
+class Inotify:
+  """Linux's inotify, called through libc with ctypes, watching every folder under a root.
+
+  Raises OSError if inotify isn't available, or there aren't enough watches for the tree.
+  """
+
+  def __init__(self, root: Path):
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+      raise OSError(errno.ENOSYS, "inotify isn't available on this platform")
+    self._add_watch = libc.inotify_add_watch
+    self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    if self.fd < 0:
+      raise OSError(ctypes.get_errno(), f"inotify_init1: {os.strerror(ctypes.get_errno())}")
+    self._folders: dict[int, str] = {}  # By watch descriptor
+    try:
+      self.watch_tree(os.fspath(root))
+    except OSError:
+      self.close()
+      raise
+
+  def watch_tree(self, path: str) -> None:
+    # Symlinked folders aren't followed, as `Path.rglob` doesn't follow them either
+    for folder, _, _ in os.walk(path):
+      wd = self._add_watch(self.fd, os.fsencode(folder), _INOTIFY_MASK)
+      if wd >= 0:
+        self._folders[wd] = folder  # A folder moved within the tree keeps its wd
+      elif (error := ctypes.get_errno()) not in (errno.ENOENT, errno.ENOTDIR):
+        raise OSError(error, f"inotify_add_watch: {os.strerror(error)}", folder)
+
+  def read_changes(self) -> tuple[set[str], bool]:
+    """Drain the pending events without blocking, watching any new folders.
+
+    Returns the paths of files that changed, and whether the kernel dropped events because too
+    many had queued up.
+    """
+    changed: set[str] = set()
+    overflowed = False
+    while True:
+      try:
+        data = os.read(self.fd, 64 * 1024)
+      except BlockingIOError:
+        return changed, overflowed
+      offset = 0
+      while offset < len(data):
+        wd, mask, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+        offset += _INOTIFY_EVENT.size
+        name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+        offset += length
+        if mask & _IN_Q_OVERFLOW:
+          overflowed = True
+        elif mask & _IN_IGNORED:
+          self._folders.pop(wd, None)  # The folder was deleted
+        elif (folder := self._folders.get(wd)) is None:
+          continue
+        elif mask & _IN_ISDIR:
+          if mask & (_IN_CREATE | _IN_MOVED_TO):
+            self.watch_tree(os.path.join(folder, name))
+        elif not mask & _IN_CREATE:  # A created file is reported again once it's written
+          changed.add(os.path.join(folder, name))
+
+  def close(self) -> None:
+    os.close(self.fd)
@@ -2,32 +2,36 @@ import logging
 import sys
 from pathlib import Path
 
-from scaf.action_package.load.command import LoadActionPackage
+from scaf.action_package.tools import find_shape_file, read_shape_metadata
 from scaf.alias.entity import Alias
 from scaf.alias.tools import parse_all_aliases
 from scaf.config import SCAF_FOLDER_NAME
 from scaf.deck.locate.command import LocateDeck
+from scaf.manifest.entity import Manifest
+from scaf.manifest.load.query import LoadManifest
 from scaf.output import NC, RED
-from scaf.user.call.handler import ensure_import_path
 from scaf.user.show.query import Show
 
 logger = logging.getLogger(__name__)
 
 
-def _get_docstring(alias: Alias, root: Path) -> str:
-  """Load the action package for an alias and return the shape docstring."""
-  try:
-    ap = LoadActionPackage(root=root, action=alias.action).execute()
-    doc = (ap.shape_class.__doc__ or ap.shape_module.__doc__ or "").strip().splitlines()[0]
-    return doc
-  except Exception:
-    return ""
+def _get_docstring(alias: Alias, root: Path, manifest: Manifest | None = None) -> str:
+  """Return the first line of the shape docstring, preferring the deck's manifest.
+
+  Aliases the manifest doesn't know about (e.g. deeper than it searched) are parsed instead.
+  """
+  if manifest and (entry := manifest.find(alias.action)):
+    return next(iter(entry.doc.splitlines()), "")
+  shape_file = find_shape_file(root / alias.action)
+  metadata = read_shape_metadata(shape_file) if shape_file else None
+  return metadata.summary if metadata else ""
 
 
 def _print_alias_listing(aliases: list[Alias], root: Path) -> None:
   """Print each alias name in red followed by its docstring to stderr."""
+  manifest = LoadManifest(root=root).execute() if aliases else None
   for alias in aliases:
-    doc = _get_docstring(alias, root)
+    doc = _get_docstring(alias, root, manifest)
     raw_cmd = alias.to_bash()
     logger.info("  %s", raw_cmd)
     print(f"{RED}{alias.name}{NC}  {doc}", file=sys.stderr)
@@ -36,7 +40,6 @@ def _print_alias_listing(aliases: list[Alias], root: Path) -> None:
 def handle(query: Show):
   # LocateDeck searches the start path's parents, so point it at cwd/.scaf to include cwd itself.
   deck = LocateDeck(path=Path.cwd().resolve() / SCAF_FOLDER_NAME).execute()
-  ensure_import_path(deck)
 
   # Read-only: parse and list the existing aliases without writing back (unlike discover).
   aliases = parse_all_aliases(deck.aliases_file, deck.root)
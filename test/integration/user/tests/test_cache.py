@@ -0,0 +1,95 @@
+import json
+import sys
+
+import pytest
+
+from scaf.config import CACHE_FOLDER_NAME, SCAF_FOLDER_NAME
+from test.integration.conftest import Sandbox
+
+ACTION = "example/pass_dynamic_args"
+
+
+@pytest.fixture(autouse=True)
+def write_bytecode(monkeypatch):
+  monkeypatch.setattr(sys, "dont_write_bytecode", False)
+
+
+def _cache_report(sandbox: Sandbox, *flags) -> dict:
+  success, stdout, _ = sandbox.scaf("cache", ".", *flags)
+  assert success
+  return json.loads(stdout)
+
+
+def test_called_action_is_compiled_into_deck_cache(sandbox: Sandbox):
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+
+  success, _ = sandbox.scaf_call(ACTION, "x")
+  assert success
+
+  bytecode_folder = sandbox.root / SCAF_FOLDER_NAME / CACHE_FOLDER_NAME / "bytecode"
+  assert len(list(bytecode_folder.glob("*.pyc"))) == 3, "Expected init, shape and handler"
+  report = _cache_report(sandbox)
+  assert report["entries"] == 3
+  assert report["stale"] == 0
+
+
+def test_prune_removes_entries_for_changed_sources(sandbox: Sandbox):
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+  sandbox.scaf_call(ACTION, "x")
+
+  handler_file = sandbox.root / ACTION / "handler.py"
+  handler_file.write_text(handler_file.read_text() + "\n# changed\n")
+
+  assert _cache_report(sandbox)["stale"] == 1
+  report = _cache_report(sandbox, "--prune")
+  assert (report["entries"], report["stale"], report["removed"]) == (2, 0, 1)
+  report = _cache_report(sandbox, "--clear")
+  assert (report["entries"], report["removed"]) == (0, 2)
+
+
+def _add_counting_query(sandbox: Sandbox) -> None:
+  sandbox.write("example/tally/__init__.py", "")
+  sandbox.write(
+    "example/tally/query.py",
+    "from dataclasses import dataclass\n\nfrom scaf.core import Shape\n\n\n"
+    "@dataclass\nclass Tally(Shape, cache_ttl=60):\n  label: str = 'a'\n",
+  )
+  sandbox.write(
+    "example/tally/handler.py",
+    "from pathlib import Path\n\n\n"
+    "def handle(query):\n"
+    "  calls = Path('calls.txt')\n"
+    "  count = int(calls.read_text()) + 1 if calls.exists() else 1\n"
+    "  calls.write_text(str(count))\n"
+    "  return {'label': query.label, 'calls': count}\n",
+  )
+
+
+def _tally(sandbox: Sandbox, *args, call_options=()) -> int:
+  success, stdout, _ = sandbox.scaf("call", *call_options, "example/tally", *args)
+  assert success
+  return json.loads(stdout)["calls"]
+
+
+def test_query_results_are_cached_until_inputs_or_sources_change(sandbox: Sandbox):
+  sandbox.scaf_init()
+  _add_counting_query(sandbox)
+
+  assert _tally(sandbox) == 1
+  assert _tally(sandbox) == 1, "Expected the cached result"
+  assert _tally(sandbox, "--label", "b") == 2, "Different inputs shouldn't share a result"
+  assert _tally(sandbox, call_options=["--no-cache"]) == 3
+  assert _tally(sandbox, call_options=["--refresh"]) == 4
+  assert _tally(sandbox) == 4, "Expected the refreshed result"
+
+  handler_file = sandbox.root / "example/tally/handler.py"
+  handler_file.write_text(handler_file.read_text() + "\n# changed\n")
+  assert _tally(sandbox) == 5, "Editing the handler should bust its results"
+
+  report = _cache_report(sandbox)
+  assert (report["results"], report["hits"], report["misses"]) == (3, 2, 3)
+  assert report["hit_rate"] == pytest.approx(0.4)
+  report = _cache_report(sandbox, "--clear")
+  assert (report["results"], report["hits"], report["misses"]) == (0, 0, 0)
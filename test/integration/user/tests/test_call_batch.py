@@ -0,0 +1,184 @@
+import io
+import json
+import subprocess
+import sys
+
+from test.integration.conftest import Sandbox
+
+ACTION = "example/myriad/get"
+
+
+def _lines(stdout: str) -> list[dict]:
+  return [json.loads(line) for line in stdout.splitlines()]
+
+
+def test_batch_calls_action_once_per_record(sandbox: Sandbox):
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+  sandbox.write(
+    "records.jsonl",
+    '{"inferred_optional": 1}\n\n{"explicit_union": "forty-two"}\n{}\n',
+  )
+
+  success, stdout, _ = sandbox.scaf("call", "--batch", "records.jsonl", ACTION)
+
+  assert success
+  outcomes = _lines(stdout)
+  assert [o["line"] for o in outcomes] == [1, 3, 4], "Blank lines should be skipped"
+  assert all(o["result"]["text"] == "hello" for o in outcomes)
+
+
+def test_batch_reports_bad_records_and_carries_on(sandbox: Sandbox, monkeypatch, caplog):
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+  monkeypatch.setattr(sys, "stdin", io.StringIO('{"nope": 1}\nnot json\n[]\n{}\n'))
+
+  success, stdout, _ = sandbox.scaf("call", "--batch=-", ACTION)
+
+  assert not success, "Expected a non-zero exit code when any record fails"
+  outcomes = _lines(stdout)
+  assert [o["line"] for o in outcomes] == [1, 2, 3, 4]
+  assert ["error" in o for o in outcomes] == [True, True, True, False]
+  assert "3 of 4 record(s) failed" in caplog.text
+
+
+def test_batch_cannot_be_combined_with_action_args(sandbox: Sandbox):
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+
+  success, stdout, _ = sandbox.scaf("call", "--batch", "-", ACTION, "--inferred-optional", "1")
+
+  assert not success
+  assert not stdout
+
+
+def test_options_after_the_action_are_passed_to_it(sandbox: Sandbox):
+  sandbox.scaf_init()
+  sandbox.write("example/export/__init__.py", "")
+  sandbox.write(
+    "example/export/query.py",
+    "from dataclasses import dataclass\n\n\n"
+    "@dataclass\nclass Export:\n  format: str = 'csv'\n  batch: str = ''\n",
+  )
+  sandbox.write(
+    "example/export/handler.py",
+    "def handle(query):\n  return {'format': query.format, 'batch': query.batch}\n",
+  )
+
+  success, stdout, _ = sandbox.scaf("call", "example/export", "--format", "tsv", "--batch", "b")
+  assert success
+  assert json.loads(stdout) == {"format": "tsv", "batch": "b"}
+
+  success, stdout, _ = sandbox.scaf("call", "--format", "json", "example/export", "--format=xml")
+  assert success
+  assert json.loads(stdout) == {"format": "xml", "batch": ""}
+
+
+def test_parallel_batch_keeps_input_order(sandbox: Sandbox):
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+  sandbox.write("records.jsonl", "".join(f'{{"inferred_optional": {i}}}\n' for i in range(50)))
+  sandbox.write("bad.jsonl", '{"inferred_optional": 1}\n{"nope": 1}\n')
+
+  success, stdout, stderr = sandbox.scaf(
+    "call", "--batch", "records.jsonl", "--jobs", "2", "--unordered", ACTION
+  )
+  assert success
+  assert sorted(o["line"] for o in _lines(stdout)) == list(range(1, 51))
+  assert "across" in stderr, "Expected a throughput report"
+
+  success, stdout, _ = sandbox.scaf("call", "--batch", "bad.jsonl", "--jobs", "2", ACTION)
+  assert not success
+  assert ["error" in o for o in _lines(stdout)] == [False, True]
+
+  success, stdout, _ = sandbox.scaf("call", "--batch", "records.jsonl", "--jobs=3", ACTION)
+  assert success
+  assert [o["line"] for o in _lines(stdout)] == list(range(1, 51))
+
+
+def test_batch_overlaps_records_for_async_handlers(sandbox: Sandbox):
+  sandbox.add_example_domain()
+  sandbox.write("example/nap/__init__.py", "")
+  sandbox.write(
+    "example/nap/command.py",
+    "from dataclasses import dataclass\n\n\n@dataclass\nclass Nap:\n  seconds: float = 0.05\n",
+  )
+  sandbox.write(
+    "example/nap/handler.py",
+    "import asyncio\n\n_running = 0\n\n\n"
+    "async def handle(command):\n"
+    "  global _running\n"
+    "  _running += 1\n"
+    "  await asyncio.sleep(command.seconds)\n"
+    "  peak = _running\n"
+    "  _running -= 1\n"
+    "  return peak\n",
+  )
+  sandbox.scaf_init()
+  sandbox.write("records.jsonl", "{}\n" * 12)
+
+  success, stdout, _ = sandbox.scaf("call", "--batch", "records.jsonl", "example/nap")
+  assert success
+  assert [o["result"] for o in _lines(stdout)] == [1] * 12, "Expected one record at a time"
+
+  success, stdout, _ = sandbox.scaf(
+    "call", "--batch", "records.jsonl", "--concurrency", "4", "example/nap"
+  )
+  assert success
+  outcomes = _lines(stdout)
+  assert [o["line"] for o in outcomes] == list(range(1, 13))
+  assert 1 < max(o["result"] for o in outcomes) <= 4
+
+
+def test_batch_reports_records_that_exit_and_carries_on(sandbox: Sandbox):
+  sandbox.scaf_init()
+  sandbox.write("example/quit/__init__.py", "")
+  sandbox.write(
+    "example/quit/command.py",
+    "from dataclasses import dataclass\n\n\n@dataclass\nclass Quit:\n  code: int = 0\n",
+  )
+  sandbox.write(
+    "example/quit/handler.py",
+    "import sys\n\n\n"
+    "async def handle(command):\n"
+    "  if command.code:\n"
+    "    sys.exit(command.code)\n"
+    "  return 'stayed'\n",
+  )
+  sandbox.write("records.jsonl", '{"code": 3}\n{}\n{"code": 4}\n{}\n')
+
+  for options in [(), ("--jobs", "2"), ("--concurrency", "2")]:
+    success, stdout, _ = sandbox.scaf("call", "--batch", "records.jsonl", *options, "example/quit")
+
+    assert not success, f"Expected a non-zero exit code with {options}"
+    outcomes = _lines(stdout)
+    assert [o["line"] for o in outcomes] == [1, 2, 3, 4], options
+    assert [o.get("error") or o["result"] for o in outcomes] == [
+      "SystemExit: 3",
+      "stayed",
+      "SystemExit: 4",
+      "stayed",
+    ], options
+
+
+def test_binary_batch_reads_and_writes_frames(sandbox: Sandbox):
+  from example.myriad.entity import Myriad
+  from example.myriad.get.command import GetMyriad
+  from scaf.codec.binary import decode, encode, frame, read_frames
+
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+  records = frame(encode(GetMyriad(inferred_optional=1))) + frame(encode(GetMyriad()))
+
+  result = subprocess.run(
+    [sys.executable, "-m", "scaf", "call", "--batch", "-", "--format", "binary", ACTION],
+    cwd=sandbox.root,
+    input=records,
+    capture_output=True,
+    check=False,
+  )
+
+  assert result.returncode == 0, result.stderr
+  outcomes = [decode(f) for f in read_frames(io.BytesIO(result.stdout))]
+  assert [o["line"] for o in outcomes] == [1, 2]
+  assert all(decode(o["result"], Myriad).text == "hello" for o in outcomes)
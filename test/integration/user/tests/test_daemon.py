@@ -0,0 +1,161 @@
+import json
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from scaf.action_package.invoke.handler import get_parser
+from scaf.config import DAEMON_SOCKET_FILENAME, SCAF_FOLDER_NAME
+from scaf.user.call.command import Call
+from scaf.user.daemon.tools import _find_call_target, get_call_options
+from scaf.user.serve.tools import Inotify
+from test.integration.conftest import Sandbox
+
+
+def _wait_for(predicate, timeout: float = 10.0) -> bool:
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    if predicate():
+      return True
+    time.sleep(0.05)
+  return False
+
+
+def test_call_target_is_found_after_call_options():
+  assert _find_call_target(["-v", "call", "a/b", "--jobs", "2"]) == "a/b"
+  assert _find_call_target(["call", "--jobs", "2", "--refresh", "a/b"]) == "a/b"
+  assert _find_call_target(["call", "--batch=-", "--format", "binary", "a/b"]) == "a/b"
+  assert _find_call_target(["call", "--unord", "--job", "2", "a/b"]) == "a/b"
+  assert _find_call_target(["show", "a/b"]) is None
+
+
+def test_call_target_is_left_alone_for_unknown_options():
+  assert _find_call_target(["call", "-j4", "a/b"]) is None
+  assert _find_call_target(["call", "--", "a/b"]) is None
+  assert _find_call_target(["call", "--no-such-option", "a/b"]) is None
+
+
+def test_call_options_match_the_call_parser():
+  parser = get_parser(Call, Call.__doc__)
+  options = {
+    option: action.nargs != 0
+    for action in parser._actions
+    for option in action.option_strings
+    if option.startswith("--") and option != "--help"
+  }
+
+  assert get_call_options() == options
+
+
+def test_daemon_serves_forwarded_calls(sandbox: Sandbox):
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+  socket_path = sandbox.root / SCAF_FOLDER_NAME / DAEMON_SOCKET_FILENAME
+
+  daemon = subprocess.Popen(
+    [sys.executable, "-m", "scaf", "-vv", "daemon", "."],
+    cwd=sandbox.root,
+    stderr=subprocess.PIPE,
+    text=True,
+  )
+  try:
+    assert _wait_for(socket_path.is_socket), "Daemon did not start listening"
+
+    result = sandbox.run(
+      sys.executable, "-m", "scaf", "call", "example/pass_dynamic_args", "x", "y"
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout) == {"extra_args": ["y"]}
+
+    result = sandbox.run(sys.executable, "-m", "scaf", "call", "example/myriad/get", "unexpected")
+    assert result.returncode == 1, "Expected the daemon to pass back the call's exit code"
+  finally:
+    daemon.terminate()
+    _, stderr = daemon.communicate(timeout=10)
+
+  assert stderr.count("Forking for forwarded call") == 2, stderr
+  assert not socket_path.exists(), "Expected the daemon to remove its socket on exit"
+
+
+def test_call_runs_in_process_when_socket_is_stale(sandbox: Sandbox):
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+    sock.bind(str(sandbox.root / SCAF_FOLDER_NAME / DAEMON_SOCKET_FILENAME))  # Never listens
+
+  result = sandbox.run(sys.executable, "-m", "scaf", "call", "example/pass_dynamic_args", "x")
+
+  assert result.returncode == 0, result.stderr
+  assert json.loads(result.stdout) == {"extra_args": []}
+
+
+def test_daemon_reloads_an_edit_before_the_next_call(sandbox: Sandbox):
+  """With inotify, an edited module that an action imports is reloaded before the next call,
+  without waiting for a poll."""
+  try:
+    Inotify(sandbox.root).close()
+  except OSError:
+    pytest.skip("inotify is not available here")
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+  socket_path = sandbox.root / SCAF_FOLDER_NAME / DAEMON_SOCKET_FILENAME
+  helper_file = sandbox.root / "example" / "greeting.py"
+  helper_file.write_text("GREETING = 'hello'\n", encoding="utf-8")
+  handler_file = sandbox.root / "example" / "pass_dynamic_args" / "handler.py"
+  source = handler_file.read_text(encoding="utf-8")
+  handler_file.write_text(
+    "from example import greeting\n" + source.replace("list(args)", "[*args, greeting.GREETING]"),
+    encoding="utf-8",
+  )
+
+  daemon = subprocess.Popen(
+    [sys.executable, "-m", "scaf", "daemon", ".", "--poll-interval", "60"],
+    cwd=sandbox.root,
+    stderr=subprocess.PIPE,
+    text=True,
+  )
+  try:
+    assert _wait_for(socket_path.is_socket), "Daemon did not start listening"
+    result = sandbox.run(sys.executable, "-m", "scaf", "call", "example/pass_dynamic_args", "x")
+    assert json.loads(result.stdout) == {"extra_args": ["hello"]}, result.stderr
+
+    helper_file.write_text("GREETING = 'goodbye'\n", encoding="utf-8")
+    result = sandbox.run(sys.executable, "-m", "scaf", "call", "example/pass_dynamic_args", "x")
+    assert json.loads(result.stdout) == {"extra_args": ["goodbye"]}, result.stderr
+  finally:
+    daemon.terminate()
+    daemon.communicate(timeout=10)
+
+
+def test_calls_after_an_edit_reuse_the_daemon_reload(sandbox: Sandbox):
+  """The daemon reloads an edited action once, rather than each forked call loading it again."""
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+  socket_path = sandbox.root / SCAF_FOLDER_NAME / DAEMON_SOCKET_FILENAME
+  handler_file = sandbox.root / "example" / "pass_dynamic_args" / "handler.py"
+  call = (sys.executable, "-m", "scaf", "-vv", "call", "example/pass_dynamic_args", "x")
+
+  daemon = subprocess.Popen(
+    [sys.executable, "-m", "scaf", "daemon", ".", "--poll-interval", "0.05"],
+    cwd=sandbox.root,
+    stderr=subprocess.PIPE,
+    text=True,
+  )
+  try:
+    assert _wait_for(socket_path.is_socket), "Daemon did not start listening"
+    result = sandbox.run(*call)
+    assert json.loads(result.stdout) == {"extra_args": []}, result.stderr
+    assert "Action package loaded" not in result.stderr, "Expected the preloaded package"
+
+    source = handler_file.read_text(encoding="utf-8")
+    handler_file.write_text(source.replace("list(args)", "[*args, 'edited']"), encoding="utf-8")
+    time.sleep(0.5)  # Let the daemon poll for the edit
+    for _ in range(2):
+      result = sandbox.run(*call)
+      assert json.loads(result.stdout) == {"extra_args": ["edited"]}, result.stderr
+      assert "Action package loaded" not in result.stderr, "Expected the daemon's reload"
+  finally:
+    daemon.terminate()
+    daemon.communicate(timeout=10)
@@ -1,5 +1,11 @@
+import json
+import shutil
 import sys
+import time
 import uuid
+from pathlib import Path
+
+import pytest
 
 from test.integration.conftest import Sandbox
 
@@ -120,3 +126,139 @@ def test_discover_info_logs_raw_command_for_each_alias(sandbox: Sandbox):
   assert "scaf call $DECK/" in result.stderr, (
     f"Expected info log with raw scaf call command\nstderr={result.stderr}"
   )
+
+
+def test_discover_records_actions_in_manifest(sandbox: Sandbox):
+  sandbox.add_example_domain()
+  sandbox.scaf_init(0)
+
+  success, _, _ = sandbox.scaf("discover", ".")
+  assert success
+
+  manifest = json.loads(sandbox.read(".scaf/manifest.json"))
+  entry = manifest["entries"]["example/myriad/get"]
+  assert entry["kind"] == "command"
+  assert entry["doc"] == "Demonstrate simple json serialization of action responses."
+  assert "handler.py" in entry["mtimes"]
+  assert "example/not_an_action" not in manifest["entries"]
+
+
+def test_manifest_picks_up_new_action(sandbox: Sandbox):
+  from scaf.user.discover.handler import find_available_actions
+
+  sandbox.add_example_domain()
+  sandbox.scaf_init(0)
+  assert Path("example/fresh/act") not in find_available_actions(sandbox.root, 5)
+
+  sandbox.write("example/fresh/__init__.py", "")
+  sandbox.write("example/fresh/act/__init__.py", "")
+  sandbox.write("example/fresh/act/handler.py", "")
+  sandbox.write("example/fresh/act/query.py", '"""Act fresh."""\n')
+
+  assert Path("example/fresh/act") in find_available_actions(sandbox.root, 5)
+
+
+def test_manifest_is_reused_when_folders_are_unchanged(sandbox: Sandbox):
+  from scaf.user.discover.handler import find_available_actions
+
+  sandbox.add_example_domain()
+  sandbox.scaf_init(0)
+  find_available_actions(sandbox.root, 5)
+
+  # Pretend the last scan happened long after every mtime, so nothing looks racy
+  manifest = json.loads(sandbox.read(".scaf/manifest.json"))
+  manifest["scanned_at"] = time.time_ns() + 60_000_000_000
+  del manifest["entries"]["example/myriad/get"]
+  sandbox.write(".scaf/manifest.json", json.dumps(manifest))
+
+  assert Path("example/myriad/get") not in find_available_actions(sandbox.root, 5)
+
+  assert Path("example/myriad/get") in find_available_actions(sandbox.root, 5, full=True)
+
+
+def test_manifest_rescan_of_changed_folders_matches_full_scan(sandbox: Sandbox):
+  from scaf.user.discover.handler import find_available_actions
+
+  sandbox.add_example_domain()
+  sandbox.scaf_init(0)
+  find_available_actions(sandbox.root, 5)
+  manifest = json.loads(sandbox.read(".scaf/manifest.json"))
+  manifest["scanned_at"] = time.time_ns() + 60_000_000_000
+  sandbox.write(".scaf/manifest.json", json.dumps(manifest))
+
+  shutil.rmtree(sandbox.root / "example/myriad")
+  (sandbox.root / "example/hole").rename(sandbox.root / "example/peg_hole")
+  sandbox.write("example/not_an_action/handler.py", "")
+  sandbox.write("example/not_an_action/query.py", '"""Now it is."""\n')
+  for filename in ("__init__.py", "handler.py", "command.py"):
+    sandbox.write(f"example/new/deeply/nested/act/{filename}", "")
+
+  actions = find_available_actions(sandbox.root, 5)
+  dirs = json.loads(sandbox.read(".scaf/manifest.json"))["dirs"]
+  assert Path("example/myriad/get") not in actions
+  assert Path("example/not_an_action") in actions
+  assert Path("example/new/deeply/nested/act") in actions
+  assert actions == find_available_actions(sandbox.root, 5, full=True)
+  assert dirs == json.loads(sandbox.read(".scaf/manifest.json"))["dirs"]
+
+
+def test_parallel_walk_matches_serial_walk(sandbox: Sandbox):
+  from scaf.manifest.tools import scan_action_folders
+
+  sandbox.add_example_domain()
+  sandbox.write("example/.hidden/act/__init__.py", "")
+
+  serial = scan_action_folders(sandbox.root, 5, [], workers=1)
+  assert Path("example/myriad/get") in serial[0]
+  assert scan_action_folders(sandbox.root, 5, [], workers=4) == serial
+  assert list(serial[1]) == sorted(serial[1])
+
+
+def test_scafignore_prunes_ignored_folders(sandbox: Sandbox):
+  from scaf.user.discover.handler import find_available_actions
+
+  sandbox.add_example_domain()
+  sandbox.scaf_init(0)
+  sandbox.write(".scafignore", "# Not this\nexample/myriad\nhole\n!example/hole\n")
+
+  actions = find_available_actions(sandbox.root, 5)
+  dirs = json.loads(sandbox.read(".scaf/manifest.json"))["dirs"]
+  assert Path("example/myriad/get") not in actions
+  assert "example/myriad/get" not in dirs, "Expected the ignored subtree not to be walked"
+  assert Path("example/hole/insert_peg") in actions, "Expected the negation to re-include it"
+
+
+def test_discover_filter_is_anchored_to_the_deck(sandbox: Sandbox):
+  from scaf.user.discover.handler import generate_action_aliases
+
+  sandbox.add_example_domain()
+  actions = [Path("example/hole/insert_peg"), Path("example/myriad/get")]
+
+  aliases = generate_action_aliases(sandbox.root, actions, filter="example/h*")
+  assert [a.action for a in aliases] == [Path("example/hole/insert_peg")]
+  assert not generate_action_aliases(sandbox.root, actions, filter="hole")
+
+
+@pytest.mark.skipif(not shutil.which("git"), reason="git is not installed")
+def test_git_backend_skips_gitignored_trees(sandbox: Sandbox):
+  from scaf.user.discover.handler import find_available_actions
+
+  sandbox.add_example_domain()
+  sandbox.scaf_init(0)
+  for filename in ("__init__.py", "handler.py", "command.py"):
+    sandbox.write(f"build/copy/act/{filename}", "")
+  sandbox.write(".gitignore", "build/\n")
+
+  assert find_available_actions(sandbox.root, 5, backend="git") == find_available_actions(
+    sandbox.root, 5, backend="walk"
+  ), "Outside a git work tree, it should fall back to walking"
+  assert json.loads(sandbox.read(".scaf/manifest.json"))["backend"] == "walk"
+
+  sandbox.run("git", "init", "-q", check=True)
+  actions = find_available_actions(sandbox.root, 5, backend="git")
+  assert Path("build/copy/act") not in actions
+  assert Path("example/myriad/get") in actions, "Untracked files should count too"
+  assert json.loads(sandbox.read(".scaf/manifest.json"))["backend"] == "git"
+
+  shutil.rmtree(sandbox.root / "example/myriad/get")
+  assert Path("example/myriad/get") not in find_available_actions(sandbox.root, 5)
@@ -1,12 +1,18 @@
+import http.client
 import importlib.util
 import json
+import os
 import sys
 import threading
 import time
+import urllib.error
 import urllib.request
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import pytest
+
 from test.integration.conftest import Sandbox
 
 
@@ -22,13 +28,13 @@ def test_serve_help_exits_0_and_mentions_port(sandbox: Sandbox):
 # ---------------------------------------------------------------------------
 
 
-def _start_test_server(deck_root: Path, port: int = 0):
+def _start_test_server(deck_root: Path, port: int = 0, **options):
   """Start server on a background thread. Returns (server, port)."""
   from scaf.deck.entity import Deck
   from scaf.user.serve.handler import make_server
 
   deck = Deck(root=deck_root)
-  server = make_server(deck, port)
+  server = make_server(deck, port, **options)
   actual_port = server.server_address[1]
   t = threading.Thread(target=server.serve_forever, daemon=True)
   t.start()
@@ -56,6 +62,7 @@ def test_get_actions_returns_json_list_of_action_paths(sandbox: Sandbox):
     data = _get_json(port, "/actions")
   finally:
     server.shutdown()
+    server.server_close()
 
   assert isinstance(data, list), f"Expected list, got {type(data)}: {data}"
   assert len(data) > 0, "Expected at least one action"
@@ -79,6 +86,7 @@ def test_get_action_tests_returns_test_node_ids(sandbox: Sandbox):
     data = _get_json(port, f"/actions/{action_rel}/tests")
   finally:
     server.shutdown()
+    server.server_close()
 
   assert isinstance(data, list), f"Expected list, got {type(data)}: {data}"
   assert len(data) >= 2, f"Expected at least 2 test node IDs, got: {data}"
@@ -100,11 +108,19 @@ from pathlib import Path
 import pytest
 
 
+def _selected_fixture(config):
+  # The fixture the scaf dev server picked for this run, else the one in SCAF_FIXTURE
+  if selection := config.pluginmanager.get_plugin("scaf_fixture_selection"):
+    return selection.fixture, selection.no_xfail
+  return os.environ.get("SCAF_FIXTURE"), bool(os.environ.get("SCAF_NO_XFAIL"))
+
+
 def pytest_generate_tests(metafunc):
   if "payload" not in metafunc.fixturenames:
     return
+  name, no_xfail = _selected_fixture(metafunc.config)
   d = Path(metafunc.definition.fspath).parent / "fixtures"
-  if name := os.environ.get("SCAF_FIXTURE"):
+  if name:
     files = [d / name] if (d / name).exists() else []
   elif d.exists():
     files = sorted(d.glob("*.json"))
@@ -119,7 +135,7 @@ def pytest_generate_tests(metafunc):
     expected = data.get("expectations", {}).get(test_name, True)
     marks = (
       [pytest.mark.xfail(strict=True, reason=f"fixture expects {test_name} to fail")]
-      if expected is False and not os.environ.get("SCAF_NO_XFAIL")
+      if expected is False and not no_xfail
       else []
     )
     params.append(pytest.param(data["payload"], marks=marks, id=Path(f).stem))
@@ -177,6 +193,7 @@ def test_post_action_run_saves_fixture_and_returns_results(sandbox: Sandbox):
     )
   finally:
     server.shutdown()
+    server.server_close()
 
   # Fixture file must exist
   fixture_path = sandbox.root / action_rel / "fixtures" / f"{fixture_id}.json"
@@ -224,6 +241,7 @@ def test_post_action_run_reports_failing_test(sandbox: Sandbox):
     )
   finally:
     server.shutdown()
+    server.server_close()
 
   results = result["results"]
   assert len(results) == 1
@@ -245,6 +263,400 @@ def test_post_action_run_reports_failing_test(sandbox: Sandbox):
   assert json.loads(fixture_path.read_text()).get("expectations") == {"test_always_fails": False}
 
 
+def test_async_run_does_not_block_other_requests(sandbox: Sandbox):
+  """With `Prefer: respond-async`, POST /run returns at once, and the run can be polled."""
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+
+  action_rel = "example/myriad/get"
+  sandbox.write(f"{action_rel}/conftest.py", _CONFTEST_CONTENT)
+  sandbox.write(
+    f"{action_rel}/test_fixtures.py",
+    "import time\n\n\ndef test_slow(payload):\n  time.sleep(1)\n",
+  )
+
+  server, port = _start_test_server(sandbox.root)
+  try:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    body = json.dumps({"payload": {"value": 1}, "tests": [{"name": "test_slow"}]})
+    conn.request(
+      "POST",
+      f"/actions/{action_rel}/run",
+      body=body,
+      headers={"Content-Type": "application/json", "Prefer": "respond-async"},
+    )
+    response = conn.getresponse()
+    run = json.loads(response.read())
+    assert response.status == 202
+    assert response.getheader("Location") == f"/runs/{run['id']}"
+
+    started = time.monotonic()
+    conn.request("GET", "/actions")  # Reusing the connection, while the test is running
+    response = conn.getresponse()
+    assert response.version == 11
+    assert action_rel in json.loads(response.read())
+    assert time.monotonic() - started < 1, "GET /actions waited for the test run"
+
+    for _ in range(100):
+      run = _get_json(port, f"/runs/{run['id']}")
+      if run["status"] not in ("queued", "running"):
+        break
+      time.sleep(0.1)
+    conn.close()
+  finally:
+    server.shutdown()
+    server.server_close()
+
+  assert run["status"] == "done", run
+  assert [r["actual"] for r in run["results"]] == ["pass"]
+
+
+def test_run_streams_each_result_from_one_session(sandbox: Sandbox):
+  """With `Accept: application/x-ndjson`, results arrive as each test finishes, from a single
+  pytest session.
+  """
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+
+  action_rel = "example/myriad/get"
+  sandbox.write(f"{action_rel}/conftest.py", _CONFTEST_CONTENT)
+  sandbox.write(
+    f"{action_rel}/test_fixtures.py",
+    "import time\n\nSEEN = []\n\n\n"
+    "def test_first(payload):\n  SEEN.append(1)\n\n\n"
+    "def test_second(payload):\n  time.sleep(1)\n  assert SEEN == [1]\n\n\n"
+    "def test_second_again(payload):\n  assert False\n",
+  )
+
+  server, port = _start_test_server(sandbox.root)
+  try:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    tests = [{"name": "test_second"}, {"name": "test_first"}, {"name": "test_missing"}]
+    conn.request(
+      "POST",
+      f"/actions/{action_rel}/run",
+      body=json.dumps({"payload": {"value": 1}, "tests": tests}),
+      headers={"Content-Type": "application/json", "Accept": "application/x-ndjson"},
+    )
+    response = conn.getresponse()
+    assert response.getheader("Content-Type") == "application/x-ndjson"
+    arrivals = []
+    while line := response.readline():
+      arrivals.append((time.monotonic(), json.loads(line)))
+    conn.close()
+  finally:
+    server.shutdown()
+    server.server_close()
+
+  results = [result for _, result in arrivals]
+  assert [(r["test"], r["actual"]) for r in results] == [
+    ("test_first", "pass"),
+    ("test_second", "pass"),  # Saw what test_first did, so ran in the same session
+    ("test_missing", "fail"),
+  ]
+  assert arrivals[1][0] - arrivals[0][0] > 0.5, "test_first's result waited for test_second"
+
+
+def test_runs_of_different_actions_overlap_without_sharing_fixtures(sandbox: Sandbox):
+  """Concurrent runs each see their own fixture, rather than whichever was set last."""
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+
+  actions = {"example/myriad/get": 1, "example/pass_dynamic_args": 2}
+  for action_rel, value in actions.items():
+    sandbox.write(f"{action_rel}/conftest.py", _CONFTEST_CONTENT)
+    sandbox.write(
+      f"{action_rel}/test_fixtures.py",
+      "import time\n\n\n"
+      f"def test_value(payload):\n  time.sleep(1)\n  assert payload['value'] == {value}\n",
+    )
+
+  server, port = _start_test_server(sandbox.root)
+  try:
+    run_ids = []
+    for action_rel, value in actions.items():
+      request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/actions/{action_rel}/run",
+        data=json.dumps({"payload": {"value": value}, "tests": [{"name": "test_value"}]}).encode(),
+        headers={"Content-Type": "application/json", "Prefer": "respond-async"},
+        method="POST",
+      )
+      with urllib.request.urlopen(request, timeout=10) as response:
+        run_ids.append(json.loads(response.read())["id"])
+
+    overlapped = False
+    for _ in range(100):
+      # The first run was running before and after the second was seen running
+      runs = [_get_json(port, f"/runs/{run_id}") for run_id in [*run_ids, run_ids[0]]]
+      statuses = {run["status"] for run in runs}
+      overlapped = overlapped or statuses == {"running"}
+      runs = runs[1:]
+      if not statuses & {"queued", "running"}:
+        break
+      time.sleep(0.05)
+  finally:
+    server.shutdown()
+    server.server_close()
+
+  assert overlapped, "The runs didn't overlap"
+  for run in runs:
+    assert run["status"] == "done", run
+    assert [r["actual"] for r in run["results"]] == ["pass"], run
+  assert "SCAF_FIXTURE" not in os.environ
+
+
+def test_run_sets_fixture_env_vars_for_older_conftests(sandbox: Sandbox):
+  """A conftest that only reads SCAF_FIXTURE still gets just the fixture being run."""
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+  action_rel = "example/myriad/get"
+  env_only_conftest = _CONFTEST_CONTENT.replace(
+    '  if selection := config.pluginmanager.get_plugin("scaf_fixture_selection"):\n'
+    "    return selection.fixture, selection.no_xfail\n",
+    "",
+  )
+  sandbox.write(f"{action_rel}/conftest.py", env_only_conftest)
+  sandbox.write(f"{action_rel}/test_fixtures.py", _TEST_CONTENT)
+  sandbox.write(f"{action_rel}/fixtures/negative.json", json.dumps({"payload": {"value": -1}}))
+
+  server, port = _start_test_server(sandbox.root)
+  try:
+    status, body = _post_run(port, action_rel, ["test_payload_value_positive"])
+  finally:
+    server.shutdown()
+    server.server_close()
+
+  assert status == 200, body
+  assert [r["actual"] for r in body["results"]] == ["pass"], body
+
+
+def _post_run(port: int, action_rel: str, tests: list[str]) -> tuple[int, dict]:
+  """POST /actions/<path>/run, returning the status as well as the body, even for errors."""
+  body = {"payload": {"value": 1}, "tests": [{"name": name} for name in tests]}
+  try:
+    return 200, _post_json(port, f"/actions/{action_rel}/run", body)
+  except urllib.error.HTTPError as e:
+    return e.code, json.loads(e.read())
+
+
+def test_worker_is_replaced_after_a_run_hangs_or_crashes(sandbox: Sandbox):
+  """A hung or crashed test run is reported as an error, and later runs get a fresh worker."""
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+
+  action_rel = "example/myriad/get"
+  sandbox.write(f"{action_rel}/conftest.py", _CONFTEST_CONTENT)
+  sandbox.write(
+    f"{action_rel}/test_fixtures.py",
+    "import os\nimport time\n\n\n"
+    "def test_hangs(payload):\n  time.sleep(60)\n\n\n"
+    "def test_crashes(payload):\n  os._exit(3)\n\n\n"
+    "def test_passes(payload):\n  pass\n",
+  )
+
+  server, port = _start_test_server(sandbox.root, test_timeout=2)
+  try:
+    hung = _post_run(port, action_rel, ["test_hangs"])
+    crashed = _post_run(port, action_rel, ["test_crashes"])
+    recovered = _post_run(port, action_rel, ["test_passes"])
+  finally:
+    server.shutdown()
+    server.server_close()
+
+  assert hung[0] == 500 and "longer than 2" in hung[1]["error"], hung
+  assert crashed[0] == 500 and "exited with code 3" in crashed[1]["error"], crashed
+  assert recovered[0] == 200, recovered
+  assert [r["actual"] for r in recovered[1]["results"]] == ["pass"]
+
+
+def test_worker_pool_closed_mid_run_keeps_no_stopped_workers(sandbox: Sandbox):
+  """Closing the pool stops a busy worker, which mustn't be handed back out afterwards."""
+  from scaf.user.serve.tools import TestWorkerPool
+
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+  action_folder = sandbox.root / "example/myriad/get"
+  started = sandbox.root / "started"
+  sandbox.write(
+    "example/myriad/get/test_fixtures.py",
+    "import time\nfrom pathlib import Path\n\n\n"
+    f"def test_hangs():\n  Path({str(started)!r}).touch()\n  time.sleep(60)\n",
+  )
+
+  pool = TestWorkerPool(sandbox.root, size=1, timeout=30)
+  errors = []
+
+  def run():
+    try:
+      pool.run(action_folder, "none.json", [{"name": "test_hangs"}])
+    except RuntimeError as e:
+      errors.append(e)
+
+  thread = threading.Thread(target=run)
+  thread.start()
+  deadline = time.monotonic() + 30
+  while not started.exists() and time.monotonic() < deadline:
+    time.sleep(0.05)
+  pool.close()
+  thread.join(10)
+
+  assert errors and "closed mid-run" in str(errors[0]), errors
+  assert pool._idle.empty(), "Expected the stopped worker not to be put back as idle"
+
+
+def test_warm_worker_picks_up_edited_tests(sandbox: Sandbox):
+  """Test modules are kept between runs, but not once their files change."""
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+
+  action_rel = "example/myriad/get"
+  sandbox.write(f"{action_rel}/conftest.py", _CONFTEST_CONTENT)
+  sandbox.write(f"{action_rel}/test_fixtures.py", "def test_value(payload):\n  pass\n")
+
+  server, port = _start_test_server(sandbox.root)
+  try:
+    before = _post_run(port, action_rel, ["test_value"])
+    sandbox.write(f"{action_rel}/test_fixtures.py", "def test_value(payload):\n  assert False\n")
+    after = _post_run(port, action_rel, ["test_value"])
+  finally:
+    server.shutdown()
+    server.server_close()
+
+  assert [r["actual"] for r in before[1]["results"]] == ["pass"]
+  assert [r["actual"] for r in after[1]["results"]] == ["fail"]
+
+
+def test_post_action_call_returns_result(sandbox: Sandbox):
+  """POST /actions/<path>/call runs the handler on the payload and returns its result."""
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+
+  server, port = _start_test_server(sandbox.root)
+  try:
+    result = _post_json(port, "/actions/example/myriad/get/call", {})
+  finally:
+    server.shutdown()
+    server.server_close()
+
+  assert result["text"] == "hello"
+
+
+def test_post_action_call_streams_generator_results(sandbox: Sandbox):
+  """A generator handler's items are sent as JSON lines with chunked transfer encoding."""
+  sandbox.add_example_domain()
+  sandbox.write("example/rows/__init__.py", "")
+  sandbox.write(
+    "example/rows/query.py",
+    "from dataclasses import dataclass\n\n\n@dataclass\nclass Rows:\n  count: int = 3\n",
+  )
+  sandbox.write(
+    "example/rows/handler.py",
+    "def handle(query):\n  for i in range(query.count):\n    yield {'row': i}\n",
+  )
+  sandbox.scaf_init()
+
+  server, port = _start_test_server(sandbox.root)
+  try:
+    req = urllib.request.Request(
+      f"http://127.0.0.1:{port}/actions/example/rows/call",
+      data=json.dumps({"count": 4}).encode(),
+      method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=5) as resp:
+      encoding = resp.headers.get("Transfer-Encoding")
+      lines = [json.loads(line) for line in resp]
+  finally:
+    server.shutdown()
+    server.server_close()
+
+  assert encoding == "chunked"
+  assert lines == [{"row": i} for i in range(4)]
+
+
+def test_async_calls_are_capped_by_concurrency(sandbox: Sandbox):
+  """No more than `concurrency` calls to async handlers run at once; the rest wait their turn."""
+  sandbox.add_example_domain()
+  sandbox.write("example/nap/__init__.py", "")
+  sandbox.write(
+    "example/nap/command.py",
+    "from dataclasses import dataclass\n\n\n@dataclass\nclass Nap:\n  seconds: float = 0.1\n",
+  )
+  sandbox.write(
+    "example/nap/handler.py",
+    "import asyncio\n\n_running = 0\n\n\n"
+    "async def handle(command):\n"
+    "  global _running\n"
+    "  _running += 1\n"
+    "  await asyncio.sleep(command.seconds)\n"
+    "  peak = _running\n"
+    "  _running -= 1\n"
+    "  return peak\n",
+  )
+  sandbox.scaf_init()
+
+  server, port = _start_test_server(sandbox.root, concurrency=2)
+  try:
+    with ThreadPoolExecutor(max_workers=6) as pool:
+      peaks = list(pool.map(lambda _: _post_json(port, "/actions/example/nap/call", {}), range(6)))
+  finally:
+    server.shutdown()
+    server.server_close()
+
+  assert max(peaks) == 2, peaks
+
+
+def test_idle_keep_alive_connections_give_up_their_threads(sandbox: Sandbox):
+  """Kept-alive connections that sit idle don't stop others from being served."""
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+
+  server, port = _start_test_server(sandbox.root, threads=2, keep_alive=10)
+  idle = [http.client.HTTPConnection("127.0.0.1", port, timeout=5) for _ in range(2)]
+  try:
+    for conn in idle:
+      conn.request("GET", "/actions")
+      conn.getresponse().read()
+    started = time.monotonic()
+    data = _get_json(port, "/actions")
+    elapsed = time.monotonic() - started
+  finally:
+    for conn in idle:
+      conn.close()
+    server.shutdown()
+    server.server_close()
+
+  assert data, "Expected the waiting request to be served"
+  assert elapsed < 2, f"Expected idle connections to be closed for it, took {elapsed:.1f}s"
+
+
+def test_post_action_call_speaks_binary(sandbox: Sandbox):
+  """The binary format can be used for the payload and the result, independently."""
+  from example.myriad.entity import Myriad
+  from example.myriad.get.command import GetMyriad
+  from scaf.codec.binary import CONTENT_TYPE, decode, encode, read_frames
+
+  sandbox.add_example_domain()
+  sandbox.scaf_init()
+
+  server, port = _start_test_server(sandbox.root)
+  try:
+    req = urllib.request.Request(
+      f"http://127.0.0.1:{port}/actions/example/myriad/get/call",
+      data=encode(GetMyriad(explicit_union="x")),
+      headers={"Content-Type": CONTENT_TYPE, "Accept": CONTENT_TYPE},
+      method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=5) as resp:
+      content_type = resp.headers.get("Content-Type")
+      frames = list(read_frames(resp))
+  finally:
+    server.shutdown()
+    server.server_close()
+
+  assert content_type == CONTENT_TYPE
+  assert [decode(f, Myriad).text for f in frames] == ["hello"]
+
+
 # ---------------------------------------------------------------------------
 # Frontend UI
 # ---------------------------------------------------------------------------
@@ -267,6 +679,7 @@ def test_root_returns_html_page(sandbox: Sandbox):
     status, content_type, body = _get_html(port, "/")
   finally:
     server.shutdown()
+    server.server_close()
 
   assert status == 200, f"Expected 200, got {status}"
   assert "text/html" in content_type, f"Expected text/html content-type, got {content_type}"
@@ -362,3 +775,66 @@ def test_server_uses_reloaded_module_after_file_change(sandbox: Sandbox, tmp_pat
   finally:
     sys.modules.pop("ver", None)
     sys.path.remove(str(ver_file.parent))
+
+
+def _load_module(name: str, path: Path):
+  spec = importlib.util.spec_from_file_location(name, path)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  sys.modules[name] = module
+  return module
+
+
+def _wait_for(predicate, timeout: float) -> bool:
+  deadline = time.monotonic() + timeout
+  while not predicate():
+    if time.monotonic() > deadline:
+      return False
+    time.sleep(0.01)
+  return True
+
+
+def test_inotify_watcher_reloads_without_waiting_for_a_poll(tmp_path):
+  """With inotify, a change is picked up as it happens, not on the next poll - including in a
+  folder created after the watcher started."""
+  from scaf.user.serve.handler import FileWatcher
+
+  watcher = FileWatcher(tmp_path, poll_interval=30.0)
+  if watcher.backend != "inotify":
+    pytest.skip("inotify is not available here")
+  watcher.start()
+  try:
+    nested = tmp_path / "new_folder"
+    nested.mkdir()
+    mod_file = nested / "inotifymod.py"
+    mod_file.write_text("VALUE = 'v1'\n", encoding="utf-8")
+    _load_module("inotifymod", mod_file)
+    time.sleep(0.1)  # let the watcher add a watch for the new folder
+
+    mod_file.write_text("VALUE = 'v2'\n", encoding="utf-8")
+    assert _wait_for(lambda: sys.modules["inotifymod"].VALUE == "v2", timeout=2.0), (
+      "FileWatcher did not reload 'inotifymod' from its inotify events"
+    )
+  finally:
+    watcher.stop()
+    sys.modules.pop("inotifymod", None)
+
+
+def test_file_watcher_falls_back_to_polling(tmp_path):
+  """Without inotify, the watcher still finds changes by polling."""
+  from scaf.user.serve.handler import FileWatcher
+
+  mod_file = tmp_path / "pollmod.py"
+  mod_file.write_text("VALUE = 'v1'\n", encoding="utf-8")
+  _load_module("pollmod", mod_file)
+
+  watcher = FileWatcher(tmp_path, poll_interval=0.05, inotify=False)
+  assert watcher.backend == "poll"
+  watcher.start()
+  try:
+    time.sleep(0.15)  # let watcher capture initial mtimes
+    mod_file.write_text("VALUE = 'v2'\n", encoding="utf-8")
+    assert _wait_for(lambda: sys.modules["pollmod"].VALUE == "v2", timeout=2.0)
+  finally:
+    watcher.stop()
+    sys.modules.pop("pollmod", None)
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def action_root(tmp_path):
+  from scaf.action_package.load.handler import cache_clear
+
+  action_folder = tmp_path / "greet"
+  action_folder.mkdir()
+  (action_folder / "__init__.py").touch()
+  (action_folder / "command.py").write_text(
+    "from dataclasses import dataclass\n\n\n@dataclass\nclass Greet:\n  pass\n"
+  )
+  (action_folder / "handler.py").write_text("def handle(command):\n  return 'hello'\n")
+  cache_clear()
+  yield tmp_path
+  cache_clear()
+
+
+def _load(root):
+  from pathlib import Path
+
+  from scaf.action_package.load.command import LoadActionPackage
+
+  return LoadActionPackage(root=root, action=Path("greet")).execute()
+
+
+def test_loaded_package_is_reused(action_root):
+  from scaf.action_package.load.handler import cache_info
+
+  first = _load(action_root)
+  second = _load(action_root)
+
+  assert second is first
+  info = cache_info()
+  assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+
+def test_changed_package_is_reloaded(action_root):
+  from scaf.action_package.load.handler import cache_info
+
+  first = _load(action_root)
+  handler_file = action_root / "greet" / "handler.py"
+  handler_file.write_text("def handle(command):\n  return 'goodbye'\n")
+  stat = handler_file.stat()
+  os.utime(handler_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+  second = _load(action_root)
+
+  assert second is not first
+  assert second.logic_module.handle(None) == "goodbye"
+  assert cache_info().misses == 2
+
+
+def test_least_recently_used_package_is_evicted(action_root, monkeypatch):
+  from scaf.action_package.load import handler
+
+  monkeypatch.setattr(handler, "CACHE_SIZE", 0)
+  _load(action_root)
+
+  assert handler.cache_info().currsize == 0
+
+
+def test_concurrent_misses_load_the_package_once(action_root):
+  import builtins
+  import threading
+
+  from scaf.action_package.load.handler import cache_info
+
+  # Executing the handler takes a while, so both threads miss the cache before either finishes
+  (action_root / "greet" / "handler.py").write_text(
+    "import builtins\nimport time\n\n"
+    "builtins.greet_loads = getattr(builtins, 'greet_loads', 0) + 1\n"
+    "time.sleep(0.2)\n\n\n"
+    "def handle(command):\n  return 'hello'\n"
+  )
+  loaded = []
+  threads = [threading.Thread(target=lambda: loaded.append(_load(action_root))) for _ in range(2)]
+  try:
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    assert builtins.greet_loads == 1
+    assert loaded[0] is loaded[1]
+    assert (cache_info().hits, cache_info().misses) == (1, 1)
+  finally:
+    builtins.__dict__.pop("greet_loads", None)
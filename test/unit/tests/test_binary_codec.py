@@ -0,0 +1,76 @@
+import io
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+import pytest
+
+from scaf.codec.binary import decode, encode, frame, read_frames
+from scaf.output import to_json
+
+
+@dataclass
+class _Node:
+  name: str
+  children: list[_Node] = field(default_factory=list)
+
+
+@dataclass
+class _Everything:
+  count: int = -7
+  ratio: float = 0.25
+  flag: bool = True
+  text: str = "héllo " * 30  # Long enough to need a multi-byte length
+  blob: bytes = b"\x00\x01\x02"
+  guid: UUID = field(default_factory=lambda: UUID(int=12345))
+  when: datetime = field(default_factory=lambda: datetime(2026, 1, 2, 3, 4, 5))
+  path: Path = Path("a/b")
+  maybe: int | None = None
+  tags: set[str] = field(default_factory=lambda: {"x", "y"})
+  scores: dict[str, float] = field(default_factory=lambda: {"a": 1.5})
+  tree: _Node = field(default_factory=lambda: _Node("root", [_Node("leaf")]))
+  anything: Any = field(default_factory=lambda: [None, 2**70, {"k": (1, "v")}])
+  computed: int = field(default=0, init=False)
+
+
+def test_dataclasses_round_trip_and_are_smaller_than_compact_json():
+  value = _Everything()
+  value.computed = 99
+
+  data = encode(value)
+  decoded = decode(data, _Everything)
+
+  assert decoded.computed == 99
+  assert isinstance(decoded.blob, memoryview), "Expected bytes to be decoded without a copy"
+  decoded.blob = bytes(decoded.blob)
+  decoded.anything[2]["k"] = tuple(decoded.anything[2]["k"])  # Sequences decode as lists
+  assert decoded == value
+  assert len(data) < len(to_json({**vars(value), "blob": "AAEC"}).encode())
+
+
+def test_values_without_a_dataclass_are_tagged():
+  value = {"line": 3, "result": encode(_Node("n")), "nested": [1.5, False, "s"]}
+
+  decoded = decode(encode(value))
+
+  assert decoded["nested"] == [1.5, False, "s"]
+  assert decode(decoded["result"], _Node) == _Node("n")
+
+
+def test_bad_values_and_data_raise():
+  with pytest.raises(TypeError, match=r"_Node\.name"):
+    encode(_Node(name=5))  # type: ignore
+  with pytest.raises(ValueError, match="Malformed"):
+    decode(encode(_Everything())[:-3], _Everything)
+  with pytest.raises(ValueError, match="left over"):
+    decode(encode(_Node("n")) + b"\x00", _Node)
+
+
+def test_frames_split_a_stream_into_messages():
+  stream = io.BytesIO(frame(b"first") + frame(b"") + frame(b"third"))
+
+  assert list(read_frames(stream)) == [b"first", b"", b"third"]
+  with pytest.raises(ValueError, match="Truncated"):
+    list(read_frames(io.BytesIO(frame(b"cut short")[:-1])))
@@ -0,0 +1,100 @@
+import importlib.util
+import sys
+from textwrap import dedent
+
+import pytest
+
+
+@pytest.fixture(params=[False, True], ids=["generic", "codegen"])
+def shape_class(request, tmp_path):
+  (tmp_path / "rules.py").write_text(
+    dedent("""\
+      import builtins
+
+      builtins.rules_executions = getattr(builtins, "rules_executions", 0) + 1
+
+
+      def fit_name(value):
+        return value.strip()
+    """)
+  )
+  shape_file = tmp_path / "shape.py"
+  shape_file.write_text(
+    dedent(f"""\
+      from dataclasses import dataclass
+
+      from scaf.core import Shape
+
+
+      @dataclass
+      class Greet(Shape, codegen={request.param}):
+        name: str
+        times: int = 1
+        nickname: str | None = None
+    """)
+  )
+  spec = importlib.util.spec_from_file_location("fit_plan_shape", shape_file)
+  module = importlib.util.module_from_spec(spec)
+  sys.modules[spec.name] = module  # So inspect can find the class's file
+  spec.loader.exec_module(module)
+  yield module.Greet
+
+  del sys.modules[spec.name]
+
+  import builtins
+
+  vars(builtins).pop("rules_executions", None)
+
+
+def test_rules_module_is_executed_once_per_class(shape_class):
+  import builtins
+
+  for _ in range(100):
+    greet = shape_class(name=" Ada ", times="3")
+
+  assert (greet.name, greet.times, greet.nickname) == ("Ada", 3, None)
+  assert builtins.rules_executions == 1
+
+
+def test_fit_plan_records_union_analysis(shape_class):
+  from scaf.tools import get_fit_plan
+
+  plan = get_fit_plan(shape_class)
+
+  assert list(plan.fields) == ["name", "times", "nickname"]
+  assert not plan.fields["times"].optional
+  nickname = plan.fields["nickname"]
+  assert (nickname.canonical_type, nickname.proxy_type, nickname.optional) == (str, str, True)
+
+
+def test_invalidated_fit_plan_is_rebuilt(shape_class, tmp_path):
+  import builtins
+
+  from scaf.tools import get_fit_plan, invalidate_fit_plans
+
+  plan = get_fit_plan(shape_class)
+  (tmp_path / "rules.py").write_text("def fit_name(value):\n  return value.upper()\n")
+  invalidate_fit_plans()
+
+  assert get_fit_plan(shape_class) is not plan
+  assert shape_class(name="ada").name == "ADA"
+  assert builtins.rules_executions == 1
+
+
+def test_unfit_value_raises_fitting_error(shape_class):
+  from scaf.errors import FittingError
+
+  with pytest.raises(FittingError, match="Greet.times"):
+    shape_class(name="Ada", times="many")
+  with pytest.raises(FittingError, match="cannot be None"):
+    shape_class(name="Ada", times=None)
+
+
+def test_rules_module_that_raises_type_error_falls_back_to_type_checks(shape_class, tmp_path):
+  from scaf.tools import invalidate_fit_plans
+
+  (tmp_path / "rules.py").write_text("len(1)\n\n\ndef fit_name(value):\n  return value.strip()\n")
+  invalidate_fit_plans()
+
+  greet = shape_class(name=" Ada ", times="3")
+  assert (greet.name, greet.times) == (" Ada ", 3)
@@ -0,0 +1,100 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def action_package(tmp_path):
+  from scaf.action_package.load.command import LoadActionPackage
+  from scaf.action_package.load.handler import cache_clear
+
+  action_folder = tmp_path / "tag"
+  action_folder.mkdir()
+  (action_folder / "__init__.py").touch()
+  (action_folder / "command.py").write_text(
+    "from dataclasses import dataclass, field\n\n\n"
+    "@dataclass\nclass Tag:\n  name: str\n  tags: list[str] = field(default_factory=list)\n"
+  )
+  (action_folder / "handler.py").write_text("def handle(command, *extra):\n  return command\n")
+  cache_clear()
+  yield LoadActionPackage(root=tmp_path, action=Path("tag")).execute()
+  cache_clear()
+
+
+def _invoke(action_package, *args):
+  from scaf.action_package.invoke.command import InvokeActionPackage
+
+  return InvokeActionPackage(action_package, list(args)).execute()
+
+
+def test_parser_is_built_once_per_shape(action_package, monkeypatch):
+  from scaf.action_package.invoke import handler
+
+  built = []
+  build = handler.build_parser_from_shape
+  monkeypatch.setattr(
+    handler, "build_parser_from_shape", lambda *a, **kw: built.append(a) or build(*a, **kw)
+  )
+
+  assert _invoke(action_package, "first").name == "first"
+  assert _invoke(action_package, "second", "extra").name == "second"
+  assert len(built) == 1
+
+
+def test_cached_parser_keeps_its_own_prog(action_package, capsys):
+  from scaf.action_package.invoke.handler import get_parser
+
+  shape_class = action_package.shape_class
+  prog = get_parser(shape_class, "").prog
+  _invoke(action_package, "--help")
+
+  assert "usage: scaf call" in capsys.readouterr().out
+  assert get_parser(shape_class, "").prog == prog
+
+
+def test_cached_parser_does_not_share_mutable_defaults(action_package):
+  first = _invoke(action_package, "first")
+  first.tags.append("mutated")
+
+  assert _invoke(action_package, "second").tags == []
+
+
+def test_coroutine_handlers_run_on_one_shared_loop(action_package):
+  (action_package.action_folder / "handler.py").write_text(
+    "import asyncio\n\n\n"
+    "async def handle(command, *extra):\n"
+    "  await asyncio.sleep(0)\n"
+    "  return command.name, asyncio.get_running_loop()\n"
+  )
+  from scaf.action_package.load.command import LoadActionPackage
+
+  action_package = LoadActionPackage(root=action_package.action_folder.parent, action=Path("tag"))
+  action_package = action_package.execute()
+
+  first_name, first_loop = _invoke(action_package, "first")
+  second_name, second_loop = _invoke(action_package, "second")
+
+  assert (first_name, second_name) == ("first", "second")
+  assert first_loop is second_loop
+
+
+@pytest.mark.parametrize("prefix", ["", "async "])
+def test_generator_results_are_printed_as_json_lines(action_package, prefix, capsys):
+  (action_package.action_folder / "handler.py").write_text(
+    f"{prefix}def handle(command, *extra):\n"
+    "  for i in range(3):\n"
+    "    yield {'name': command.name, 'row': i}\n"
+  )
+  from scaf.action_package.load.command import LoadActionPackage
+  from scaf.output import print_result
+
+  action_package = LoadActionPackage(root=action_package.action_folder.parent, action=Path("tag"))
+  action_package = action_package.execute()
+
+  stream = _invoke(action_package, "rows")
+  assert isinstance(stream, Iterator), "Expected the stream to be passed through unconsumed"
+  print_result(stream)
+
+  lines = capsys.readouterr().out.splitlines()
+  assert lines == [f'{{"name":"rows","row":{i}}}' for i in range(3)]
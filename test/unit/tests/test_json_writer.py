@@ -0,0 +1,68 @@
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from uuid import UUID
+
+import pytest
+
+from scaf.output import JSONEncoder, register_encoder, to_json
+
+
+class _Attributes:
+  def __init__(self):
+    self.name = "plain"
+    self.escaped = 'é "quoted"\n'
+
+
+@dataclass
+class _Inner:
+  when: datetime = datetime(2026, 1, 2, 3, 4, 5)
+  guid: UUID = field(default_factory=lambda: UUID(int=1))
+  tags: set[str] = field(default_factory=lambda: {"a"})
+
+
+@dataclass
+class _Outer:
+  text: str = "hello"
+  count: int = 42
+  ratio: float = 0.5
+  flag: bool = True
+  path: Path = Path("a/b")
+  nothing: str | None = None
+  inner: _Inner = field(default_factory=_Inner)
+  items: list = field(default_factory=lambda: [1, (2.5, float("inf")), _Attributes(), []])
+  mapping: dict = field(default_factory=lambda: {"x": {}, 1: False, None: "none", 2.5: True})
+  mismatched: int = "not an int"  # type: ignore
+
+
+@pytest.mark.parametrize("indent", [None, 0, 2])
+def test_output_matches_json_encoder(indent):
+  separators = (",", ":") if indent is None else None
+  expected = json.dumps(
+    _Outer(), cls=JSONEncoder, indent=indent, ensure_ascii=False, separators=separators
+  )
+
+  assert to_json(_Outer(), indent=indent) == expected
+
+
+def test_registered_encoders_apply_to_subclasses():
+  class _Money(Decimal):
+    pass
+
+  register_encoder(Decimal, str)
+
+  assert to_json({"price": _Money("1.50")}) == '{"price":"1.50"}'
+
+
+def test_unserializable_values_raise():
+  with pytest.raises(TypeError, match="not JSON serializable"):
+    to_json([object()])
+  with pytest.raises(TypeError, match="keys must be"):
+    to_json({(1, 2): "tuple key"})
+
+  circular = []
+  circular.append(circular)
+  with pytest.raises(ValueError, match="Circular"):
+    to_json(circular)
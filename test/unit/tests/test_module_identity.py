@@ -0,0 +1,69 @@
+import sys
+
+import pytest
+
+PACKAGE = "scaf_identity_check"
+
+
+@pytest.fixture
+def deck_root(tmp_path, monkeypatch):
+  from scaf.action_package.load.handler import cache_clear
+
+  action_folder = tmp_path / PACKAGE / "greet"
+  action_folder.mkdir(parents=True)
+  (tmp_path / PACKAGE / "__init__.py").touch()
+  (action_folder / "__init__.py").touch()
+  (action_folder / "command.py").write_text(
+    "import builtins\n"
+    "from dataclasses import dataclass\n\n"
+    "builtins.shape_executions = getattr(builtins, 'shape_executions', 0) + 1\n\n\n"
+    "@dataclass\nclass Greet:\n  pass\n"
+  )
+  (action_folder / "handler.py").write_text(
+    f"from {PACKAGE}.greet.command import Greet\n\n\n"
+    "def handle(command):\n  return isinstance(command, Greet)\n"
+  )
+  monkeypatch.syspath_prepend(str(tmp_path))
+  cache_clear()
+  yield tmp_path
+  cache_clear()
+  for name in [n for n in sys.modules if n.partition(".")[0] == PACKAGE]:
+    del sys.modules[name]
+  import builtins
+
+  vars(builtins).pop("shape_executions", None)
+
+
+def test_shape_module_is_executed_once(deck_root):
+  import builtins
+  from pathlib import Path
+
+  from scaf.action_package.load.command import LoadActionPackage
+  from scaf.action_package.load.handler import find_duplicate_modules
+
+  pkg = LoadActionPackage(root=deck_root, action=Path(PACKAGE) / "greet").execute()
+
+  assert pkg.shape_module.__name__ == f"{PACKAGE}.greet.command"
+  assert pkg.logic_module.handle(pkg.shape_class())
+  assert builtins.shape_executions == 1
+  assert find_duplicate_modules(deck_root) == {}
+
+
+def test_changed_package_is_re_executed_in_place(deck_root):
+  import os
+  from pathlib import Path
+
+  from scaf.action_package.load.command import LoadActionPackage
+
+  action = Path(PACKAGE) / "greet"
+  first = LoadActionPackage(root=deck_root, action=action).execute()
+  shape_file = deck_root / action / "command.py"
+  shape_file.write_text(shape_file.read_text().replace("pass", '"""Changed."""'))
+  stat = shape_file.stat()
+  os.utime(shape_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+  second = LoadActionPackage(root=deck_root, action=action).execute()
+
+  assert second.shape_module is first.shape_module
+  assert second.shape_class.__doc__ == "Changed."
+  assert second.logic_module.handle(second.shape_class()), "Handler should see the new class"
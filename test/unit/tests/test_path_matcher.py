@@ -0,0 +1,34 @@
+import pytest
+
+from scaf.manifest.tools import PathMatcher
+
+PATTERNS = ["node_modules", "/build", "*.tmp/", "docs/**/drafts", "!keep.tmp", "[!a]x"]
+
+
+@pytest.mark.parametrize(
+  "path, ignored",
+  [
+    ("node_modules", True),
+    ("a/b/node_modules", True),
+    ("build", True),
+    ("a/build", False),  # Anchored by its leading slash
+    ("a/x.tmp", True),
+    ("a/keep.tmp", False),  # Re-included by the later negation
+    ("docs/drafts", True),
+    ("docs/a/b/drafts", True),
+    ("bx", True),
+    ("ax", False),
+    ("b/x", False),  # Wildcards never match a slash
+  ],
+)
+def test_gitignore_semantics(path, ignored):
+  assert PathMatcher(PATTERNS)(path) is ignored
+
+
+def test_anchored_matcher_matches_within_folders():
+  matcher = PathMatcher(["mydomain/*"], anchored=True)
+
+  assert matcher.matches_within("mydomain/x/y")
+  assert not matcher.matches_within("mydomain")
+  assert not matcher.matches_within("other/mydomain/x")
+  assert not PathMatcher([])
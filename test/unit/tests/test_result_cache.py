@@ -0,0 +1,88 @@
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+from scaf.cache.tools import (
+  _RESULT_HEADER,
+  _RESULT_STATS,
+  RESULT_STATS_FILENAME,
+  evict_results,
+  get_result_file,
+  read_cached_result,
+  read_result_stats,
+  record_result_lookup,
+  write_cached_result,
+)
+from scaf.codec.binary import encode
+
+
+def test_expired_result_is_a_miss(tmp_path, monkeypatch):
+  write_cached_result(tmp_path, "k", {"answer": 42}, ttl=10)
+  assert read_cached_result(tmp_path, "k") == (True, {"answer": 42})
+
+  now = os.path.getmtime(get_result_file(tmp_path, "k"))
+  monkeypatch.setattr("scaf.cache.tools.time.time", lambda: now + 11)
+  assert read_cached_result(tmp_path, "k") == (False, None)
+  assert not get_result_file(tmp_path, "k").exists(), "Expected the expired entry to be removed"
+
+
+def test_least_recently_used_results_are_evicted(tmp_path):
+  for age, key in enumerate(["old", "used", "new"]):
+    write_cached_result(tmp_path, key, "x" * 1000, ttl=60)
+    os.utime(get_result_file(tmp_path, key), (age, age))
+  read_cached_result(tmp_path, "old")  # Now the most recently used
+
+  size = get_result_file(tmp_path, "new").stat().st_size
+  assert evict_results(tmp_path, max_bytes=size * 2) == 1
+  assert not get_result_file(tmp_path, "used").exists()
+  assert get_result_file(tmp_path, "old").exists()
+
+
+@dataclass
+class Answer:
+  value: int
+  notes: list[str]
+
+
+def test_dataclass_result_comes_back_as_its_class(tmp_path):
+  write_cached_result(tmp_path, "k", Answer(42, ["checked"]), ttl=10)
+
+  assert read_cached_result(tmp_path, "k") == (True, Answer(42, ["checked"]))
+
+
+def test_entry_naming_a_class_that_isnt_loaded_is_a_miss(tmp_path):
+  # Entries can only name classes the process has already loaded, so reading one imports nothing
+  result_file = get_result_file(tmp_path, "k")
+  envelope = encode({"class": "no_such_module:Answer", "result": encode(Answer(1, []))})
+  result_file.write_bytes(_RESULT_HEADER.pack(0, time.time() + 10) + envelope)
+
+  assert read_cached_result(tmp_path, "k") == (False, None)
+  assert "no_such_module" not in sys.modules
+
+
+def test_concurrent_lookups_are_all_counted(tmp_path):
+  def look_up():
+    for i in range(50):
+      record_result_lookup(tmp_path, hit=bool(i % 2))
+
+  threads = [threading.Thread(target=look_up) for _ in range(8)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  stats = read_result_stats(tmp_path)
+  assert (stats.hits, stats.misses) == (200, 200)
+
+
+def test_lookup_counts_stay_a_fixed_size_within_the_budget(tmp_path):
+  write_cached_result(tmp_path, "k", "x" * 1000, ttl=60)
+  for _ in range(1000):
+    record_result_lookup(tmp_path, hit=True)
+
+  assert (tmp_path / RESULT_STATS_FILENAME).stat().st_size == _RESULT_STATS.size
+  size = get_result_file(tmp_path, "k").stat().st_size
+  assert evict_results(tmp_path, max_bytes=size) == 1, "Expected the counts to use up budget"
+  assert read_result_stats(tmp_path).hits == 1000
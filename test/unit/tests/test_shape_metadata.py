@@ -0,0 +1,92 @@
+from textwrap import dedent
+
+
+def test_read_shape_metadata_describes_first_dataclass(tmp_path):
+  from scaf.action_package.tools import read_shape_metadata
+
+  shape_file = tmp_path / "command.py"
+  shape_file.write_text(
+    dedent('''\
+      """Module docstring."""
+      from dataclasses import dataclass, field
+
+      import not_installed_anywhere
+
+
+      class _Private:
+        pass
+
+
+      @dataclass
+      class Greet:
+        """Say hello.
+
+        Politely.
+        """
+
+        name: str = field(doc="Who to greet.")
+        times: int = 1
+        """How many times."""
+        tags: list[str] = field(default_factory=list)
+
+        @dataclass
+        class Result:
+          message: str
+    '''),
+    encoding="utf-8",
+  )
+
+  metadata = read_shape_metadata(shape_file)
+
+  assert metadata.name == "Greet"
+  assert metadata.action_method == "command"
+  assert metadata.summary == "Say hello."
+  assert [(f.name, f.annotation, f.default, f.doc) for f in metadata.fields] == [
+    ("name", "str", None, "Who to greet."),
+    ("times", "int", "1", "How many times."),
+    ("tags", "list[str]", "<factory>", ""),
+  ]
+  assert metadata.fields[0].required
+
+
+def test_read_shape_metadata_falls_back_to_module_docstring(tmp_path):
+  from scaf.action_package.tools import read_shape_metadata
+
+  shape_file = tmp_path / "query.py"
+  shape_file.write_text('"""Module docstring."""\n@dataclass\nclass Get:\n  pass\n')
+
+  assert read_shape_metadata(shape_file).doc == "Module docstring."
+
+
+def test_read_shape_metadata_without_dataclass(tmp_path):
+  from scaf.action_package.tools import read_shape_metadata
+
+  shape_file = tmp_path / "query.py"
+  shape_file.write_text("class Get:\n  pass\n")
+
+  assert read_shape_metadata(shape_file) is None
+
+
+def test_find_unresolved_imports(tmp_path):
+  from scaf.action_package.tools import find_unresolved_imports
+
+  source_file = tmp_path / "handler.py"
+  source_file.write_text(
+    dedent("""\
+      import json
+      from pathlib import Path
+
+      from scaf.core import Shape
+      from no_such_package.sub import thing
+
+      from .command import Local
+
+      try:
+        import also_missing
+      except ImportError:
+        pass
+    """),
+    encoding="utf-8",
+  )
+
+  assert find_unresolved_imports(source_file) == ["no_such_package.sub"]